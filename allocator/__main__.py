@@ -0,0 +1,62 @@
+import argparse
+import ipaddress
+import os
+import sys
+
+from allocator.server import make_server
+from allocator.store import DEFAULT_SERIES, SequenceStore
+
+
+def _is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m allocator', description='Invoice number allocation service')
+    parser.add_argument('--db', default='invoice_numbers.sqlite3', help='SQLite database path')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help='Run the HTTP endpoint')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--token', default=os.environ.get('ALLOCATOR_TOKEN'),
+                       help='Shared secret expected in X-Allocator-Token (default: $ALLOCATOR_TOKEN)')
+
+    seed = sub.add_parser('seed', help='Set the last used number, e.g. 34 to continue after 2026/Inv/034')
+    seed.add_argument('year', type=int)
+    seed.add_argument('number', type=int)
+    seed.add_argument('--series', default=DEFAULT_SERIES)
+
+    allocate = sub.add_parser('allocate', help='Reserve numbers and print them')
+    allocate.add_argument('year', type=int)
+    allocate.add_argument('--count', type=int, default=1)
+    allocate.add_argument('--series', default=DEFAULT_SERIES)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve' and not args.token and not _is_loopback(args.host):
+        # Reachable from outside, anyone could use up invoice numbers
+        parser.error(f'--token (or $ALLOCATOR_TOKEN) is required to serve on {args.host or "all interfaces"}; '
+                     'without one, only a loopback --host such as 127.0.0.1 is allowed')
+    store = SequenceStore(args.db)
+
+    if args.command == 'serve':
+        server = make_server(store, args.host, args.port, args.token)
+        print(f'Allocating invoice numbers on http://{args.host}:{args.port}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'seed':
+        store.seed(args.year, args.number, series=args.series)
+    else:
+        print('\n'.join(store.allocate(args.year, args.count, series=args.series)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
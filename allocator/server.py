@@ -0,0 +1,75 @@
+import hmac
+import json
+import sqlite3
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from allocator.store import DEFAULT_SERIES
+
+# Largest block a single request may reserve
+MAX_BATCH = 1000
+
+
+class AllocatorHandler(BaseHTTPRequestHandler):
+    """
+    POST /allocate {"year": 2026, "count": 1, "series": "Inv", "seed_year": 2026, "seed_number": 34}
+      -> {"numbers": ["2026/Inv/035"]}
+    seed_*: last number already used, only read when the sequence is created
+    GET /health -> {"ok": true}
+    """
+
+    store = None
+    token = None
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'ok': True})
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/allocate':
+            self._send(404, {'error': 'Not found'})
+            return
+        if self.token and not hmac.compare_digest(self.headers.get('X-Allocator-Token', ''), self.token):
+            self._send(403, {'error': 'Invalid token'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            year = int(request['year'])
+            count = int(request.get('count', 1))
+            series = str(request.get('series') or DEFAULT_SERIES)
+            seed = None
+            if request.get('seed_year') is not None and request.get('seed_number') is not None:
+                seed = (int(request['seed_year']), int(request['seed_number']))
+        except (KeyError, TypeError, ValueError) as e:
+            self._send(400, {'error': f'Bad request: {e}'})
+            return
+        if not 1 <= count <= MAX_BATCH:
+            self._send(400, {'error': f'count must be between 1 and {MAX_BATCH}'})
+            return
+
+        try:
+            numbers = self.store.allocate(year, count, series=series, seed=seed)
+        except sqlite3.Error as e:
+            # Locked, read-only or full database: an answer script.gs can show in the Status column
+            self._send(500, {'error': f'Invoice number database error: {e}'})
+            return
+        self._send(200, {'numbers': numbers})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(store, host='127.0.0.1', port=8765, token=None):
+    handler = type('Handler', (AllocatorHandler,), {'store': store, 'token': token})
+    return ThreadingHTTPServer((host, port), handler)
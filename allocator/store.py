@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import threading
+
+DEFAULT_SERIES = 'Inv'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sequences (
+    series TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    last INTEGER NOT NULL,
+    PRIMARY KEY (series, year)
+)
+'''
+
+
+def format_number(year, series, number):
+    """Invoice number in the YYYY/Inv/NNN form script.gs uses"""
+    return f'{year}/{series}/{str(number).zfill(3)}'
+
+
+class SequenceStore:
+    """Per-(series, year) invoice counters in SQLite, one row per sequence"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(_SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads, one per server thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def allocate(self, year, count=1, series=DEFAULT_SERIES, seed=None):
+        """
+        Reserve count consecutive numbers for (series, year) and return them.
+        seed: (year, last number used) for a sequence that does not exist yet, i.e.
+        where the sheet's numbering (or the number baked into the template) stands;
+        a new sequence for that year continues after it. Ignored once the sequence exists.
+        """
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent callers serialize
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT last FROM sequences WHERE series = ? AND year = ?',
+                (series, year)
+            ).fetchone()
+            if row is None:
+                last = seed[1] if seed and seed[0] == year else 0
+                conn.execute(
+                    'INSERT INTO sequences (series, year, last) VALUES (?, ?, ?)',
+                    (series, year, last + count)
+                )
+            else:
+                last = row[0]
+                conn.execute(
+                    'UPDATE sequences SET last = ? WHERE series = ? AND year = ?',
+                    (last + count, series, year)
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [format_number(year, series, n) for n in range(last + 1, last + count + 1)]
+
+    def seed(self, year, number, series=DEFAULT_SERIES):
+        """Set the last used number of a sequence, e.g. to continue an existing sheet"""
+        self._conn().execute(
+            'INSERT INTO sequences (series, year, last) VALUES (?, ?, ?) '
+            'ON CONFLICT (series, year) DO UPDATE SET last = excluded.last',
+            (series, year, number)
+        )
+
+    def last(self, year, series=DEFAULT_SERIES):
+        row = self._conn().execute(
+            'SELECT last FROM sequences WHERE series = ? AND year = ?',
+            (series, year)
+        ).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from allocator.store import SequenceStore
+from batch.invoice import PreparedTemplate, render_invoice, script_state_codes
+from batch.numbering import first_invoice_number, format_invoice_number
+from batch.pdf import BACKENDS, DirectorySink, convert_many
+from batch.sheet import iter_sheet_rows
+from utils.bundle import directory_entries, iter_zip
+
+# Per-worker state, set once by _init_worker
+_prepared = None
+_state_codes = None
+
+
+def _init_worker(template_html, state_codes):
+    global _prepared, _state_codes
+    _prepared = PreparedTemplate(template_html)
+    _state_codes = state_codes
+
+
+def _render_job(job):
+    """(row_number, invoice_number, name, html), or name None and the error in place of html"""
+    row_number, row, invoice_number, invoice_date = job
+    try:
+        name, html = render_invoice(_prepared, row, invoice_number, invoice_date, _state_codes)
+    except Exception as e:
+        # One bad row gets an error status instead of stopping the run
+        return row_number, invoice_number, None, f'{type(e).__name__}: {e}'
+    return row_number, invoice_number, name, html
+
+
+def is_pending(row):
+    return row.get('GENERATE', '').strip().lower() == 'yes'
+
+
+def iter_jobs(sheet_path, template_html, invoice_date, store=None):
+    """
+    Pending rows paired with invoice numbers, in sheet order.
+    store: optional allocator.store.SequenceStore to reserve numbers from instead of
+    continuing the numbering found in the sheet. A sequence the store does not have yet
+    starts where the sheet's numbering continues.
+    """
+    prepared = PreparedTemplate(template_html)
+    # First pass only looks at Status/Invoice Number to find where numbering continues
+    existing = (
+        (row.get('STATUS', ''), row.get('INVOICE_NUM', ''))
+        for _, row in iter_sheet_rows(sheet_path)
+    )
+    first = first_invoice_number(existing, invoice_date.year, prepared.starting_number)
+    if store is not None:
+        # One reservation for the whole run keeps the block contiguous
+        pending = sum(1 for _, row in iter_sheet_rows(sheet_path) if is_pending(row))
+        seed = (invoice_date.year, first - 1)
+        numbers = iter(store.allocate(invoice_date.year, pending, seed=seed)) if pending else iter(())
+    else:
+        numbers = (format_invoice_number(invoice_date.year, n) for n in itertools.count(first))
+
+    for row_number, row in iter_sheet_rows(sheet_path):
+        if not is_pending(row):
+            continue
+        yield row_number, row, next(numbers), invoice_date
+
+
+def _iter_rendered(jobs, template_html, workers):
+    """Rendered (row_number, invoice_number, name, html) in sheet order; workers=0 renders in this process"""
+    if not workers:
+        _init_worker(template_html, script_state_codes())
+        for job in jobs:
+            yield _render_job(job)
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(template_html, script_state_codes())
+    ) as pool:
+        # Keep a bounded number of rows in flight so large sheets stream through
+        in_flight = deque()
+        for job in jobs:
+            in_flight.append(pool.submit(_render_job, job))
+            if len(in_flight) >= workers * 4:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def run_batch(sheet_path, template_path, out_dir, invoice_date=None, workers=None, store=None,
+              pdf_backend=None, pdf_timeout=60, pdf_retries=2):
+    """
+    Render every pending row of a sheet export into out_dir, returns the result rows.
+    pdf_backend: name from batch.pdf.BACKENDS to also convert each invoice to PDF
+    """
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template_html = f.read()
+    invoice_date = invoice_date or date.today()
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    by_name = {}
+    # Both pools run at the same time, so with PDFs the workers are split between them.
+    # The PDF side gets at least half; a single worker leaves the HTML to this process.
+    html_workers = workers // 2 if pdf_backend else workers
+    pdf_workers = workers - html_workers
+
+    def written():
+        jobs = iter_jobs(sheet_path, template_html, invoice_date, store)
+        for rendered in _iter_rendered(jobs, template_html, html_workers):
+            if rendered[2] is None:
+                # No invoice was made, so the row has no number or date, like in the sheet
+                results.append([rendered[0], 'Error: ' + rendered[3], '', '', ''] + ([''] if pdf_backend else []))
+                continue
+            result = _write(rendered, out_dir, invoice_date)
+            results.append(result)
+            by_name[rendered[2]] = result
+            yield rendered[2], rendered[3]
+
+    if pdf_backend:
+        # HTML rendering feeds the PDF pool as rows finish
+        sink = DirectorySink(out_dir)
+        for name, pdf, error, attempts in convert_many(written(), pdf_backend, pdf_workers, pdf_timeout, pdf_retries):
+            result = by_name.pop(name)
+            if pdf is None:
+                result[1] = 'Error: ' + error
+                result.append('')
+            else:
+                result.append(os.path.basename(sink(name, pdf)))
+    else:
+        for _ in written():
+            pass
+
+    header = ['Row', 'Status', 'Invoice Number', 'Invoice Date', 'File']
+    if pdf_backend:
+        header.append('PDF')
+    with open(os.path.join(out_dir, 'results.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(results)
+    return results
+
+
+def output_files(results):
+    """Names of the files run_batch wrote for results, results.csv last"""
+    # Row results hold the HTML file name at index 4 and, with PDFs, the PDF name at 5
+    return [name for result in results for name in result[4:] if name] + ['results.csv']
+
+
+def _write(result, out_dir, invoice_date):
+    row_number, invoice_number, name, html = result
+    file_name = name + '.html'
+    with open(os.path.join(out_dir, file_name), 'w', encoding='utf-8') as f:
+        f.write(html)
+    return [row_number, 'Generated', invoice_number, invoice_date.isoformat(), file_name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m batch',
+        description='Render invoices for every pending row of a sheet export'
+    )
+    parser.add_argument('sheet', help='CSV or XLSX export of the invoice sheet')
+    parser.add_argument('--template', required=True, help='Generated invoice template HTML')
+    parser.add_argument('--out', default='invoices', help='Output directory (default: invoices)')
+    parser.add_argument('--date', help='Invoice date as YYYY-MM-DD (default: today)')
+    parser.add_argument('--workers', type=int, help='Worker processes, shared by HTML and PDF rendering (default: CPU count)')
+    parser.add_argument('--allocator', metavar='DB',
+                        help='Reserve invoice numbers from this allocator database instead of the sheet')
+    parser.add_argument('--pdf', metavar='BACKEND', choices=sorted(BACKENDS),
+                        help='Also convert each invoice to PDF with this backend')
+    parser.add_argument('--pdf-timeout', type=float, default=60, help='Seconds per PDF conversion (default: 60)')
+    parser.add_argument('--pdf-retries', type=int, default=2, help='Retries per failed PDF (default: 2)')
+    parser.add_argument('--zip', metavar='PATH', help='Also pack the output directory into one ZIP archive')
+    args = parser.parse_args(argv)
+
+    invoice_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+    store = SequenceStore(args.allocator) if args.allocator else None
+    results = run_batch(args.sheet, args.template, args.out, invoice_date, args.workers, store,
+                        args.pdf, args.pdf_timeout, args.pdf_retries)
+    print(f'Generated {len(results)} invoice(s) in {args.out}', file=sys.stderr)
+    if args.zip:
+        with open(args.zip, 'wb') as f:
+            for chunk in iter_zip(directory_entries(args.out, output_files(results))):
+                f.write(chunk)
+        print(f'Packed the files of this run into {args.zip}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import argparse
+import bisect
+import json
+import sys
+
+from batch.sheet import iter_sheet_rows
+from utils.currency import bounded_levenshtein
+
+# Columns copied by autoPopulateClientDetails, in the order of the emitted lookup table
+CLIENT_FIELDS = ('ADDRESS', 'PAN', 'GST', 'CLIENT_STATE', 'PLACE_OF_SUPPLY')
+
+
+def client_key(name):
+    """Same match autoPopulateClientDetails uses: trimmed, case-insensitive"""
+    return str(name or '').strip().lower()
+
+
+def _search_key(name):
+    # Looser form for interactive search, runs of spaces don't matter
+    return ' '.join(client_key(name).split())
+
+
+class ClientDirectory:
+    """Latest known details per client, indexed for exact, prefix and fuzzy lookup"""
+
+    def __init__(self):
+        # client_key -> (display name, {field: text})
+        self._entries = {}
+        self._sorted = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (row_number, {field: text}) rows; later rows win like the bottom-up scan"""
+        directory = cls()
+        for _, row in rows:
+            directory.add(row.get('CLIENT', ''), row)
+        return directory
+
+    @classmethod
+    def from_sheet(cls, path):
+        return cls.from_rows(iter_sheet_rows(path))
+
+    def add(self, name, details):
+        key = client_key(name)
+        if not key:
+            return
+        self._entries[key] = (str(name).strip(), {field: details.get(field, '') for field in CLIENT_FIELDS})
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return client_key(name) in self._entries
+
+    def get(self, name):
+        """{field: text} for a client, or None"""
+        entry = self._entries.get(client_key(name))
+        return dict(entry[1]) if entry else None
+
+    def _index(self):
+        if self._sorted is None:
+            self._sorted = sorted((_search_key(name), key) for key, (name, _) in self._entries.items())
+        return self._sorted
+
+    def search_prefix(self, prefix, limit=10):
+        """Display names starting with prefix, alphabetically"""
+        prefix = _search_key(prefix)
+        index = self._index()
+        results = []
+        for i in range(bisect.bisect_left(index, (prefix,)), len(index)):
+            search_key, key = index[i]
+            if not search_key.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(self._entries[key][0])
+        return results
+
+    def search_fuzzy(self, query, max_distance=2, limit=10):
+        """Display names within max_distance edits of query, closest first"""
+        query = _search_key(query)
+        scored = []
+        for search_key, key in self._index():
+            distance = bounded_levenshtein(query, search_key, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, search_key, self._entries[key][0]))
+        scored.sort()
+        return [name for _, _, name in scored[:limit]]
+
+    def search(self, query, limit=10):
+        """Prefix matches, topped up with fuzzy matches for typos"""
+        results = self.search_prefix(query, limit)
+        if len(results) < limit:
+            for name in self.search_fuzzy(query, limit=limit):
+                if name not in results:
+                    results.append(name)
+                    if len(results) >= limit:
+                        break
+        return results
+
+    def to_lookup_table(self):
+        """{client_key: [address, pan, gst, state, place of supply]} for CLIENT_DIRECTORY in script.gs"""
+        return {
+            key: [details[field] for field in CLIENT_FIELDS]
+            for key, (_, details) in sorted(self._entries.items())
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m batch.clients',
+        description='Build the client directory from a sheet export'
+    )
+    parser.add_argument('sheet', help='CSV or XLSX export of the invoice sheet')
+    parser.add_argument('--search', help='Print clients matching this name instead of the lookup table')
+    args = parser.parse_args(argv)
+
+    directory = ClientDirectory.from_sheet(args.sheet)
+    if args.search:
+        print('\n'.join(directory.search(args.search)))
+    else:
+        json.dump(directory.to_lookup_table(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
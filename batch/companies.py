@@ -0,0 +1,157 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from utils.compact import compact_checked
+from utils.company import PROFILE_FIELDS, prepare_company, profile_text
+from utils.generate import generate_template_html, template_byte_size, TEMPLATE_BYTE_BUDGET
+from utils.script import configured_script, read_script_file, script_features, template_cache_version
+from utils.state import read_state_codes
+
+# Bulk onboarding: one invoice template and configured script.gs per company in a manifest.
+# Manifest columns are the company profile keys of utils/company.py.
+
+REPORT_FIELDS = ('row', 'name', 'status', 'directory', 'template_bytes', 'problems')
+
+_DIRECTORY_NAME = re.compile(r'[^a-zA-Z0-9_-]+')
+
+
+def read_manifest(path):
+    """Manifest entries as dicts: a CSV with a header row, or a JSON list (or {"companies": [...]})"""
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data['companies'] if isinstance(data, dict) else data
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            entries = list(csv.DictReader(f))
+    unknown = sorted({key for entry in entries for key in entry if key and key not in PROFILE_FIELDS})
+    if unknown:
+        raise ValueError(f'Unknown manifest column(s): {", ".join(unknown)}')
+    return entries
+
+
+def directory_name(row, name):
+    """Output folder for a manifest row: row number plus a filesystem-safe company name"""
+    slug = _DIRECTORY_NAME.sub('_', name).strip('_')[:60] or 'company'
+    return f'{row:03d}_{slug}'
+
+
+# ---------- Worker pool ----------
+
+# Per-worker state, set once by _init_worker
+_state_codes = None
+
+
+def _init_worker(state_codes):
+    global _state_codes
+    _state_codes = state_codes
+
+
+def _build_company(job):
+    """Validate, generate and write one company; returns its report row"""
+    row, entry, base_dir, out_dir, year, compact = job
+    name = profile_text(entry, 'name')
+    report = {'row': row, 'name': name, 'status': 'invalid', 'directory': '', 'template_bytes': 0, 'problems': ''}
+    try:
+        company_data, color, flags, problems = prepare_company(entry, base_dir, _state_codes, year)
+        if problems:
+            report['problems'] = '; '.join(problems)
+            return report
+
+        template = generate_template_html(company_data, color, flags['has_gst'], flags['has_msme'], bool(company_data['qr_code']))
+        if template is None:
+            raise RuntimeError('template.html could not be loaded')
+        notes = []
+        if compact:
+            template, compact_problems = compact_checked(template)
+            notes += [f'left uncompacted: {p}' for p in compact_problems]
+        if template_byte_size(template) > TEMPLATE_BYTE_BUDGET:
+            notes.append(f'template is above the {TEMPLATE_BYTE_BUDGET // 1024} KB budget')
+
+        template_file_id = profile_text(entry, 'template_file_id')
+        dest_folder_id = profile_text(entry, 'dest_folder_id')
+        if not (template_file_id and dest_folder_id):
+            notes.append('script has no template/folder ID yet')
+        # Only the script code this company's template can use
+        allocator_url = profile_text(entry, 'allocator_url')
+        script = configured_script(
+            template_file_id, dest_folder_id,
+            allocator_url, profile_text(entry, 'allocator_token'),
+            features=script_features(flags['has_gst'], flags['has_international'], allocator=allocator_url),
+            cache_version=template_cache_version(template)
+        )
+
+        directory = directory_name(row, name)
+        target = os.path.join(out_dir, directory)
+        os.makedirs(target, exist_ok=True)
+        with open(os.path.join(target, 'invoice_template.html'), 'w', encoding='utf-8') as f:
+            f.write(template)
+        with open(os.path.join(target, 'script.gs'), 'w', encoding='utf-8') as f:
+            f.write(script)
+
+        report.update(status='ok', directory=directory, template_bytes=template_byte_size(template), problems='; '.join(notes))
+    except Exception as e:
+        report.update(status='error', problems=f'{type(e).__name__}: {e}')
+    return report
+
+
+def run_companies(manifest_path, out_dir, workers=None, year=None, compact=False):
+    """Generate every manifest entry across a process pool, write report.csv and return the report rows"""
+    entries = read_manifest(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    year = year or date.today().year
+    os.makedirs(out_dir, exist_ok=True)
+
+    if not read_script_file():
+        raise RuntimeError('script.gs could not be loaded')
+    jobs = [(row, entry, base_dir, out_dir, year, compact) for row, entry in enumerate(entries, start=1)]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(read_state_codes(),)) as pool:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        reports = list(pool.map(_build_company, jobs, chunksize=chunksize))
+
+    with open(os.path.join(out_dir, 'report.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(reports)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m batch.companies',
+        description='Generate invoice templates and configured scripts for every company in a manifest'
+    )
+    parser.add_argument('manifest', help='CSV or JSON manifest of company profiles (qr_path is relative to it)')
+    parser.add_argument('--out', default='companies', help='Output directory (default: companies)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--year', type=int, help='Year for the starting invoice number (default: this year)')
+    parser.add_argument('--compact', action='store_true', help='Compact each template (see utils/compact.py)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        reports = run_companies(args.manifest, args.out, args.workers, args.year, args.compact)
+    except ValueError as e:
+        parser.error(str(e))
+    counts = {}
+    for report in reports:
+        counts[report['status']] = counts.get(report['status'], 0) + 1
+        if report['status'] != 'ok':
+            print(f"row {report['row']} ({report['name'] or 'no name'}): {report['status']}: {report['problems']}", file=sys.stderr)
+    summary = ', '.join(f'{count} {status}' for status, count in sorted(counts.items()))
+    print(f'{len(reports)} compan{"y" if len(reports) == 1 else "ies"} in {time.perf_counter() - start:.1f}s ({summary}), '
+          f'report in {os.path.join(args.out, "report.csv")}', file=sys.stderr)
+    return 0 if counts.get('ok', 0) == len(reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
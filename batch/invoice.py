@@ -0,0 +1,280 @@
+import re
+from utils.engine import compile_template
+from utils.money import format_currency, number_to_words_with_currency
+from utils.currency import fuzzy_currency
+from utils.state import read_state_codes
+from batch.numbering import extract_starting_invoice_number
+
+# Python port of the onSheetEdit pipeline in script.gs
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+_NARRATION = re.compile(r'^(.+?)\s*\(([^)]+)\)\s*\Z')
+_FLOAT_PREFIX = re.compile(r'\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|[+-]?Infinity)')
+_INTERNATIONAL = re.compile(r'outside india\s*\(\s*([^)]+)\)', re.IGNORECASE)
+_COMPANY_STATE = re.compile(r'<strong>State:</strong>\s*([^&<]+)')
+_GST_TEMPLATE = re.compile(r'<strong>GST:</strong>\s*[A-Z0-9]+', re.IGNORECASE)
+_INVOICE_LINE = re.compile(r'<div class="meta-line"><strong>Invoice No:</strong>\s*\d{4}/Inv/\d{3}</div>')
+_ADDRESS_COMMA = re.compile(r',\s*')
+_OUTPUT_NAME = re.compile(r'[^a-zA-Z0-9_\- ]')
+
+
+def script_state_codes():
+    """STATE_CODES as configured scripts embed it: codes.json (see utils/script.py)"""
+    return read_state_codes()
+
+
+def parse_float(text):
+    """parseFloat semantics: leading numeric prefix, NaN becomes 0"""
+    match = _FLOAT_PREFIX.match(text)
+    if not match:
+        return 0
+    value = float(match.group(1).replace('Infinity', 'inf'))
+    return value or 0
+
+
+def split_by_top_level_pipe(text):
+    """Port of splitByTopLevelPipe: split on | outside parentheses"""
+    parts = []
+    depth = 0
+    current = []
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            if depth > 0:
+                depth -= 1
+        if char == '|' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current).strip())
+    return [p for p in parts if p]
+
+
+def parse_multiple_items(description_str, cost_str, hsn_str):
+    """Port of parseMultipleItems"""
+    description_str = (description_str or '').strip()
+    cost_str = (cost_str or '0').strip()
+    hsn_str = (hsn_str or '').strip()
+
+    costs = [c.strip() for c in cost_str.split('|') if c.strip()]
+    hsn_codes = [h.strip() for h in hsn_str.split('|')] if hsn_str else []
+
+    items = []
+    for i, part in enumerate(split_by_top_level_pipe(description_str)):
+        match = _NARRATION.match(part)
+        if match:
+            item_name = match.group(1).strip()
+            narrations = [n.strip() for n in match.group(2).strip().split('|') if n.strip()]
+        else:
+            item_name = part
+            narrations = []
+        items.append({
+            'description': item_name or 'Service',
+            'narrations': narrations,
+            'amount': parse_float(costs[i].replace(',', '')) if i < len(costs) else 0,
+            'hsn': hsn_codes[i] if i < len(hsn_codes) else ''
+        })
+
+    # More costs than descriptions
+    while len(items) < len(costs):
+        idx = len(items)
+        items.append({
+            'description': 'Item ' + str(idx + 1),
+            'narrations': [],
+            'amount': parse_float(costs[idx].replace(',', '')),
+            'hsn': hsn_codes[idx] if idx < len(hsn_codes) else ''
+        })
+
+    return items
+
+
+def parse_international_client(client_state):
+    """Port of parseInternationalClient"""
+    match = _INTERNATIONAL.search(client_state)
+    if not match:
+        return None
+    raw_currency = match.group(1).strip()
+    result = fuzzy_currency(raw_currency)
+    if not result['ok']:
+        return {
+            'isInternational': True,
+            'currencySymbol': None,
+            'currencyName': raw_currency,
+            'error': 'Unknown currency',
+            'partyState': 'Outside India',
+            'stateCode': '96'
+        }
+    return {
+        'isInternational': True,
+        'currencySymbol': result['symbol'],
+        'currencyName': result['name'],
+        'currencyCode': result['code'],
+        'confidence': result['confidence'],
+        'partyState': 'Outside India',
+        'stateCode': '96'
+    }
+
+
+def extract_company_state(template_html):
+    match = _COMPANY_STATE.search(template_html)
+    return match.group(1).strip() if match else None
+
+
+def is_gst_template(template_html):
+    return bool(_GST_TEMPLATE.search(template_html))
+
+
+def escape_html(text):
+    if text is None:
+        return ''
+    return (str(text).replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('"', '&quot;'))
+
+
+def convert_to_multi_line_address(address):
+    if not address or not address.strip():
+        return ''
+    return _ADDRESS_COMMA.sub(',<br>', address.strip())
+
+
+def format_date_human(d):
+    return f'{d.day}-{MONTHS[d.month - 1]}-{d.year}'
+
+
+def output_name(invoice_number, client_name):
+    """File name used for the generated PDF in Drive"""
+    return _OUTPUT_NAME.sub('_', f'Invoice_{invoice_number}_{client_name}')[:120]
+
+
+def _amount_cell(amount, symbol, is_international):
+    return '  <td class="amount">' + format_currency(amount, symbol, is_international) + '</td>\n'
+
+
+def generate_item_rows_html(items, has_gst, has_hsn, currency_symbol, is_international,
+                            company_state, client_state, base_amount):
+    """Port of generateItemRowsHtml"""
+    html = []
+    hsn_cell = '  <td class="hsn"></td>\n' if has_hsn else ''
+
+    for item in items:
+        narration_html = ''
+        if item['narrations']:
+            narration_html = ('<br><span style="font-size: 10px; font-weight: normal; color: #555; line-height: 1.1;">'
+                              + '<br>'.join(item['narrations']) + '</span>')
+        html.append('<tr>\n')
+        html.append('  <td><strong>' + escape_html(item['description']) + '</strong>' + narration_html + '</td>\n')
+        if has_hsn:
+            html.append('  <td class="hsn">' + escape_html(item['hsn']) + '</td>\n')
+        html.append(_amount_cell(item['amount'], currency_symbol, is_international))
+        html.append('</tr>\n')
+
+    if has_gst and not is_international:
+        if company_state == client_state:
+            tax_rows = (('CGST @ 9%', base_amount * 0.09), ('SGST @ 9%', base_amount * 0.09))
+        else:
+            tax_rows = (('IGST @ 18%', base_amount * 0.18),)
+        for label, amount in tax_rows:
+            html.append('<tr>\n')
+            html.append('  <td><strong>' + label + '</strong></td>\n')
+            html.append(hsn_cell)
+            html.append(_amount_cell(amount, currency_symbol, False))
+            html.append('</tr>\n')
+
+    return ''.join(html)
+
+
+class PreparedTemplate:
+    """Facts derived once from a generated template, shared by every row"""
+
+    def __init__(self, template_html):
+        self.is_gst = is_gst_template(template_html)
+        self.company_state = extract_company_state(template_html)
+        self.starting_number = extract_starting_invoice_number(template_html)
+        # The baked-in "Invoice No:" line becomes a slot so each row fills its own number
+        self.compiled = compile_template(_INVOICE_LINE.sub(
+            lambda m: '<div class="meta-line"><strong>Invoice No:</strong> {{INVOICE_NUMBER}}</div>',
+            template_html,
+            count=1
+        ))
+
+
+def render_invoice(prepared, row, invoice_number, invoice_date, state_codes):
+    """
+    Fill the template for one sheet row, like onSheetEdit does before the PDF conversion.
+    row: {field: text} as yielded by batch.sheet.iter_sheet_rows
+    Returns (output_name, filled_html).
+    """
+    client_name = row.get('CLIENT', '')
+    address = row.get('ADDRESS', '')
+    pan = row.get('PAN', '')
+    gst = row.get('GST', '').strip()
+    client_state_raw = row.get('CLIENT_STATE', '').strip()
+    place_of_supply = row.get('PLACE_OF_SUPPLY', '').strip()
+    has_hsn_column = 'HSN' in row
+
+    is_international = False
+    currency_symbol = '₹'
+    currency_name = 'Rupees'
+    party_state = client_state_raw
+    party_state_code = state_codes.get(client_state_raw, '')
+    place_of_supply_display = place_of_supply or client_state_raw
+
+    if client_state_raw.lower().startswith('outside'):
+        intl = parse_international_client(client_state_raw)
+        if intl:
+            is_international = True
+            # An unknown currency shows as "null" in the Apps Script output
+            currency_symbol = intl['currencySymbol'] if intl['currencySymbol'] is not None else 'null'
+            currency_name = intl['currencyName']
+            party_state = intl['partyState']
+            party_state_code = intl['stateCode']
+            place_of_supply_display = 'Outside India'
+
+    has_gst = prepared.is_gst and not is_international
+    has_hsn = has_gst and has_hsn_column
+
+    items = parse_multiple_items(row.get('DESCRIPTION', ''), row.get('COST', '') or '0', row.get('HSN', ''))
+
+    base_amount = 0
+    for item in items:
+        base_amount += item['amount']
+    gst_amount = 0
+    total_amount = base_amount
+    if has_gst:
+        gst_amount = base_amount * 0.18
+        total_amount = base_amount + gst_amount
+
+    item_rows_html = generate_item_rows_html(
+        items, has_gst, has_hsn, currency_symbol, is_international,
+        prepared.company_state, '' if is_international else client_state_raw, base_amount
+    )
+
+    filled = prepared.compiled.render(
+        values={
+            'INVOICE_NUMBER': invoice_number,
+            'DATE': format_date_human(invoice_date),
+            'DUE_DATE': format_date_human(invoice_date),
+            'PARTY_NAME': client_name,
+            'PARTY_ADDRESS_HTML': convert_to_multi_line_address(address),
+            'PARTY_PAN': 'N/A' if is_international else pan,
+            'PARTY_GST': 'N/A' if is_international else (gst or 'N/A'),
+            'PARTY_STATE': party_state,
+            'PARTY_STATE_CODE': party_state_code,
+            'PLACE_OF_SUPPLY': place_of_supply_display,
+            'ITEM_ROWS': item_rows_html,
+            'TOTAL_BASE_DISPLAY': format_currency(base_amount, currency_symbol, is_international),
+            'GST_DISPLAY': format_currency(gst_amount, currency_symbol, False),
+            'TOTAL_DISPLAY': format_currency(total_amount, currency_symbol, is_international),
+            'AMOUNT_WORDS': number_to_words_with_currency(total_amount, currency_name, is_international),
+        },
+        conditions={
+            'INTERNATIONAL_PARTY': is_international,
+            'HAS_HSN': has_hsn
+        },
+        regions={'TOTAL_GST': has_gst},
+        missing=''
+    )
+    return output_name(invoice_number, client_name), filled
@@ -0,0 +1,62 @@
+import re
+
+_TEMPLATE_NUMBER = re.compile(r'<div class="meta-line"><strong>Invoice No:</strong>\s*(\d{4})/Inv/(\d{3})</div>')
+_ANY_NUMBER = re.compile(r'\d{4}/Inv/\d{3}')
+_YEAR = re.compile(r'^(\d{4})/')
+_INT_PREFIX = re.compile(r'\s*([+-]?\d+)')
+
+
+def extract_starting_invoice_number(template_html):
+    """Port of extractStartingInvoiceNumber: (year, number) baked into the template"""
+    match = _TEMPLATE_NUMBER.search(template_html)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return None
+
+
+def _parse_int(text):
+    match = _INT_PREFIX.match(text)
+    return int(match.group(1)) if match else None
+
+
+def first_invoice_number(existing, year, template_number=None):
+    """
+    Port of the numbering rules in generateInvoiceNumber.
+    existing: iterable of (status, invoice_number) for rows already in the sheet
+    template_number: (year, number) from extract_starting_invoice_number
+    Returns the next sequence number for the given year.
+    """
+    prefix = f'{year}/Inv/'
+    max_number = 0
+    has_generated = False
+    has_previous_year = False
+
+    for status, invoice_number in existing:
+        status = status.strip()
+        invoice_number = invoice_number.strip()
+        if status != 'Generated':
+            continue
+        if invoice_number.startswith(prefix):
+            has_generated = True
+            parts = invoice_number.split('/')
+            if len(parts) == 3:
+                index = _parse_int(parts[2])
+                if index is not None and index > max_number:
+                    max_number = index
+        elif _ANY_NUMBER.search(invoice_number):
+            year_match = _YEAR.match(invoice_number)
+            if year_match and int(year_match.group(1)) < year:
+                has_previous_year = True
+
+    # Same precedence as the Apps Script: current-year invoices win over a year rollover
+    if has_generated:
+        return max_number + 1
+    if has_previous_year:
+        return 1
+    if template_number and template_number[0] == year:
+        return template_number[1] + 1
+    return 1
+
+
+def format_invoice_number(year, number):
+    return f'{year}/Inv/{str(number).zfill(3)}'
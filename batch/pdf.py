@@ -0,0 +1,273 @@
+import html as html_lib
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# Local replacement for htmlToPdfFile in script.gs: filled invoice HTML -> PDF bytes
+
+
+class PdfRenderError(Exception):
+    pass
+
+
+class PdfTimeout(PdfRenderError):
+    pass
+
+
+class PdfBackend:
+    """Converts one filled invoice HTML document to PDF bytes"""
+
+    name = None
+
+    def render(self, html):
+        raise NotImplementedError
+
+
+class WeasyPrintBackend(PdfBackend):
+    """In-process rendering with WeasyPrint (pip install weasyprint)"""
+
+    name = 'weasyprint'
+
+    def __init__(self):
+        try:
+            from weasyprint import HTML
+        except ImportError:
+            raise PdfRenderError('The weasyprint backend requires weasyprint (pip install weasyprint)')
+        self._html = HTML
+
+    def render(self, html):
+        return self._html(string=html).write_pdf()
+
+
+class ChromeBackend(PdfBackend):
+    """Headless Chrome/Chromium print-to-PDF, binary from $CHROME_BIN or PATH"""
+
+    name = 'chrome'
+    BINARIES = ('chromium', 'chromium-browser', 'google-chrome', 'google-chrome-stable')
+
+    def __init__(self, binary=None):
+        binary = binary or os.environ.get('CHROME_BIN')
+        if not binary:
+            binary = next((b for b in self.BINARIES if shutil.which(b)), None)
+        if not binary:
+            raise PdfRenderError('The chrome backend needs Chrome or Chromium on PATH (or $CHROME_BIN)')
+        self.binary = binary
+
+    def render(self, html):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'invoice.html')
+            target = os.path.join(tmp, 'invoice.pdf')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(html)
+            subprocess.run(
+                [self.binary, '--headless', '--disable-gpu', '--no-sandbox',
+                 '--no-pdf-header-footer', '--print-to-pdf=' + target, 'file://' + source],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+            )
+            with open(target, 'rb') as f:
+                return f.read()
+
+
+_BLOCK_END = re.compile(r'<br\s*/?>|</(?:div|p|tr|h[1-6]|li|table)>', re.IGNORECASE)
+_DROP = re.compile(r'<(style|script|head)\b.*?</\1>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'[ \t\r\f\v]+')
+
+
+class StandInBackend(PdfBackend):
+    """
+    Deterministic text-only PDF for tests and dry runs: the same HTML always gives
+    the same bytes, with no dependencies and no timestamps.
+    """
+
+    name = 'stand-in'
+    LINES_PER_PAGE = 60
+    LINE_WIDTH = 95
+
+    def _lines(self, html):
+        text = _DROP.sub('', html)
+        text = _BLOCK_END.sub('\n', text)
+        text = html_lib.unescape(_TAG.sub(' ', text))
+        lines = []
+        for line in text.split('\n'):
+            line = _SPACES.sub(' ', line).strip()
+            while line:
+                lines.append(line[:self.LINE_WIDTH])
+                line = line[self.LINE_WIDTH:]
+        return lines or ['']
+
+    def render(self, html):
+        lines = self._lines(html)
+        pages = [lines[i:i + self.LINES_PER_PAGE] for i in range(0, len(lines), self.LINES_PER_PAGE)]
+
+        # Objects: 1 catalog, 2 page tree, 3 font, then a page and a content stream per page
+        objects = [None, None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+        kids = []
+        for page_lines in pages:
+            ops = ['BT', '/F1 9 Tf', '11 TL', '40 800 Td']
+            for line in page_lines:
+                escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+                ops.append(f'({escaped}) Tj T*')
+            ops.append('ET')
+            stream = '\n'.join(ops).encode('latin-1', 'replace')
+            page_id = len(objects) + 1
+            objects.append(
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>'.encode()
+            )
+            objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+            kids.append(f'{page_id} 0 R')
+        objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()
+
+        out = bytearray(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            out += b'%010d 00000 n \n' % offset
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(out)
+
+
+BACKENDS = {cls.name: cls for cls in (StandInBackend, WeasyPrintBackend, ChromeBackend)}
+
+
+def get_backend(name):
+    """Backend by BACKENDS name; a PdfBackend subclass is used as given"""
+    if isinstance(name, type) and issubclass(name, PdfBackend):
+        return name()
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise PdfRenderError(f'Unknown PDF backend {name!r}, expected one of: {", ".join(BACKENDS)}')
+
+
+class DirectorySink:
+    """Upload sink that writes finished PDFs into a local directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, name, pdf):
+        path = os.path.join(self.directory, name + '.pdf')
+        with open(path, 'wb') as f:
+            f.write(pdf)
+        return path
+
+
+# ---------- Worker pool ----------
+
+# Per-worker backend, set once by _init_worker
+_backend = None
+
+
+def _init_worker(backend_name):
+    global _backend
+    _backend = get_backend(backend_name)
+
+
+def _on_alarm(signum, frame):
+    raise PdfTimeout('PDF conversion timed out')
+
+
+def _convert(name, html, timeout):
+    # Jobs run on the worker's main thread, so SIGALRM can interrupt a stuck conversion
+    use_alarm = timeout and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return _backend.render(html)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def convert_many(documents, backend='stand-in', workers=None, timeout=60, retries=2):
+    """
+    Convert (name, html) documents to PDF in a bounded process pool.
+    backend is a BACKENDS name or a PdfBackend subclass (importable by the workers).
+    Yields (name, pdf_bytes, error, attempts) as conversions finish; pdf_bytes is None and
+    error holds the last failure once a document has used up its retries.
+    """
+    # Fail fast in the parent if the backend can't be set up at all
+    get_backend(backend)
+    workers = workers or os.cpu_count() or 1
+    documents = iter(documents)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend,))
+    # future -> (name, html, attempts so far)
+    pending = {}
+    # (name, html, attempts, isolate); isolated retries run alone after a worker crash
+    retry_queue = deque()
+    isolating = False
+
+    def submit(name, html, attempts):
+        pending[pool.submit(_convert, name, html, timeout)] = (name, html, attempts)
+
+    try:
+        exhausted = False
+        while True:
+            # Keep a bounded number of documents in flight, retries first
+            while len(pending) < workers * 2 and not isolating:
+                if retry_queue:
+                    if retry_queue[0][3]:
+                        if pending:
+                            break
+                        isolating = True
+                    name, html, attempts, _ = retry_queue.popleft()
+                    submit(name, html, attempts)
+                    continue
+                if exhausted:
+                    break
+                document = next(documents, None)
+                if document is None:
+                    exhausted = True
+                    break
+                submit(document[0], document[1], 0)
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                name, html, attempts = pending.pop(future)
+                attempts += 1
+                try:
+                    yield name, future.result(), None, attempts
+                    continue
+                except BrokenProcessPool as e:
+                    broken.append((name, html, attempts))
+                    error = e
+                except Exception as e:
+                    error = e
+                if attempts > retries:
+                    yield name, None, f'{type(error).__name__}: {error}', attempts
+                elif not isinstance(error, BrokenProcessPool):
+                    retry_queue.append((name, html, attempts, False))
+
+            if broken:
+                # A worker died and took the pool with it. Nothing says which document did it,
+                # so everything that was in flight is retried one at a time.
+                for name, html, attempts in broken:
+                    if attempts <= retries:
+                        retry_queue.append((name, html, attempts, True))
+                for name, html, attempts in pending.values():
+                    retry_queue.append((name, html, attempts, True))
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend,))
+            if not pending:
+                isolating = False
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,87 @@
+import csv
+import io
+import os
+
+# Column headers, same as HEADER_NAMES in script.gs
+HEADER_NAMES = {
+    'CLIENT': 'Client Name',
+    'COST': 'Cost to Client',
+    'DESCRIPTION': 'Description',
+    'HSN': 'HSN/SAC',
+    'ADDRESS': 'Client Address',
+    'PAN': 'Client PAN',
+    'GST': 'Client GSTIN',
+    'CLIENT_STATE': 'Client State',
+    'PLACE_OF_SUPPLY': 'Place of Supply',
+    'GENERATE': 'Generate(Yes/No)',
+    'STATUS': 'Status',
+    'INVOICE_NUM': 'Invoice Number',
+    'INVOICE_DATE': 'Invoice Date'
+}
+
+
+def _cell_text(value):
+    """Cell value as the string Apps Script would see"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _header_map(header_row):
+    """Port of getHeaderIndexMap: trimmed header -> 0-based column"""
+    header_map = {}
+    for i, raw in enumerate(header_row):
+        key = _cell_text(raw).strip()
+        if key:
+            header_map[key] = i
+    return header_map
+
+
+def _iter_csv(path):
+    if hasattr(path, 'read'):
+        # Uploaded file object, e.g. from st.file_uploader
+        yield from csv.reader(io.TextIOWrapper(path, encoding='utf-8-sig', newline=''))
+        return
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from csv.reader(f)
+
+
+def _iter_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError('Reading .xlsx exports requires openpyxl (pip install openpyxl)')
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def iter_sheet_rows(path):
+    """
+    Stream rows of a CSV/XLSX sheet export, given as a path or a binary file object with a name.
+    Yields (row_number, {field: text}) where row_number matches the sheet (header is row 1)
+    and field is a HEADER_NAMES key. Missing columns are left out of the dict.
+    """
+    ext = os.path.splitext(getattr(path, 'name', path))[1].lower()
+    rows = _iter_xlsx(path) if ext in ('.xlsx', '.xlsm') else _iter_csv(path)
+
+    header_map = None
+    for row_number, row in enumerate(rows, start=1):
+        if header_map is None:
+            header_map = _header_map(row)
+            columns = {
+                field: header_map[name]
+                for field, name in HEADER_NAMES.items()
+                if name in header_map
+            }
+            continue
+        values = {
+            field: _cell_text(row[col]) if col < len(row) else ''
+            for field, col in columns.items()
+        }
+        yield row_number, values
@@ -0,0 +1,54 @@
+"""
+Per-call cost of the money kernel when formatting a large batch of amounts.
+
+    python -m benchmarks.bench_money [--count 1000000]
+"""
+import argparse
+import json
+import random
+import time
+
+from utils.money import (
+    amounts_in_words,
+    format_currency,
+    format_money_many,
+    group_many,
+    number_to_words_with_currency,
+)
+
+
+def _time(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {'name': label, 'count': count, 'seconds': round(elapsed, 4), 'ns_per_call': round(elapsed / count * 1e9, 1)}
+
+
+def run(count, seed=0):
+    rng = random.Random(seed)
+    # Invoice-sized amounts: up to 10 crore, in paise
+    minors = [rng.randrange(0, 10 ** 10) for _ in range(count)]
+    floats = [m / 100 for m in minors]
+
+    return [
+        _time('format_money_many INR', count, lambda: format_money_many(minors, 'INR')),
+        _time('format_money_many USD', count, lambda: format_money_many(minors, 'USD')),
+        _time('group_many indian', count, lambda: group_many(minors, indian=True)),
+        _time('amounts_in_words INR', count, lambda: amounts_in_words(minors, 'INR')),
+        _time('amounts_in_words USD', count, lambda: amounts_in_words(minors, 'USD')),
+        _time('format_currency (script.gs port)', count, lambda: [format_currency(f, '₹', False) for f in floats]),
+        _time('number_to_words_with_currency (script.gs port)', count,
+              lambda: [number_to_words_with_currency(f, 'Rupees', False) for f in floats]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.count, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
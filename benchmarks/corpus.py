@@ -0,0 +1,114 @@
+"""
+Seeded synthetic inputs for the benchmarks: company profiles, long addresses,
+large QR images and many-item descriptions. The same seed always gives the same corpus.
+"""
+import io
+import random
+
+from utils.bank import format_bank_details
+
+_WORDS = ['Sunrise', 'Tech', 'Global', 'Infra', 'Solutions', 'Traders', 'Digital', 'Ventures',
+          'Labs', 'Exports', 'Systems', 'Consulting', 'Media', 'Works', 'Logistics']
+_STREETS = ['MG Road', 'Link Road', 'Station Road', 'Ring Road', 'Outer Ring Road', 'Park Street',
+            'Brigade Road', 'Hill Road', 'Nehru Nagar', 'Gandhi Marg']
+_AREAS = ['Andheri East', 'Koramangala 5th Block', 'Salt Lake Sector V', 'Banjara Hills',
+          'Hinjewadi Phase 2', 'Whitefield', 'Powai', 'Sector 62', 'Velachery', 'Gachibowli']
+_CITIES = [('Mumbai', 'Maharashtra', '27'), ('Bengaluru', 'Karnataka', '29'), ('Kolkata', 'West Bengal', '19'),
+           ('Hyderabad', 'Telangana', '36'), ('Pune', 'Maharashtra', '27'), ('Noida', 'Uttar Pradesh', '9'),
+           ('Chennai', 'Tamil Nadu', '33'), ('Delhi', 'Delhi', '7')]
+_SERVICES = ['Consulting', 'Software Development', 'Annual Maintenance', 'Cloud Hosting', 'Design Retainer',
+             'Training', 'Support Hours', 'License Fee', 'Audit', 'Content Writing']
+_DELIMITERS = [', ', ',', ' , ', '; ', ' - ', '\n', ',  ']
+
+
+def _name(rng):
+    return ' '.join(rng.sample(_WORDS, rng.randint(2, 4))) + rng.choice([' Pvt Ltd', ' LLP', ' Private Limited', ''])
+
+
+def long_address(rng):
+    """Address with 3-12 parts, mixed delimiters and occasional very long parts"""
+    city, state, _ = rng.choice(_CITIES)
+    parts = [f'{rng.randint(1, 999)}{rng.choice(["", "A", "/B"])}',
+             f'{rng.choice(["Floor", "Unit", "Shop", "Office"])} {rng.randint(1, 40)}']
+    parts += rng.sample(_STREETS, rng.randint(1, 4))
+    parts += rng.sample(_AREAS, rng.randint(1, 4))
+    if rng.random() < 0.2:
+        parts.append('Near ' + ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(8, 20))))
+    parts += [city, f'{state} - {rng.randint(100000, 999999)}']
+    out = parts[0]
+    for part in parts[1:]:
+        out += rng.choice(_DELIMITERS) + part
+    return out
+
+
+def company_profile(rng):
+    """company_data dict as app.py passes it to generate_template_html"""
+    city, state, code = rng.choice(_CITIES)
+    pan = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(5)) + f'{rng.randint(0, 9999):04d}' + 'F'
+    return {
+        'name': _name(rng),
+        'address_html': long_address(rng).replace('\n', '<br>'),
+        'state': state,
+        'state_code': code,
+        'udyam': f'UDYAM-{code.zfill(2)}-{rng.randint(0, 99):02d}-{rng.randint(0, 9999999):07d}',
+        'gst': f'{code.zfill(2)}{pan}1Z{rng.randint(0, 9)}',
+        'contact': f'+91-{rng.randint(7000000000, 9999999999)}',
+        'pan': pan,
+        'bank_html': format_bank_details(_name(rng), 'HDFC Bank', str(rng.randint(10 ** 13, 10 ** 14)), f'HDFC000{rng.randint(1000, 9999)}'),
+        'qr_code': None,
+        'lut_number': f'AD{code.zfill(2)}{rng.randint(100000, 999999)}',
+        'lut_validity_from': '01-Apr-2025',
+        'lut_validity_to': '31-Mar-2026',
+        'invoice_number': f'2025/Inv/{rng.randint(0, 999):03d}',
+    }
+
+
+def item_description(rng, count):
+    """Description/cost/HSN cells for a row with count items, some with narrations"""
+    descriptions, costs, hsn = [], [], []
+    for _ in range(count):
+        item = rng.choice(_SERVICES)
+        if rng.random() < 0.5:
+            item += ' (' + ' | '.join(f'{rng.choice(_AREAS)} phase {rng.randint(1, 9)}' for _ in range(rng.randint(1, 4))) + ')'
+        descriptions.append(item)
+        costs.append(f'{rng.randint(500, 500000):,}.{rng.randint(0, 99):02d}')
+        hsn.append(str(rng.choice([998311, 998313, 998314, 997331])))
+    return ' | '.join(descriptions), ' | '.join(costs), ' | '.join(hsn)
+
+
+def qr_image(rng, size=2400, modules=41):
+    """
+    PNG of a QR-like module grid on a white page with a gray border, like a phone photo
+    of a printed code. Returns None if Pillow is not installed.
+    """
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return None
+    img = Image.new('RGB', (size, size), (236, 236, 232))
+    draw = ImageDraw.Draw(img)
+    cell = size // (modules + 16)
+    origin = (size - cell * modules) // 2
+    draw.rectangle([origin - 4 * cell, origin - 4 * cell, origin + (modules + 4) * cell, origin + (modules + 4) * cell],
+                   fill=(255, 255, 255))
+    for y in range(modules):
+        for x in range(modules):
+            if rng.random() < 0.5:
+                x0, y0 = origin + x * cell, origin + y * cell
+                draw.rectangle([x0, y0, x0 + cell - 1, y0 + cell - 1], fill=(0, 0, 0))
+    out = io.BytesIO()
+    img.save(out, format='PNG')
+    return out.getvalue()
+
+
+def build_corpus(seed=0, scale=1):
+    """All benchmark inputs; scale multiplies the number of items"""
+    rng = random.Random(seed)
+    images = [qr_image(rng, size=rng.choice((1600, 2400, 3000))) for _ in range(2)]
+    return {
+        'companies': [company_profile(rng) for _ in range(50 * scale)],
+        'addresses': [long_address(rng) for _ in range(2000 * scale)],
+        'descriptions': [item_description(rng, rng.randint(1, 40)) for _ in range(200 * scale)],
+        'amounts': [rng.randrange(0, 10 ** 10) for _ in range(20000 * scale)],
+        'qr_images': [image for image in images if image is not None],
+    }
@@ -0,0 +1,108 @@
+"""
+Regression corpus for the currency resolver.
+
+    python -m benchmarks.currency_corpus            # check, exit 1 on any difference
+    python -m benchmarks.currency_corpus --update   # rewrite the stored resolutions
+
+Every query is resolved by fuzzy_currency (alias index + bounded edit distance) and by
+fuzzy_currency_reference (the straight script.gs port); both must agree, and must match
+the resolutions stored in currency_corpus.json. A change to CURRENCIES that moves any
+stored resolution shows up here and has to be committed together with --update.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from utils.currency import CURRENCIES, fuzzy_currency, fuzzy_currency_reference
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'currency_corpus.json')
+
+_LETTERS = 'abcdefghijklmnopqrstuvwxyz '
+
+
+def _typos(text, rng, count):
+    """Random single and double edits of text"""
+    out = []
+    for _ in range(count):
+        chars = list(text)
+        for _ in range(rng.choice((1, 1, 2))):
+            op = rng.randrange(4)
+            pos = rng.randrange(len(chars) + 1)
+            if op == 0 and chars:
+                del chars[min(pos, len(chars) - 1)]
+            elif op == 1:
+                chars.insert(pos, rng.choice(_LETTERS))
+            elif op == 2 and chars:
+                chars[min(pos, len(chars) - 1)] = rng.choice(_LETTERS)
+            elif len(chars) > 1:
+                i = min(pos, len(chars) - 2)
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        out.append(''.join(chars))
+    return out
+
+
+def build_queries(seed=0, typos_per_candidate=6):
+    """Deterministic query set: every spelling, case/punctuation variants, typos and junk"""
+    rng = random.Random(seed)
+    queries = ['', ' ', '$', '()', '123', 'Outside India', 'xyz', 'dollars and cents', 'ruppes']
+    for cur in CURRENCIES:
+        for cand in [cur['code'], cur['name'], cur['symbol']] + cur['aliases']:
+            queries += [cand, cand.upper(), ' ' + cand.title() + ' ', cand + '.', cand + 's']
+            queries += _typos(cand.lower(), rng, typos_per_candidate)
+    for _ in range(200):
+        queries.append(''.join(rng.choice(_LETTERS) for _ in range(rng.randint(1, 14))))
+    # Keep first occurrences, order is stable for a given seed
+    return list(dict.fromkeys(queries))
+
+
+def _resolution(result):
+    return [result['code'], result['distance']] if result['ok'] else None
+
+
+def check(corpus):
+    """List of (query, problem) for every query that resolves differently"""
+    problems = []
+    for query, expected in corpus.items():
+        fast = _resolution(fuzzy_currency(query))
+        reference = _resolution(fuzzy_currency_reference(query))
+        if fast != reference:
+            problems.append((query, f'index {fast} != reference {reference}'))
+        elif fast != expected:
+            problems.append((query, f'stored {expected} != now {fast}'))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.currency_corpus')
+    parser.add_argument('--update', action='store_true', help='Rewrite currency_corpus.json from the reference resolver')
+    args = parser.parse_args(argv)
+
+    if args.update:
+        corpus = {q: _resolution(fuzzy_currency_reference(q)) for q in build_queries()}
+        # One query per line so corpus diffs stay readable
+        lines = [
+            json.dumps(q, ensure_ascii=False) + ': ' + json.dumps(corpus[q])
+            for q in sorted(corpus)
+        ]
+        with open(CORPUS_PATH, 'w', encoding='utf-8') as f:
+            f.write('{\n' + ',\n'.join(lines) + '\n}\n')
+        print(f'Wrote {len(corpus)} resolutions to {CORPUS_PATH}')
+        return 0
+
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    # Freshly generated queries are checked against the reference too
+    for query in build_queries():
+        corpus.setdefault(query, _resolution(fuzzy_currency_reference(query)))
+
+    problems = check(corpus)
+    for query, problem in problems:
+        print(f'{query!r}: {problem}')
+    print(f'{len(corpus) - len(problems)}/{len(corpus)} queries resolve identically')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""
+Micro-benchmarks for the utils/ hot paths on a seeded synthetic corpus.
+
+    python -m benchmarks                      # run, compare with baselines.json, print JSON
+    python -m benchmarks --only preview       # benchmarks whose name contains "preview"
+    python -m benchmarks --save-baseline      # store this machine's results as the baseline
+
+Exits with status 1 when a benchmark is slower than its baseline by more than --threshold,
+or slower than its budget in BUDGETS_NS.
+Everything runs offline; QR image benchmarks are skipped without Pillow.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.corpus import build_corpus
+from render.__main__ import COLD_START_BUDGET_MS
+from utils.address import convert_address_to_three_lines
+from utils.assets import get_asset
+from utils.bank import format_bank_details
+from utils.compact import compact_template, compaction_problems
+from utils.engine import compile_template
+from utils.generate import generate_template_html
+from utils.image import QR_STORE, image_to_base64
+from utils.money import amounts_in_words, format_money_many
+from utils.preview import generate_preview_html, process_conditionals
+from utils.script import load_script_template, minify_script, read_script_file, specialize_script, update_script_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+DEFAULT_THRESHOLD = 0.25
+
+# Seconds each timed run lasts at least, to keep timer and scheduler noise small
+MIN_TIMING = 0.2
+
+# name -> setup(corpus) returning (workload, items) or None to skip
+BENCHMARKS = {}
+
+# name -> absolute limit in ns per item, checked on top of the baseline comparison
+BUDGETS_NS = {
+    'render CLI cold start (template)': COLD_START_BUDGET_MS * 1e6,
+}
+
+# Fixed profile for the CLI benchmark; the corpus GSTINs don't carry valid check characters
+_CLI_PROFILE = {
+    'name': 'Sample Traders LLP', 'address': '12, Sample Street\nAndheri East, Mumbai\nMaharashtra - 400069',
+    'state': 'Maharashtra', 'contact': '+91-9820000000', 'pan': 'AAPFU0939F',
+    'udyam': 'UDYAM-MH-12-0012345', 'gst': '27AAPFU0939F1ZV', 'bank_ac_holder': 'Sample Traders LLP',
+    'bank_name': 'HDFC Bank', 'bank_ac_no': '50200012345678', 'bank_ifsc': 'HDFC0001234',
+}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class _Upload:
+    """Stand-in for a Streamlit UploadedFile"""
+
+    def __init__(self, data):
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+# ---------- Benchmarks ----------
+
+@benchmark('generate_template_html')
+def _generate(corpus):
+    companies = corpus['companies']
+
+    def run():
+        for i, company in enumerate(companies):
+            generate_template_html(company, '#1e3a8a', i % 2 == 0, i % 3 != 0, False)
+    return run, len(companies)
+
+
+@benchmark('generate_preview_html')
+def _preview(corpus):
+    templates = [generate_template_html(c, '#3b0764', True, True, False) for c in corpus['companies'][:10]]
+    variants = [(True, False), (True, True), (False, False), (False, True)]
+
+    def run():
+        for template in templates:
+            for has_gst, is_international in variants:
+                generate_preview_html(template, has_gst, is_international)
+    return run, len(templates) * len(variants)
+
+
+@benchmark('process_conditionals')
+def _conditionals(corpus):
+    template = get_asset('template.html')
+    conditions = [
+        {'INTERNATIONAL_PARTY': intl, 'HAS_HSN': hsn, 'GST': gst}
+        for intl in (False, True) for hsn in (False, True) for gst in (False, True)
+    ]
+
+    def run():
+        for _ in range(25):
+            for condition in conditions:
+                process_conditionals(template, condition)
+    return run, 25 * len(conditions)
+
+
+@benchmark('compile_template (cold)')
+def _compile(corpus):
+    template = get_asset('template.html')
+
+    def run():
+        for _ in range(20):
+            compile_template(template)
+    return run, 20
+
+
+@benchmark('compact_template + checks')
+def _compact(corpus):
+    templates = [generate_template_html(c, '#3b0764', i % 2 == 0, True, False) for i, c in enumerate(corpus['companies'][:5])]
+
+    # compact_checked itself is memoized, so time the work it does on a miss
+    def run():
+        for template in templates:
+            compaction_problems(template, compact_template(template))
+    return run, len(templates)
+
+
+@benchmark('convert_address_to_three_lines')
+def _address(corpus):
+    addresses = corpus['addresses']
+
+    def run():
+        for address in addresses:
+            convert_address_to_three_lines(address)
+    return run, len(addresses)
+
+
+@benchmark('format_bank_details')
+def _bank(corpus):
+    rows = [(c['name'], 'HDFC Bank', c['contact'], c['pan']) for c in corpus['companies']] * 40
+
+    def run():
+        for row in rows:
+            format_bank_details(*row)
+    return run, len(rows)
+
+
+@benchmark('image_to_base64 (cold)')
+def _qr_cold(corpus):
+    uploads = [_Upload(data) for data in corpus['qr_images']]
+    if not uploads:
+        return None
+
+    def run():
+        for upload in uploads:
+            QR_STORE.clear()
+            image_to_base64(upload)
+    return run, len(uploads)
+
+
+@benchmark('image_to_base64 (repeat upload)')
+def _qr_warm(corpus):
+    uploads = [_Upload(data) for data in corpus['qr_images']]
+    if not uploads:
+        return None
+    for upload in uploads:
+        image_to_base64(upload)
+
+    def run():
+        for _ in range(50):
+            for upload in uploads:
+                image_to_base64(upload)
+    return run, 50 * len(uploads)
+
+
+# The script benchmarks time the build without the batch entry point against the long-standing
+# baselines, and the full script.gs (batch code included) against baselines of its own
+_WITHOUT_BATCH = (('BATCH', False),)
+
+
+def _script_source(batch):
+    script = read_script_file()
+    return script if batch else specialize_script(script, _WITHOUT_BATCH)
+
+
+def _script_config(batch):
+    def setup(corpus):
+        script = _script_source(batch)
+        ids = [(c['pan'] * 3, c['gst'] * 2) for c in corpus['companies']]
+
+        def run():
+            for template_id, folder_id in ids:
+                update_script_config(script, template_id, folder_id)
+        return run, len(ids)
+    return setup
+
+
+def _script_splice(batch):
+    def setup(corpus):
+        tokens = load_script_template(features=None if batch else _WITHOUT_BATCH)
+        ids = [(c['pan'] * 3, c['gst'] * 2) for c in corpus['companies']]
+
+        # configured_script caches whole builds, so time the splice it does on a miss
+        def run():
+            for template_id, folder_id in ids:
+                tokens.configure({'TEMPLATE_FILE_ID': template_id, 'DEST_FOLDER_ID': folder_id})
+        return run, len(ids)
+    return setup
+
+
+def _script_minify(batch):
+    def setup(corpus):
+        script = _script_source(batch)
+        return (lambda: minify_script(script)), 1
+    return setup
+
+
+for _suffix, _batch in (('', False), (' (batch build)', True)):
+    benchmark('update_script_config' + _suffix)(_script_config(_batch))
+    benchmark('ScriptTemplate.configure' + _suffix)(_script_splice(_batch))
+    benchmark('minify_script' + _suffix)(_script_minify(_batch))
+
+
+@benchmark('format_money_many INR')
+def _money(corpus):
+    amounts = corpus['amounts']
+    return (lambda: format_money_many(amounts, 'INR')), len(amounts)
+
+
+@benchmark('amounts_in_words INR')
+def _words(corpus):
+    amounts = corpus['amounts']
+    return (lambda: amounts_in_words(amounts, 'INR')), len(amounts)
+
+
+@benchmark('render CLI cold start (template)')
+def _cli_cold_start(corpus):
+    profile = json.dumps(_CLI_PROFILE).encode('utf-8')
+    command = [sys.executable, '-m', 'render', 'template', '-']
+
+    # A whole interpreter per call, the way cron jobs and other services run it
+    def run():
+        subprocess.run(command, input=profile, stdout=subprocess.DEVNULL, check=True, cwd=ROOT)
+    return run, 1
+
+
+# ---------- Runner ----------
+
+def run_benchmarks(corpus, only=None, repeat=5):
+    results = []
+    for name, setup in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        prepared = setup(corpus)
+        if prepared is None:
+            results.append({'name': name, 'skipped': True})
+            continue
+        workload, items = prepared
+        # Warm-up run doubles as calibration: short workloads are looped up to MIN_TIMING
+        start = time.perf_counter()
+        workload()
+        loops = max(1, math.ceil(MIN_TIMING / max(time.perf_counter() - start, 1e-9)))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                workload()
+            timings.append((time.perf_counter() - start) / loops)
+        best = min(timings)
+        results.append({
+            'name': name,
+            'items': items,
+            'loops': loops,
+            'best_s': round(best, 6),
+            'median_s': round(statistics.median(timings), 6),
+            'ns_per_item': round(best / items * 1e9, 1),
+        })
+    return results
+
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('ns_per_item', {})
+
+
+def compare(results, baselines, threshold=DEFAULT_THRESHOLD):
+    """Annotate results with their baseline ratio and budget, returns the names that regressed"""
+    regressions = []
+    for result in results:
+        if result.get('skipped'):
+            continue
+        over = False
+        budget = BUDGETS_NS.get(result['name'])
+        if budget:
+            result['budget_ns_per_item'] = budget
+            over = result['ns_per_item'] > budget
+        baseline = baselines.get(result['name'])
+        if baseline:
+            ratio = result['ns_per_item'] / baseline
+            result['baseline_ns_per_item'] = baseline
+            result['ratio'] = round(ratio, 3)
+            over = over or ratio > 1 + threshold
+        if over:
+            regressions.append(result['name'])
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Micro-benchmarks for the utils/ hot paths')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=int, default=1, help='Corpus size multiplier')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark, the best one counts')
+    parser.add_argument('--only', help='Run benchmarks whose name contains this text')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown against the baseline (default: 0.25 = 25%%)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write these results as the new baseline')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.seed, args.scale)
+    results = run_benchmarks(corpus, args.only, args.repeat)
+    regressions = compare(results, load_baselines(args.baseline), args.threshold)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'scale': args.scale,
+            'repeat': args.repeat,
+            'threshold': args.threshold,
+        },
+        'results': results,
+        'regressions': regressions,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+    if args.save_baseline:
+        baselines = load_baselines(args.baseline)
+        baselines.update({r['name']: r['ns_per_item'] for r in results if not r.get('skipped')})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'meta': report['meta'], 'ns_per_item': baselines}, f, indent=2)
+            f.write('\n')
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Headless rendering of a company's invoice template, preview and configured script.gs,
+without Streamlit. Profiles are JSON objects with the keys of utils/company.py.
+
+    python -m render template profile.json > invoice_template.html
+    python -m render preview profile.json --international -o preview.html
+    python -m render script profile.json --template-id ... --folder-id ... > script.gs
+    cat profile.json | python -m render template -
+
+Only argparse/json are imported up front; each command imports the utils/ modules it
+uses. A cold start stays within COLD_START_BUDGET_MS (checked by python -m benchmarks).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+_STARTED = time.perf_counter()
+
+# Wall time for a cold `python -m render template` process, interpreter startup included
+COLD_START_BUDGET_MS = 150
+
+
+class ProfileError(Exception):
+    """The profile could not be read or failed the generator form's checks"""
+
+
+def _timed(timings, name, since):
+    now = time.perf_counter()
+    timings.append((name, (now - since) * 1000))
+    return now
+
+
+def read_profile(path):
+    """(profile dict, directory qr_path is relative to) from a JSON file, or stdin for '-'"""
+    try:
+        if path == '-':
+            profile, base_dir = json.load(sys.stdin), os.getcwd()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(path))
+    except OSError as e:
+        raise ProfileError(f'{e.strerror}: {path}')
+    except ValueError as e:
+        raise ProfileError(f'profile is not valid JSON: {e}')
+    if not isinstance(profile, dict):
+        raise ProfileError('profile must be a JSON object')
+
+    from utils.company import PROFILE_FIELDS
+    unknown = sorted(key for key in profile if key not in PROFILE_FIELDS)
+    if unknown:
+        raise ProfileError(f'unknown profile key(s): {", ".join(unknown)}')
+    return profile, base_dir
+
+
+def build_template(profile, base_dir, year, compact=False):
+    """(template, flags) for a profile; raises ProfileError with the form's messages"""
+    from utils.company import prepare_company
+    from utils.generate import generate_template_html
+    from utils.state import read_state_codes
+
+    company_data, color, flags, problems = prepare_company(profile, base_dir, read_state_codes(), year)
+    if problems:
+        raise ProfileError('; '.join(problems))
+    template = generate_template_html(company_data, color, flags['has_gst'], flags['has_msme'], bool(company_data['qr_code']))
+    if template is None:
+        raise RuntimeError('template.html could not be loaded')
+    if compact:
+        # Imported here: html.parser is only needed for the equivalence checks
+        from utils.compact import compact_checked
+        template, compact_problems = compact_checked(template)
+        for problem in compact_problems:
+            print(f'left uncompacted: {problem}', file=sys.stderr)
+    return template, flags
+
+
+def _template(args, timings, start):
+    profile, base_dir = read_profile(args.profile)
+    start = _timed(timings, 'read profile', start)
+    template, _ = build_template(profile, base_dir, args.year, args.compact)
+    _timed(timings, 'render', start)
+    return template
+
+
+def _preview(args, timings, start):
+    profile, base_dir = read_profile(args.profile)
+    start = _timed(timings, 'read profile', start)
+    template, flags = build_template(profile, base_dir, args.year)
+    if args.international and not flags['has_international']:
+        raise ProfileError('--international needs has_gst and has_international in the profile')
+
+    from utils.preview import compact_html, generate_preview_html, scale_preview
+    preview = generate_preview_html(template, flags['has_gst'], args.international, bool(profile.get('qr_path')))
+    if args.scaled:
+        preview = scale_preview(preview)
+    if args.compact:
+        preview = compact_html(preview, inline_images=True)
+    _timed(timings, 'render', start)
+    return preview
+
+
+def _script(args, timings, start):
+    profile = {}
+    if args.profile:
+        profile, _ = read_profile(args.profile)
+        start = _timed(timings, 'read profile', start)
+
+    from utils.company import profile_flags, profile_text
+    from utils.script import configured_script, script_features, template_cache_version
+
+    def option(name):
+        value = getattr(args, name)
+        return value if value is not None else profile_text(profile, name)
+
+    template_file_id, dest_folder_id = option('template_file_id'), option('dest_folder_id')
+    if not (template_file_id and dest_folder_id):
+        raise ProfileError('the script needs --template-id and --folder-id (or template_file_id/dest_folder_id in the profile)')
+    # With a profile, only the code its template can use; without one, every template feature
+    features = None if args.batch else (('BATCH', False),)
+    if profile:
+        try:
+            flags = profile_flags(profile)
+        except ValueError as e:
+            raise ProfileError(str(e))
+        features = script_features(flags['has_gst'], flags['has_international'], args.batch, option('allocator_url'))
+    cache_version = ''
+    if args.cache_for:
+        try:
+            with open(args.cache_for, 'r', encoding='utf-8') as f:
+                cache_version = template_cache_version(f.read())
+        except OSError as e:
+            raise ProfileError(f'{e.strerror}: {args.cache_for}')
+    script = configured_script(
+        template_file_id, dest_folder_id, option('allocator_url'), option('allocator_token'),
+        minify=args.minify, features=features, cache_version=cache_version
+    )
+    if script is None:
+        raise RuntimeError('script.gs could not be loaded')
+    _timed(timings, 'render', start)
+    return script
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m render',
+        description='Render an invoice template, preview or configured script.gs from a company profile'
+    )
+    parser.add_argument('--timings', action='store_true', help='Print import and render times (ms) to stderr')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    template = sub.add_parser('template', help='Invoice template HTML, as the generator page downloads it')
+    template.add_argument('--compact', action='store_true', help='Compact the template (see utils/compact.py)')
+    template.set_defaults(handler=_template)
+
+    preview = sub.add_parser('preview', help='Template filled with the sample client, as the preview column shows it')
+    preview.add_argument('--international', action='store_true', help='Preview for an international client')
+    preview.add_argument('--scaled', action='store_true', help='Wrap it the way the preview column scales it')
+    preview.add_argument('--compact', action='store_true', help='Drop comments and indentation')
+    preview.set_defaults(handler=_preview)
+
+    script = sub.add_parser('script', help='script.gs configured with the Drive IDs and allocator')
+    script.add_argument('--template-id', dest='template_file_id', help='Google Docs template file ID')
+    script.add_argument('--folder-id', dest='dest_folder_id', help='Drive folder ID for generated invoices')
+    script.add_argument('--allocator-url', dest='allocator_url', help='Invoice number service URL')
+    script.add_argument('--allocator-token', dest='allocator_token', help='Invoice number service token')
+    script.add_argument('--minify', action='store_true', help='Drop comments and console.log calls')
+    script.add_argument('--batch', action='store_true',
+                        help='Include generatePendingInvoices (the Invoices menu for generating all pending rows)')
+    script.add_argument('--cache-for', metavar='TEMPLATE',
+                        help='Cache the template between edits, stamped from this template file (the one on Drive)')
+    script.set_defaults(handler=_script)
+
+    for command in (template, preview):
+        command.add_argument('profile', nargs='?', default='-', help="Profile JSON file, '-' for stdin (default)")
+        command.add_argument('--year', type=int, help='Year for the starting invoice number (default: this year)')
+    script.add_argument('profile', nargs='?', help="Profile JSON file for the IDs, '-' for stdin")
+    for command in (template, preview, script):
+        command.add_argument('-o', '--output', help='Write to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    if getattr(args, 'year', 0) is None:
+        from datetime import date
+        args.year = date.today().year
+
+    timings = []
+    start = _timed(timings, 'startup', _STARTED)
+    try:
+        text = args.handler(args, timings, start)
+    except ProfileError as e:
+        print(f'{args.command}: {e}', file=sys.stderr)
+        return 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    if args.timings:
+        _timed(timings, 'total', _STARTED)
+        print(' '.join(f'{name}={ms:.1f}' for name, ms in timings), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,8 +4,18 @@ let isProcessing = false;
 const CONFIG = {
   TEMPLATE_FILE_ID: '',
   DEST_FOLDER_ID: '',
+  // Optional invoice number service (python -m allocator serve); empty scans the sheet instead
+  ALLOCATOR_URL: '',
+  ALLOCATOR_TOKEN: '',
+  // Stamp of the template this script was set up for; when set, the template and header
+  // row are kept in the script cache between edits (see loadTemplate)
+  CACHE_VERSION: '',
 };
 
+// Template features, the batch entry point and the invoice number service, set per company by
+// the setup app. Its builds leave out the code between //#if NAME and //#endif lines when NAME is false.
+const FEATURES = { GST: true, INTERNATIONAL: true, BATCH: true, ALLOCATOR: true };
+
 const HEADER_NAMES = {
   CLIENT: 'Client Name',
   COST: 'Cost to Client',
@@ -22,50 +32,13 @@ const HEADER_NAMES = {
   INVOICE_DATE: 'Invoice Date'
 };
 
-// State to State Code mapping
-const STATE_CODES = {
-  "Jammu & Kashmir": "1",
-  "Himachal Pradesh": "2",
-  "Punjab": "3",
-  "Chandigarh": "4",
-  "Uttarakhand": "5",
-  "Haryana": "6",
-  "Delhi": "7",
-  "Rajasthan": "8",
-  "Uttar Pradesh": "9",
-  "Bihar": "10",
-  "Sikkim": "11",
-  "Arunachal Pradesh": "12",
-  "Nagaland": "13",
-  "Manipur": "14",
-  "Mizoram": "15",
-  "Tripura": "16",
-  "Meghalaya": "17",
-  "Assam": "18",
-  "West Bengal": "19",
-  "Jharkhand": "20",
-  "Odisha": "21",
-  "Chhattisgarh": "22",
-  "Madhya Pradesh": "23",
-  "Gujarat": "24",
-  "Daman & Diu": "25",
-  "Dadra & Nagar Haveli": "26",
-  "Maharashtra": "27",
-  "Andhra Pradesh (Old)": "28",
-  "Karnataka": "29",
-  "Goa": "30",
-  "Lakshadweep": "31",
-  "Kerala": "32",
-  "Tamil Nadu": "33",
-  "Puducherry": "34",
-  "Andaman & Nicobar Islands": "35",
-  "Telangana": "36",
-  "Andhra Pradesh (Newly Added)": "37",
-  "Ladakh (Newly Added)": "38",
-  "Outside India": "96",
-  "Other Territory": "97",
-  "Center Jurisdiction": "99"
-};
+// Known clients from a sheet export: lowercase name -> [address, PAN, GSTIN, state, place of supply]
+// Filled in by the setup app; used for clients the sheet has no earlier row for, since the
+// sheet's own rows may have been corrected after the export.
+const CLIENT_DIRECTORY = {};
+
+// State to State Code mapping, filled in from codes.json by the setup app
+const STATE_CODES = {"Jammu & Kashmir":"1","Himachal Pradesh":"2","Punjab":"3","Chandigarh":"4","Uttarakhand":"5","Haryana":"6","Delhi":"7","Rajasthan":"8","Uttar Pradesh":"9","Bihar":"10","Sikkim":"11","Arunachal Pradesh":"12","Nagaland":"13","Manipur":"14","Mizoram":"15","Tripura":"16","Meghalaya":"17","Assam":"18","West Bengal":"19","Jharkhand":"20","Odisha":"21","Chhattisgarh":"22","Madhya Pradesh":"23","Gujarat":"24","Daman & Diu":"25","Dadra & Nagar Haveli":"26","Maharashtra":"27","Andhra Pradesh (Old)":"28","Karnataka":"29","Goa":"30","Lakshadweep":"31","Kerala":"32","Tamil Nadu":"33","Puducherry":"34","Andaman & Nicobar Islands":"35","Telangana":"36","Andhra Pradesh (Newly Added)":"37","Ladakh (Newly Added)":"38","Outside India":"96","Others Territory":"97","Center Jurisdiction":"99"};
 
 // ========== Auto-populate client details ==========
 function handleEdit(e) {
@@ -73,9 +46,13 @@ function handleEdit(e) {
   const editedRow = e.range.getRow();
   const editedColumn = e.range.getColumn();
   
-  if (editedRow < 2) return; // Skip header row
+  if (editedRow < 2) {
+    // Header row edited: column positions may have changed
+    forgetHeaderIndexMap(sheet);
+    return;
+  }
   
-  const headerMap = getHeaderIndexMap(sheet);
+  const headerMap = cachedHeaderIndexMap(sheet);
   const clientCol = headerMap[HEADER_NAMES.CLIENT];
   const generateCol = headerMap[HEADER_NAMES.GENERATE];
   
@@ -87,6 +64,13 @@ function handleEdit(e) {
   
   // Generate invoice when "Generate" is set to "Yes"
   if (editedColumn === generateCol) {
+    //#if BATCH
+    // Yes pasted into several rows at once: one batch run over those rows rather than only the first
+    if (e.range.getNumRows() > 1) {
+      runPendingInvoices(sheet, { first: editedRow, last: editedRow + e.range.getNumRows() - 1 });
+      return;
+    }
+    //#endif
     onSheetEdit(e);
   }
 }
@@ -94,62 +78,83 @@ function handleEdit(e) {
 function autoPopulateClientDetails(e) {
   const sheet = e.range.getSheet();
   const editedRow = e.range.getRow();
-  const headerMap = getHeaderIndexMap(sheet);
+  const headerMap = cachedHeaderIndexMap(sheet);
   
   const clientCol = headerMap[HEADER_NAMES.CLIENT];
-  const addressCol = headerMap[HEADER_NAMES.ADDRESS];
-  const panCol = headerMap[HEADER_NAMES.PAN];
-  const gstCol = headerMap[HEADER_NAMES.GST];
-  const clientStateCol = headerMap[HEADER_NAMES.CLIENT_STATE];
-  const placeOfSupplyCol = headerMap[HEADER_NAMES.PLACE_OF_SUPPLY];
+  const targetCols = [
+    headerMap[HEADER_NAMES.ADDRESS],
+    headerMap[HEADER_NAMES.PAN],
+    headerMap[HEADER_NAMES.GST],
+    headerMap[HEADER_NAMES.CLIENT_STATE],
+    headerMap[HEADER_NAMES.PLACE_OF_SUPPLY]
+  ];
   
   if (!clientCol) return;
   
   const clientName = String(e.range.getValue() || '').trim();
   if (!clientName) return;
   
-  // Search for existing client data
+  const details = findPreviousClientDetails(sheet, editedRow, clientCol, targetCols, clientName) ||
+    CLIENT_DIRECTORY[clientName.toLowerCase()];
+  if (!details) return;
+  
+  writeEmptyCells(sheet, editedRow, targetCols, details);
+  SpreadsheetApp.getActiveSpreadsheet().toast('Client details auto-populated from previous entry');
+}
+
+// Most recent other row for the client, as [address, PAN, GSTIN, state, place of supply]
+function findPreviousClientDetails(sheet, editedRow, clientCol, targetCols, clientName) {
   const lastRow = sheet.getLastRow();
-  if (lastRow < 2) return;
+  if (lastRow < 2) return null;
   
-  const dataRange = sheet.getRange(2, 1, lastRow - 1, sheet.getLastColumn());
-  const data = dataRange.getValues();
+  // Only the client column is read for the search
+  const names = sheet.getRange(2, clientCol, lastRow - 1, 1).getValues();
+  const wanted = clientName.toLowerCase();
   
-  // Find the most recent entry for this client (excluding current row)
-  for (let i = data.length - 1; i >= 0; i--) {
+  for (let i = names.length - 1; i >= 0; i--) {
     const rowIndex = i + 2;
     if (rowIndex === editedRow) continue;
     
-    const existingClient = String(data[i][clientCol - 1] || '').trim();
-    if (existingClient.toLowerCase() === clientName.toLowerCase()) {
-      // Found matching client - copy details
-      const address = data[i][addressCol - 1] || '';
-      const pan = panCol ? (data[i][panCol - 1] || '') : '';
-      const gst = gstCol ? (data[i][gstCol - 1] || '') : '';
-      const clientState = clientStateCol ? (data[i][clientStateCol - 1] || '') : '';
-      const placeOfSupply = placeOfSupplyCol ? (data[i][placeOfSupplyCol - 1] || '') : '';
-      
-      // Only populate empty fields
-      if (addressCol && !sheet.getRange(editedRow, addressCol).getValue()) {
-        sheet.getRange(editedRow, addressCol).setValue(address);
-      }
-      if (panCol && !sheet.getRange(editedRow, panCol).getValue()) {
-        sheet.getRange(editedRow, panCol).setValue(pan);
-      }
-      if (gstCol && !sheet.getRange(editedRow, gstCol).getValue()) {
-        sheet.getRange(editedRow, gstCol).setValue(gst);
-      }
-      if (clientStateCol && !sheet.getRange(editedRow, clientStateCol).getValue()) {
-        sheet.getRange(editedRow, clientStateCol).setValue(clientState);
-      }
-      if (placeOfSupplyCol && !sheet.getRange(editedRow, placeOfSupplyCol).getValue()) {
-        sheet.getRange(editedRow, placeOfSupplyCol).setValue(placeOfSupply);
-      }
-      
-      SpreadsheetApp.getActiveSpreadsheet().toast('Client details auto-populated from previous entry');
-      break;
+    if (String(names[i][0] || '').trim().toLowerCase() === wanted) {
+      const row = sheet.getRange(rowIndex, 1, 1, sheet.getLastColumn()).getValues()[0];
+      return targetCols.map(col => col ? (row[col - 1] || '') : '');
     }
   }
+  return null;
+}
+
+// Fill only the empty target cells of a row, with one read and one write when the columns are adjacent.
+// A cell with a formula is never empty, even when the formula gives ''.
+function writeEmptyCells(sheet, rowIndex, targetCols, values) {
+  const cols = targetCols.filter(col => col);
+  if (cols.length === 0) return;
+  const firstCol = Math.min.apply(null, cols);
+  const lastCol = Math.max.apply(null, cols);
+  const width = lastCol - firstCol + 1;
+  
+  const range = sheet.getRange(rowIndex, firstCol, 1, width);
+  const current = range.getValues()[0];
+  const formulas = range.getFormulas()[0];
+  const isEmpty = col => !current[col - firstCol] && !formulas[col - firstCol];
+  
+  if (width !== cols.length) {
+    // Other columns sit in between; write cell by cell so their formulas are left alone
+    targetCols.forEach((col, i) => {
+      if (col && isEmpty(col)) {
+        sheet.getRange(rowIndex, col).setValue(values[i]);
+      }
+    });
+    return;
+  }
+  
+  // Cells that are kept are written back as their formulas, not their computed values
+  const updated = current.map((value, j) => formulas[j] || value);
+  targetCols.forEach((col, i) => {
+    if (col && isEmpty(col)) {
+      updated[col - firstCol] = values[i];
+    }
+  });
+  range.setValues([updated]);
 }
 
 // ========== Parse Multiple Items with Narrations ==========
@@ -270,13 +275,16 @@ function extractCompanyState(templateHtml) {
   return null;
 }
 
+//#if GST
 // ========== Check if Template is GST-enabled ==========
 function isGSTTemplate(templateHtml) {
   // Check if template has company GST number
   const gstPattern = /<strong>GST:<\/strong>\s*[A-Z0-9]+/i;
   return gstPattern.test(templateHtml);
 }
+//#endif
 
+//#if INTERNATIONAL
 // ========== Parse International Client Format ==========
 function parseInternationalClient(clientStateStr) {
   // Expected formats:
@@ -313,6 +321,11 @@ function parseInternationalClient(clientStateStr) {
   };
 }
 
+// Precomputed from the currency table by the setup app (utils/currency.py):
+// normalized code/name/symbol/alias -> code, and the same pairs in scan order for typos
+const CURRENCY_INDEX = {"usd":"USD","united states dollars":"USD","":"USD","us dollar":"USD","dollar":"USD","american dollar":"USD","us":"USD","bucks":"USD","greenback":"USD","eur":"EUR","euros":"EUR","euro":"EUR","inr":"INR","indian rupees":"INR","rupee":"INR","indian rupee":"INR","rs":"INR","rupees":"INR","gbp":"GBP","british pounds":"GBP","pound":"GBP","pound sterling":"GBP","british pound":"GBP","quid":"GBP","jpy":"JPY","japanese yen":"JPY","yen":"JPY","aud":"AUD","australian dollars":"AUD","australian dollar":"AUD","aussie dollar":"AUD","aussie":"AUD","aud dollar":"AUD","cad":"CAD","canadian dollars":"CAD","canadian dollar":"CAD","cad dollar":"CAD","loonie":"CAD","chf":"CHF","swiss francs":"CHF","swiss franc":"CHF","franc":"CHF","swissf":"CHF","sfr":"CHF","cny":"CNY","chinese yuan":"CNY","yuan":"CNY","renminbi":"CNY","rmb":"CNY","krw":"KRW","south korean won":"KRW","won":"KRW","mxn":"MXN","mexican pesos":"MXN","peso":"MXN","mexican peso":"MXN","pesos":"MXN","hkd":"HKD","hong kong dollars":"HKD","hong kong dollar":"HKD","hk dollar":"HKD","sgd":"SGD","singapore dollars":"SGD","singapore dollar":"SGD","sg dollar":"SGD","aed":"AED","uae dirhams":"AED","dirham":"AED","uae dirham":"AED","dhs":"AED","dh":"AED","sar":"SAR","saudi riyals":"SAR","saudi riyal":"SAR","riyals":"SAR","riyl":"SAR","qar":"QAR","qatari riyals":"QAR","qatari riyal":"QAR","omr":"OMR","omani rials":"OMR","omani rial":"OMR","rials":"OMR"};
+const CURRENCY_CANDIDATES = [["usd","USD"],["united states dollars","USD"],["","USD"],["us dollar","USD"],["dollar","USD"],["american dollar","USD"],["us","USD"],["bucks","USD"],["greenback","USD"],["eur","EUR"],["euros","EUR"],["euro","EUR"],["inr","INR"],["indian rupees","INR"],["rupee","INR"],["indian rupee","INR"],["rs","INR"],["rupees","INR"],["gbp","GBP"],["british pounds","GBP"],["pound","GBP"],["pound sterling","GBP"],["british pound","GBP"],["quid","GBP"],["jpy","JPY"],["japanese yen","JPY"],["yen","JPY"],["aud","AUD"],["australian dollars","AUD"],["australian dollar","AUD"],["aussie dollar","AUD"],["aussie","AUD"],["aud dollar","AUD"],["cad","CAD"],["canadian dollars","CAD"],["canadian dollar","CAD"],["cad dollar","CAD"],["loonie","CAD"],["chf","CHF"],["swiss francs","CHF"],["swiss franc","CHF"],["franc","CHF"],["swissf","CHF"],["sfr","CHF"],["cny","CNY"],["chinese yuan","CNY"],["yuan","CNY"],["renminbi","CNY"],["rmb","CNY"],["krw","KRW"],["south korean won","KRW"],["won","KRW"],["mxn","MXN"],["mexican pesos","MXN"],["peso","MXN"],["mexican peso","MXN"],["pesos","MXN"],["hkd","HKD"],["hong kong dollars","HKD"],["hong kong dollar","HKD"],["hk dollar","HKD"],["sgd","SGD"],["singapore dollars","SGD"],["singapore dollar","SGD"],["sg dollar","SGD"],["aed","AED"],["uae dirhams","AED"],["dirham","AED"],["uae dirham","AED"],["dhs","AED"],["dh","AED"],["sar","SAR"],["saudi riyals","SAR"],["saudi riyal","SAR"],["riyals","SAR"],["riyl","SAR"],["qar","QAR"],["qatari riyals","QAR"],["qatari riyal","QAR"],["omr","OMR"],["omani rials","OMR"],["omani rial","OMR"],["rials","OMR"]];
+
 function fuzzyCurrency(query) {
 const currencies = [
     { code: "USD", name: "United States Dollars", symbol: "$", aliases: ["usd", "us dollar", "dollar", "american dollar", "us", "bucks", "greenback"] },
@@ -343,40 +356,61 @@ const currencies = [
       .replace(/[^a-z0-9\s]/g, "");
   }
 
-  function levenshtein(a, b) {
+  // Edit distance if it is at most limit, otherwise limit + 1.
+  // Fills only the diagonal band and stops once a whole row is over the limit.
+  function boundedLevenshtein(a, b, limit) {
     const m = a.length, n = b.length;
-    if (!m) return n;
-    if (!n) return m;
+    if (Math.abs(m - n) > limit) return limit + 1;
+    if (!m || !n) return Math.max(m, n);
 
-    const dp = Array.from({ length: m + 1 }, () => Array(n + 1).fill(0));
-    for (let i = 0; i <= m; i++) dp[i][0] = i;
-    for (let j = 0; j <= n; j++) dp[0][j] = j;
+    const over = limit + 1;
+    let prev = new Array(n + 1);
+    let cur = new Array(n + 1);
+    for (let j = 0; j <= n; j++) prev[j] = j <= limit ? j : over;
 
     for (let i = 1; i <= m; i++) {
-      for (let j = 1; j <= n; j++) {
+      const lo = Math.max(1, i - limit);
+      const hi = Math.min(n, i + limit);
+      cur.fill(over);
+      cur[0] = i <= limit ? i : over;
+      let rowMin = cur[0];
+      for (let j = lo; j <= hi; j++) {
         const cost = a[i - 1] === b[j - 1] ? 0 : 1;
-        dp[i][j] = Math.min(
-          dp[i - 1][j] + 1,
-          dp[i][j - 1] + 1,
-          dp[i - 1][j - 1] + cost
-        );
+        const d = Math.min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost);
+        cur[j] = d <= limit ? d : over;
+        if (d < rowMin) rowMin = d;
       }
+      if (rowMin > limit) return over;
+      const swap = prev; prev = cur; cur = swap;
+    }
+    return prev[n];
+  }
+
+  function findCurrency(code) {
+    for (const cur of currencies) {
+      if (cur.code === code) return cur;
     }
-    return dp[m][n];
+    return null;
   }
 
   const queryNorm = normalize(query);
   let bestMatch = null;
   let minDist = Infinity;
 
-  for (const cur of currencies) {
-    const candidates = [cur.code, cur.name, cur.symbol, ...(cur.aliases || [])];
-
-    for (const cand of candidates) {
-      const dist = levenshtein(queryNorm, normalize(cand));
-      if (dist < minDist) {
+  if (Object.prototype.hasOwnProperty.call(CURRENCY_INDEX, queryNorm)) {
+    // Exact spelling of a code, name, symbol or alias
+    bestMatch = findCurrency(CURRENCY_INDEX[queryNorm]);
+    minDist = 0;
+  } else {
+    // Only a strictly closer candidate replaces the best, so ties keep the earlier currency
+    let limit = Math.max(3, Math.floor(queryNorm.length * 0.4));
+    for (const [cand, code] of CURRENCY_CANDIDATES) {
+      const dist = boundedLevenshtein(queryNorm, cand, limit);
+      if (dist <= limit) {
         minDist = dist;
-        bestMatch = cur;
+        bestMatch = findCurrency(code);
+        limit = dist - 1;
+        if (limit < 1) break;
       }
     }
   }
@@ -395,6 +429,7 @@ const currencies = [
     return { ok: false, query, tried: queryNorm };
   }
 }
+//#endif
 
 // ========== Format Currency ==========
 function formatCurrency(num, currencySymbol, isInternational) {
@@ -448,6 +483,7 @@ function generateItemRowsHtml(items, hasGST, hasHSN, currencySymbol, isInternati
   });
   
   // Add GST rows if applicable
+  //#if GST
   if (hasGST && !isInternational) {
     const gstAmount = baseAmount * 0.18;
     const isSameState = (companyState === clientState);
@@ -494,6 +530,7 @@ function generateItemRowsHtml(items, hasGST, hasHSN, currencySymbol, isInternati
       }
     }
   }
+  //#endif
   
   return html;
 }
@@ -559,16 +596,19 @@ function numberToWordsWithCurrency(amount, currencyName, isInternational) {
   if (num === 0) return 'Zero Only';
   if (num < 0) return 'Negative amount';
   
+  //#if INTERNATIONAL
   if (isInternational) {
     // Simple words for international (no paise/cents breakdown)
     const words = numberToEnglishWords(Math.floor(num));
     return words + ' ' + currencyName + ' Only';
-  } else {
-    // Indian rupees format with paise
-    return numberToIndianWords(num);
   }
+  //#endif
+
+  // Indian rupees format with paise
+  return numberToIndianWords(num);
 }
 
+//#if INTERNATIONAL
 function numberToEnglishWords(num) {
   if (num === 0) return 'Zero';
   
@@ -600,6 +640,7 @@ function numberToEnglishWords(num) {
   
   return 'Amount too large';
 }
+//#endif
 
 // ========== Main Invoice Generation Function ==========
 function onSheetEdit(e) {
@@ -608,18 +649,10 @@ function onSheetEdit(e) {
   const sheet = e.range.getSheet();
   const editedRow = e.range.getRow();
   const editedColumn = e.range.getColumn();
+  let lock = null;
 
   try {
-    const headerMap = getHeaderIndexMap(sheet);
-    const clientCol = headerMap[HEADER_NAMES.CLIENT];
-    const costCol = headerMap[HEADER_NAMES.COST];
-    const descriptionCol = headerMap[HEADER_NAMES.DESCRIPTION];
-    const hsnCol = headerMap[HEADER_NAMES.HSN];
-    const addressCol = headerMap[HEADER_NAMES.ADDRESS];
-    const panCol = headerMap[HEADER_NAMES.PAN];
-    const gstCol = headerMap[HEADER_NAMES.GST];
-    const clientStateCol = headerMap[HEADER_NAMES.CLIENT_STATE];
-    const placeOfSupplyCol = headerMap[HEADER_NAMES.PLACE_OF_SUPPLY];
+    const headerMap = cachedHeaderIndexMap(sheet);
     const generateCol = headerMap[HEADER_NAMES.GENERATE];
     const statusCol = headerMap[HEADER_NAMES.STATUS];
     const invoiceNumCol = headerMap[HEADER_NAMES.INVOICE_NUM];
@@ -632,147 +665,26 @@ function onSheetEdit(e) {
 
     isProcessing = true;
 
+    //#if BATCH
+    // A running generatePendingInvoices hands out numbers from the same sequence
+    lock = waitForInvoiceLock();
+    //#endif
+
     const lastCol = sheet.getLastColumn();
     const rowValues = sheet.getRange(editedRow, 1, 1, lastCol).getValues()[0];
 
-    const client_name = rowValues[clientCol - 1] || '';
-    const descriptionRaw = rowValues[descriptionCol - 1] || '';
-    const costRaw = rowValues[costCol - 1] || '0';
-    const hsnRaw = hsnCol ? (rowValues[hsnCol - 1] || '') : '';
-    const address = rowValues[addressCol - 1] || '';
-    const pan = panCol ? (rowValues[panCol - 1] || '') : '';
-    const gst = gstCol ? String(rowValues[gstCol - 1] || '').trim() : '';
-    const clientStateRaw = clientStateCol ? String(rowValues[clientStateCol - 1] || '').trim() : '';
-    const placeOfSupply = placeOfSupplyCol ? String(rowValues[placeOfSupplyCol - 1] || '').trim() : '';
-
     console.log('Triggered on row ' + editedRow);
 
-    // Load template
-    let templateHtml = '';
-    if (CONFIG.TEMPLATE_FILE_ID && CONFIG.TEMPLATE_FILE_ID.length > 5) {
-      try {
-        templateHtml = DriveApp.getFileById(CONFIG.TEMPLATE_FILE_ID).getBlob().getDataAsString();
-      } catch (err) {
-        throw new Error('Could not read template from Drive. Error: ' + err);
-      }
-    } else {
-      throw new Error('TEMPLATE_FILE_ID not configured');
-    }
-
-    // Check if template is GST-enabled
-    const isGSTEnabledTemplate = isGSTTemplate(templateHtml);
-    
-    // Extract company state from template
-    const companyState = extractCompanyState(templateHtml);
-    
-    // Check if client is international
-    let isInternational = false;
-    let currencySymbol = '₹';
-    let currencyName = 'Rupees';
-    let partyState = clientStateRaw;
-    let partyStateCode = STATE_CODES[clientStateRaw] || '';
-    let placeOfSupplyDisplay = placeOfSupply || clientStateRaw;
-    
-    if (clientStateRaw.toLowerCase().startsWith('outside')) {
-      const intlData = parseInternationalClient(clientStateRaw);
-      if (intlData) {
-        isInternational = true;
-        currencySymbol = intlData.currencySymbol;
-        currencyName = intlData.currencyName;
-        partyState = intlData.partyState; // This will be "Outside India"
-        partyStateCode = intlData.stateCode; // This will be "96"
-        placeOfSupplyDisplay = "Outside India"; // Always just "Outside India" for display
-      }
-    } else {
-      partyStateCode = STATE_CODES[clientStateRaw] || '';
-      placeOfSupplyDisplay = placeOfSupply || clientStateRaw;
-    }
-
-    // Determine if we should show GST
-    const hasGST = isGSTEnabledTemplate && !isInternational;
-    const hasHSN = hasGST && hsnCol;
-
-    // Define the conditions based on our calculated variables
-    const conditions = {
-      INTERNATIONAL_PARTY: isInternational,
-      HAS_HSN: hasHSN,
-      GST: hasGST
-    };
-    
-    // Process the template markers BEFORE filling placeholders
-    templateHtml = processTemplateMarkers(templateHtml, conditions);
-
-    // Parse multiple items with narrations
-    const items = parseMultipleItems(descriptionRaw, costRaw, hsnRaw);
-    console.log('Parsed ' + items.length + ' items');
+    const template = loadTemplate();
+    const invoice = prepareInvoice(rowValues, headerMap, template);
 
     const invoiceDate = new Date();
-    const invoiceNumber = generateInvoiceNumber(sheet, invoiceDate, statusCol, invoiceNumCol, templateHtml);
-
-    // Calculate totals
-    let baseAmount = 0;
-    items.forEach(item => {
-      baseAmount += item.amount;
-    });
-
-    let gstAmount = 0;
-    let totalAmount = baseAmount;
+    const invoiceNumber = usesAllocator()
+      ? allocateInvoiceNumber(invoiceDate, () => sheetInvoiceSequence(sheet, invoiceDate.getFullYear(), statusCol, invoiceNumCol, template.start))
+      : generateInvoiceNumber(sheet, invoiceDate, statusCol, invoiceNumCol, template.start);
 
-    if (hasGST) {
-      gstAmount = baseAmount * 0.18;
-      totalAmount = baseAmount + gstAmount;
-    }
-
-    // Get state for GST calculation (use clientStateRaw for comparison, not partyState)
-    const clientStateForGST = isInternational ? '' : clientStateRaw;
-
-    // Generate item rows HTML
-    const itemRowsHtml = generateItemRowsHtml(
-      items, 
-      hasGST, 
-      hasHSN, 
-      currencySymbol, 
-      isInternational,
-      companyState,
-      clientStateForGST,
-      baseAmount
-    );
-
-    // Amount in words
-    const amountInWords = numberToWordsWithCurrency(totalAmount, currencyName, isInternational);
-
-    // Replace the hardcoded invoice number in template HTML with the generated one (for PDF only)
-    let pdfTemplateHtml = templateHtml.replace(
-      /<div class="meta-line"><strong>Invoice No:<\/strong>\s*\d{4}\/Inv\/\d{3}<\/div>/,
-      '<div class="meta-line"><strong>Invoice No:</strong> ' + invoiceNumber + '</div>'
-    );
-
-    // Fill template with data
-    const filledHtml = fillTemplate(pdfTemplateHtml, {
-      INVOICE_NUMBER: invoiceNumber,
-      DATE: formatDateHuman(invoiceDate),
-      DUE_DATE: formatDateHuman(invoiceDate),
-      PARTY_NAME: client_name,
-      PARTY_ADDRESS_HTML: convertToMultiLineAddress(address),
-      PARTY_PAN: isInternational ? 'N/A' : pan,
-      PARTY_GST: isInternational ? 'N/A' : (gst || 'N/A'),
-      PARTY_STATE: partyState,
-      PARTY_STATE_CODE: partyStateCode,
-      PLACE_OF_SUPPLY: placeOfSupplyDisplay,
-      ITEM_ROWS: itemRowsHtml,
-      TOTAL_BASE_DISPLAY: formatCurrency(baseAmount, currencySymbol, isInternational),
-      GST_DISPLAY: formatCurrency(gstAmount, currencySymbol, false),
-      TOTAL_DISPLAY: formatCurrency(totalAmount, currencySymbol, isInternational),
-      AMOUNT_WORDS: amountInWords,
-    });
-
-    if (!CONFIG.DEST_FOLDER_ID || CONFIG.DEST_FOLDER_ID.length < 5) {
-      throw new Error('DEST_FOLDER_ID is not configured. Please set CONFIG.DEST_FOLDER_ID to a valid Drive folder ID.');
-    }
-
-    const outputName = `Invoice_${invoiceNumber}_${client_name}`.replace(/[^a-zA-Z0-9_\- ]/g, '_').slice(0, 120);
-
-    const pdfFile = htmlToPdfFile(filledHtml, outputName, CONFIG.DEST_FOLDER_ID);
+    const filledHtml = renderInvoice(invoice, invoiceNumber, invoiceDate);
+    const pdfFile = saveInvoicePdf(invoice, invoiceNumber, filledHtml);
 
     console.log('Saved PDF file: ' + pdfFile.getUrl());
 
@@ -789,18 +701,581 @@ function onSheetEdit(e) {
     sheet.getRange(editedRow, startColForUpdate, 1, colsToWrite).setValues([updatesRow]);
     sheet.getRange(editedRow, generateCol).setValue('');
 
-    SpreadsheetApp.getActiveSpreadsheet().toast('Invoice with ' + items.length + ' item(s) generated!');
+    SpreadsheetApp.getActiveSpreadsheet().toast('Invoice with ' + invoice.items.length + ' item(s) generated!');
 
   } catch (err) {
     console.error('Error generating invoice: ' + err);
     try { 
-      const headerMap = getHeaderIndexMap(e.range.getSheet());
+      const headerMap = cachedHeaderIndexMap(e.range.getSheet());
       const statusColLocal = headerMap[HEADER_NAMES.STATUS];
       e.range.getSheet().getRange(editedRow, statusColLocal).setValue('Error: ' + (err.message || err));
     } catch (e2) {}
   } finally {
     isProcessing = false;
+    if (lock) lock.releaseLock();
+  }
+}
+
+// Everything about a sheet row an invoice needs apart from its number and date.
+// Throws for rows that cannot be invoiced.
+function prepareInvoice(rowValues, headerMap, template) {
+  const clientCol = headerMap[HEADER_NAMES.CLIENT];
+  const costCol = headerMap[HEADER_NAMES.COST];
+  const descriptionCol = headerMap[HEADER_NAMES.DESCRIPTION];
+  const hsnCol = headerMap[HEADER_NAMES.HSN];
+  const addressCol = headerMap[HEADER_NAMES.ADDRESS];
+  const panCol = headerMap[HEADER_NAMES.PAN];
+  const gstCol = headerMap[HEADER_NAMES.GST];
+  const clientStateCol = headerMap[HEADER_NAMES.CLIENT_STATE];
+  const placeOfSupplyCol = headerMap[HEADER_NAMES.PLACE_OF_SUPPLY];
+
+  const client_name = rowValues[clientCol - 1] || '';
+  const descriptionRaw = rowValues[descriptionCol - 1] || '';
+  const costRaw = rowValues[costCol - 1] || '0';
+  const hsnRaw = hsnCol ? (rowValues[hsnCol - 1] || '') : '';
+  const address = rowValues[addressCol - 1] || '';
+  const pan = panCol ? (rowValues[panCol - 1] || '') : '';
+  const gst = gstCol ? String(rowValues[gstCol - 1] || '').trim() : '';
+  const clientStateRaw = clientStateCol ? String(rowValues[clientStateCol - 1] || '').trim() : '';
+  const placeOfSupply = placeOfSupplyCol ? String(rowValues[placeOfSupplyCol - 1] || '').trim() : '';
+
+  let templateHtml = template.html;
+  const isGSTEnabledTemplate = template.gst;
+  const companyState = template.state;
+
+  // Check if client is international
+  let isInternational = false;
+  let currencySymbol = '₹';
+  let currencyName = 'Rupees';
+  let partyState = clientStateRaw;
+  let partyStateCode = STATE_CODES[clientStateRaw] || '';
+  let placeOfSupplyDisplay = placeOfSupply || clientStateRaw;
+  
+  if (clientStateRaw.toLowerCase().startsWith('outside')) {
+    if (!FEATURES.INTERNATIONAL) {
+      throw new Error('International clients are not enabled for this invoice template');
+    }
+    //#if INTERNATIONAL
+    const intlData = parseInternationalClient(clientStateRaw);
+    if (intlData) {
+      isInternational = true;
+      currencySymbol = intlData.currencySymbol;
+      currencyName = intlData.currencyName;
+      partyState = intlData.partyState; // This will be "Outside India"
+      partyStateCode = intlData.stateCode; // This will be "96"
+      placeOfSupplyDisplay = "Outside India"; // Always just "Outside India" for display
+    }
+    //#endif
+  } else {
+    partyStateCode = STATE_CODES[clientStateRaw] || '';
+    placeOfSupplyDisplay = placeOfSupply || clientStateRaw;
+  }
+
+  // Determine if we should show GST
+  const hasGST = isGSTEnabledTemplate && !isInternational;
+  const hasHSN = hasGST && hsnCol;
+
+  // Define the conditions based on our calculated variables
+  const conditions = {
+    INTERNATIONAL_PARTY: isInternational,
+    HAS_HSN: hasHSN,
+    GST: hasGST
+  };
+  
+  // Process the template markers BEFORE filling placeholders
+  templateHtml = processTemplateMarkers(templateHtml, conditions);
+
+  // Parse multiple items with narrations
+  const items = parseMultipleItems(descriptionRaw, costRaw, hsnRaw);
+  console.log('Parsed ' + items.length + ' items');
+
+  return {
+    clientName: client_name,
+    address: address,
+    pan: pan,
+    gst: gst,
+    clientStateRaw: clientStateRaw,
+    isInternational: isInternational,
+    currencySymbol: currencySymbol,
+    currencyName: currencyName,
+    partyState: partyState,
+    partyStateCode: partyStateCode,
+    placeOfSupplyDisplay: placeOfSupplyDisplay,
+    hasGST: hasGST,
+    hasHSN: hasHSN,
+    companyState: companyState,
+    templateHtml: templateHtml,
+    items: items
+  };
+}
+
+// Filled invoice HTML for a prepared row
+function renderInvoice(invoice, invoiceNumber, invoiceDate) {
+  const { items, hasGST, hasHSN, currencySymbol, currencyName, isInternational, companyState, clientStateRaw } = invoice;
+  const { address, pan, gst, partyState, partyStateCode, placeOfSupplyDisplay, templateHtml } = invoice;
+  const client_name = invoice.clientName;
+
+  // Calculate totals
+  let baseAmount = 0;
+  items.forEach(item => {
+    baseAmount += item.amount;
+  });
+
+  let gstAmount = 0;
+  let totalAmount = baseAmount;
+
+  if (hasGST) {
+    gstAmount = baseAmount * 0.18;
+    totalAmount = baseAmount + gstAmount;
+  }
+
+  // Get state for GST calculation (use clientStateRaw for comparison, not partyState)
+  const clientStateForGST = isInternational ? '' : clientStateRaw;
+
+  // Generate item rows HTML
+  const itemRowsHtml = generateItemRowsHtml(
+    items, 
+    hasGST, 
+    hasHSN, 
+    currencySymbol, 
+    isInternational,
+    companyState,
+    clientStateForGST,
+    baseAmount
+  );
+
+  // Amount in words
+  const amountInWords = numberToWordsWithCurrency(totalAmount, currencyName, isInternational);
+
+  // Replace the hardcoded invoice number in template HTML with the generated one (for PDF only)
+  let pdfTemplateHtml = templateHtml.replace(
+    /<div class="meta-line"><strong>Invoice No:<\/strong>\s*\d{4}\/Inv\/\d{3}<\/div>/,
+    '<div class="meta-line"><strong>Invoice No:</strong> ' + invoiceNumber + '</div>'
+  );
+
+  // Fill template with data
+  const filledHtml = fillTemplate(pdfTemplateHtml, {
+    INVOICE_NUMBER: invoiceNumber,
+    DATE: formatDateHuman(invoiceDate),
+    DUE_DATE: formatDateHuman(invoiceDate),
+    PARTY_NAME: client_name,
+    PARTY_ADDRESS_HTML: convertToMultiLineAddress(address),
+    PARTY_PAN: isInternational ? 'N/A' : pan,
+    PARTY_GST: isInternational ? 'N/A' : (gst || 'N/A'),
+    PARTY_STATE: partyState,
+    PARTY_STATE_CODE: partyStateCode,
+    PLACE_OF_SUPPLY: placeOfSupplyDisplay,
+    ITEM_ROWS: itemRowsHtml,
+    TOTAL_BASE_DISPLAY: formatCurrency(baseAmount, currencySymbol, isInternational),
+    GST_DISPLAY: formatCurrency(gstAmount, currencySymbol, false),
+    TOTAL_DISPLAY: formatCurrency(totalAmount, currencySymbol, isInternational),
+    AMOUNT_WORDS: amountInWords,
+  });
+
+  return filledHtml;
+}
+
+// Saves the filled invoice as a PDF in the invoice folder and returns the file
+function saveInvoicePdf(invoice, invoiceNumber, filledHtml) {
+  if (!CONFIG.DEST_FOLDER_ID || CONFIG.DEST_FOLDER_ID.length < 5) {
+    throw new Error('DEST_FOLDER_ID is not configured. Please set CONFIG.DEST_FOLDER_ID to a valid Drive folder ID.');
+  }
+
+  const outputName = `Invoice_${invoiceNumber}_${invoice.clientName}`.replace(/[^a-zA-Z0-9_\- ]/g, '_').slice(0, 120);
+
+  return htmlToPdfFile(filledHtml, outputName, CONFIG.DEST_FOLDER_ID);
+}
+
+//#if BATCH
+// ========== Generate All Pending Rows ==========
+// generatePendingInvoices (Invoices menu) generates every row with Generate set to Yes in
+// one execution, and handleEdit does the same for the rows Yes was pasted into: the sheet is read once, the rows get one block of consecutive invoice
+// numbers and their Status, Invoice Number and Invoice Date cells are written back in one
+// setValues. Each saved PDF is checkpointed in the document properties, so a run stopped
+// by the Apps Script time limit resumes where it stopped without saving a row twice.
+const BATCH_TIME_BUDGET_MS = 4.5 * 60 * 1000;
+const BATCH_LOCK_WAIT_MS = 30 * 1000;
+const BATCH_RESUME_AFTER_MS = 60 * 1000;
+// Largest block the invoice number service hands out at once
+const BATCH_MAX_ROWS = 1000;
+const BATCH_PROPERTY = 'invoice:batch:';
+
+function onOpen() {
+  SpreadsheetApp.getUi()
+    .createMenu('Invoices')
+    .addItem('Generate pending rows', 'generatePendingInvoices')
+    .addToUi();
+}
+
+// Lock held while invoice numbers are handed out and written, so runs never share a number
+function waitForInvoiceLock() {
+  const lock = LockService.getDocumentLock();
+  if (!lock.tryLock(BATCH_LOCK_WAIT_MS)) {
+    throw new Error('Another run is still generating invoices; use Invoices > Generate pending rows once it is done');
+  }
+  return lock;
+}
+
+// Menu item and time-based continuation: every pending row of the active sheet, or the rest
+// of an interrupted run
+function generatePendingInvoices() {
+  runPendingInvoices(null, null);
+}
+
+// sheet and span ({ first, last } sheet rows) limit the run to rows pasted into at once.
+// An interrupted run is finished first, on the sheet and rows it was started on.
+function runPendingInvoices(sheet, span) {
+  const spreadsheet = SpreadsheetApp.getActiveSpreadsheet();
+  const properties = PropertiesService.getDocumentProperties();
+
+  const lock = waitForInvoiceLock();
+  try {
+    deleteBatchResumeTriggers();
+    const started = Date.now();
+    const runs = [];
+    const checkpoint = readBatchCheckpoint(properties);
+    if (checkpoint.run) {
+      const savedSheet = spreadsheet.getSheets().filter(s => s.getSheetId() === checkpoint.run.sheetId)[0];
+      if (savedSheet) {
+        runs.push({ sheet: savedSheet, span: checkpoint.run.span });
+      } else {
+        // Its sheet is gone along with the rows it saved
+        Object.keys(checkpoint.rows).forEach(row => properties.deleteProperty(BATCH_PROPERTY + 'row:' + row));
+        properties.deleteProperty(BATCH_PROPERTY + 'run');
+      }
+    }
+    if (sheet || !runs.length) runs.push({ sheet: sheet || spreadsheet.getActiveSheet(), span: span });
+
+    const result = { generated: 0, failed: 0, stopped: false };
+    for (let i = 0; i < runs.length && !result.stopped; i++) {
+      const done = generatePendingRows(runs[i].sheet, runs[i].span, properties, started);
+      result.generated += done.generated;
+      result.failed += done.failed;
+      result.stopped = done.stopped;
+    }
+
+    let message = result.generated + ' invoice(s) generated';
+    if (result.failed) message += ', ' + result.failed + ' row(s) with errors';
+    if (result.stopped) {
+      message += scheduleBatchResume()
+        ? '. The remaining rows continue in a minute.'
+        : '. Run Invoices > Generate pending rows again for the remaining rows.';
+    }
+    spreadsheet.toast(message);
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+// { run: { sheetId, span } of an unfinished run or null, numbers: unused allocator numbers,
+//   rows: { sheet row: [invoice number, date ms] } saved by that run but not written yet }
+function readBatchCheckpoint(properties) {
+  const stored = properties.getProperties();
+  const checkpoint = { run: null, numbers: [], rows: {} };
+  Object.keys(stored).forEach(key => {
+    if (key.indexOf(BATCH_PROPERTY) !== 0) return;
+    const name = key.slice(BATCH_PROPERTY.length);
+    const value = JSON.parse(stored[key]);
+    if (name === 'run') checkpoint.run = value;
+    else if (name === 'numbers') checkpoint.numbers = value;
+    else if (name.indexOf('row:') === 0) checkpoint.rows[name.slice(4)] = value;
+  });
+  return checkpoint;
+}
+
+// Pending rows of sheet (only those in span, when given) as one run, see the section comment
+function generatePendingRows(sheet, span, properties, started) {
+  const result = { generated: 0, failed: 0, stopped: false };
+  const checkpoint = readBatchCheckpoint(properties);
+  const resumed = checkpoint.run && checkpoint.run.sheetId === sheet.getSheetId() ? checkpoint.rows : {};
+
+  const headerMap = cachedHeaderIndexMap(sheet);
+  const generateCol = headerMap[HEADER_NAMES.GENERATE];
+  const statusCol = headerMap[HEADER_NAMES.STATUS];
+  const invoiceNumCol = headerMap[HEADER_NAMES.INVOICE_NUM];
+  const invoiceDateCol = headerMap[HEADER_NAMES.INVOICE_DATE];
+
+  const lastRow = sheet.getLastRow();
+  if (lastRow < 2) return result;
+  const values = sheet.getRange(1, 1, lastRow, sheet.getLastColumn()).getValues();
+
+  // sheet row -> { status, number, date }, written back at the end
+  const updates = {};
+  function record(row, update) {
+    updates[row] = update;
+    values[row - 1][statusCol - 1] = update.status;
+    if (update.number) values[row - 1][invoiceNumCol - 1] = update.number;
+  }
+
+  // PDFs saved by an interrupted run whose cells were never written
+  Object.keys(resumed).forEach(row => {
+    const saved = resumed[row];
+    record(Number(row), { status: 'Generated', number: saved[0], date: new Date(saved[1]) });
+  });
+
+  const pending = [];
+  const firstRow = span ? Math.max(2, span.first) : 2;
+  const endRow = span ? Math.min(lastRow, span.last) : lastRow;
+  for (let row = firstRow; row <= endRow; row++) {
+    const value = String(values[row - 1][generateCol - 1] || '').trim().toLowerCase();
+    if (value === 'yes' && !updates[row]) pending.push(row);
+  }
+  console.log(pending.length + ' pending row(s)');
+
+  // Service numbers an earlier run got but did not use (saved PDFs above used theirs)
+  const usedNumbers = Object.keys(resumed).map(row => resumed[row][0]);
+  let unusedNumbers = checkpoint.numbers.filter(n => usedNumbers.indexOf(n) < 0);
+  if (pending.length) {
+    properties.setProperty(BATCH_PROPERTY + 'run', JSON.stringify({ sheetId: sheet.getSheetId(), span: span }));
+    const template = loadTemplate();
+
+    const invoices = [];
+    pending.forEach(row => {
+      try {
+        invoices.push({ row: row, invoice: prepareInvoice(values[row - 1], headerMap, template) });
+      } catch (err) {
+        record(row, { status: 'Error: ' + (err.message || err) });
+        result.failed++;
+      }
+    });
+
+    const invoiceDate = new Date();
+    const year = invoiceDate.getFullYear();
+    const needed = Math.min(invoices.length, BATCH_MAX_ROWS);
+    // Those go first, so the service's sequence has no gaps
+    const carried = unusedNumbers.filter(n => String(n).indexOf(year + '/') === 0);
+    const sheetSequence = () => nextInvoiceSequence(values.slice(1), statusCol - 1, invoiceNumCol - 1, year, template.start);
+    let numbers = [];
+    if (usesAllocator()) {
+      numbers = carried.slice(0, needed);
+      if (numbers.length < needed) {
+        numbers = numbers.concat(allocateInvoiceNumbers(invoiceDate, needed - numbers.length, sheetSequence));
+      }
+      // Kept until written back, in case this execution is stopped
+      properties.setProperty(BATCH_PROPERTY + 'numbers', JSON.stringify(numbers.concat(carried.slice(needed))));
+    } else if (needed) {
+      const first = sheetSequence();
+      for (let i = 0; i < needed; i++) numbers.push(formatInvoiceNumber(year, first + i));
+    }
+
+    // A number is only used up by a saved PDF; a failed row leaves it to the next one
+    let next = 0;
+    for (let i = 0; i < invoices.length; i++) {
+      if (next >= numbers.length || Date.now() - started > BATCH_TIME_BUDGET_MS) {
+        result.stopped = true;
+        break;
+      }
+      const row = invoices[i].row;
+      const invoiceNumber = numbers[next];
+      try {
+        const filledHtml = renderInvoice(invoices[i].invoice, invoiceNumber, invoiceDate);
+        const pdfFile = saveInvoicePdf(invoices[i].invoice, invoiceNumber, filledHtml);
+        console.log('Saved PDF file for row ' + row + ': ' + pdfFile.getUrl());
+        properties.setProperty(BATCH_PROPERTY + 'row:' + row, JSON.stringify([invoiceNumber, invoiceDate.getTime()]));
+        record(row, { status: 'Generated', number: invoiceNumber, date: invoiceDate });
+        next++;
+        result.generated++;
+      } catch (err) {
+        console.error('Error generating invoice for row ' + row + ': ' + err);
+        record(row, { status: 'Error: ' + (err.message || err) });
+        result.failed++;
+      }
+    }
+    unusedNumbers = CONFIG.ALLOCATOR_URL ? numbers.slice(next).concat(carried.slice(needed)) : [];
+  }
+
+  writeBatchUpdates(sheet, updates, headerMap);
+
+  // Written to the sheet, so the checkpoint is no longer needed
+  Object.keys(updates).forEach(row => properties.deleteProperty(BATCH_PROPERTY + 'row:' + row));
+  if (unusedNumbers.length) {
+    properties.setProperty(BATCH_PROPERTY + 'numbers', JSON.stringify(unusedNumbers));
+  } else {
+    properties.deleteProperty(BATCH_PROPERTY + 'numbers');
+  }
+  if (!result.stopped) properties.deleteProperty(BATCH_PROPERTY + 'run');
+  return result;
+}
+
+// Status, Invoice Number and Invoice Date of the updated rows in one setValues. Cells of the
+// block that are not updated are written back as they are now (formulas included), read just
+// before the write rather than taken from the start of the run, so edits made meanwhile stay.
+// Generate is cleared in the same write when it is next to those columns, in a second one otherwise.
+function writeBatchUpdates(sheet, updates, headerMap) {
+  const rows = Object.keys(updates).map(Number);
+  if (!rows.length) return;
+  const generateCol = headerMap[HEADER_NAMES.GENERATE];
+  const statusCol = headerMap[HEADER_NAMES.STATUS];
+  const invoiceNumCol = headerMap[HEADER_NAMES.INVOICE_NUM];
+  const invoiceDateCol = headerMap[HEADER_NAMES.INVOICE_DATE];
+
+  function cell(row, col) {
+    const update = updates[row];
+    if (!update) return undefined;
+    if (col === statusCol) return update.status;
+    if (update.status !== 'Generated') return undefined;
+    if (col === invoiceNumCol) return update.number;
+    if (col === invoiceDateCol) return update.date;
+    if (col === generateCol) return '';
+    return undefined;
   }
+
+  const firstRow = Math.min.apply(null, rows);
+  const lastRow = Math.max.apply(null, rows);
+  let firstCol = Math.min(statusCol, invoiceNumCol, invoiceDateCol);
+  let lastCol = Math.max(statusCol, invoiceNumCol, invoiceDateCol);
+  if (generateCol === firstCol - 1) firstCol = generateCol;
+  if (generateCol === lastCol + 1) lastCol = generateCol;
+  writeBlock(sheet, firstRow, lastRow, firstCol, lastCol, cell);
+  if (generateCol < firstCol || generateCol > lastCol) {
+    writeBlock(sheet, firstRow, lastRow, generateCol, generateCol, cell);
+  }
+}
+
+function writeBlock(sheet, firstRow, lastRow, firstCol, lastCol, cell) {
+  const range = sheet.getRange(firstRow, firstCol, lastRow - firstRow + 1, lastCol - firstCol + 1);
+  const formulas = range.getFormulas();
+  const current = range.getValues();
+  const block = formulas.map((formulaRow, i) => formulaRow.map((formula, j) => {
+    const value = cell(firstRow + i, firstCol + j);
+    if (value !== undefined) return value;
+    return formula || current[i][j];
+  }));
+  range.setValues(block);
+}
+
+function scheduleBatchResume() {
+  try {
+    ScriptApp.newTrigger('generatePendingInvoices').timeBased().after(BATCH_RESUME_AFTER_MS).create();
+    return true;
+  } catch (err) {
+    console.error('Could not schedule the rest of the run: ' + err);
+    return false;
+  }
+}
+
+function deleteBatchResumeTriggers() {
+  try {
+    ScriptApp.getProjectTriggers().forEach(trigger => {
+      if (trigger.getHandlerFunction() === 'generatePendingInvoices') ScriptApp.deleteTrigger(trigger);
+    });
+  } catch (err) {
+    // No permission to manage triggers; nothing was scheduled either
+  }
+}
+//#endif
+
+// ========== Script Cache for the Template and Header Row ==========
+// Entries are keyed by CONFIG.CACHE_VERSION, so a script set up for a new template never
+// sees the old one, and the template also by its Drive file's last update, so a template
+// replaced on Drive is read again on the next edit. CacheService keeps values for at most
+// 6 hours and 100 KB.
+const TEMPLATE_CACHE_SECONDS = 6 * 60 * 60;
+const HEADER_CACHE_SECONDS = 10 * 60;
+const headerMaps = {};
+
+function scriptCache() {
+  if (!CONFIG.CACHE_VERSION) return null;
+  try {
+    return CacheService.getScriptCache();
+  } catch (err) {
+    return null;
+  }
+}
+
+function cacheKey(name) {
+  return 'invoice:' + CONFIG.CACHE_VERSION + ':' + name;
+}
+
+function cacheGet(cache, key) {
+  const text = cache ? cache.get(key) : null;
+  if (!text) return null;
+  try {
+    return JSON.parse(text);
+  } catch (err) {
+    return null;
+  }
+}
+
+function cachePut(cache, key, value, seconds) {
+  if (!cache) return;
+  try {
+    cache.put(key, JSON.stringify(value), seconds);
+  } catch (err) {
+    // Too large for CacheService (big QR image); read it from Drive every time
+  }
+}
+
+// Template HTML with the facts read from it: { html, gst, state, start }
+function loadTemplate() {
+  if (!CONFIG.TEMPLATE_FILE_ID || CONFIG.TEMPLATE_FILE_ID.length <= 5) {
+    throw new Error('TEMPLATE_FILE_ID not configured');
+  }
+  let file;
+  try {
+    file = DriveApp.getFileById(CONFIG.TEMPLATE_FILE_ID);
+  } catch (err) {
+    throw new Error('Could not read template from Drive. Error: ' + err);
+  }
+
+  const cache = scriptCache();
+  let key = null;
+  if (cache) {
+    // Only the file's metadata is read when the cached template is still current
+    key = cacheKey('template:' + CONFIG.TEMPLATE_FILE_ID + ':' + file.getLastUpdated().getTime());
+    const cached = cacheGet(cache, key);
+    if (cached) return cached;
+  }
+
+  let html;
+  try {
+    html = file.getBlob().getDataAsString();
+  } catch (err) {
+    throw new Error('Could not read template from Drive. Error: ' + err);
+  }
+
+  // Check if template is GST-enabled
+  let gst = false;
+  //#if GST
+  gst = isGSTTemplate(html);
+  //#endif
+
+  const template = {
+    html: html,
+    gst: gst,
+    state: extractCompanyState(html),
+    start: extractStartingInvoiceNumber(html)
+  };
+  if (key) cachePut(cache, key, template, TEMPLATE_CACHE_SECONDS);
+  return template;
+}
+
+// getHeaderIndexMap, reused within an execution and (with CACHE_VERSION) across executions.
+// A cached map is only used while the sheet still has the same number of columns.
+function cachedHeaderIndexMap(sheet) {
+  const id = sheet.getSheetId();
+  if (headerMaps[id]) return headerMaps[id];
+
+  const cache = scriptCache();
+  const key = cacheKey('headers:' + id);
+  const lastCol = sheet.getLastColumn();
+  const cached = cacheGet(cache, key);
+  if (cached && cached.lastCol === lastCol) {
+    headerMaps[id] = cached.map;
+    return cached.map;
+  }
+
+  const map = getHeaderIndexMap(sheet);
+  cachePut(cache, key, { lastCol: lastCol, map: map }, HEADER_CACHE_SECONDS);
+  headerMaps[id] = map;
+  return map;
+}
+
+function forgetHeaderIndexMap(sheet) {
+  const id = sheet.getSheetId();
+  delete headerMaps[id];
+  const cache = scriptCache();
+  if (cache) cache.remove(cacheKey('headers:' + id));
 }
 
 // ========== Helper Functions ==========
@@ -883,59 +1358,69 @@ function numberToIndianWords(amount) {
   return result + ' Only';
 }
 
-function generateInvoiceNumber(sheet, invoiceDate, statusCol, invoiceNumCol, templateHtml) {
+// templateData: the template's starting invoice number, see extractStartingInvoiceNumber
+function generateInvoiceNumber(sheet, invoiceDate, statusCol, invoiceNumCol, templateData) {
   const currentYear = invoiceDate.getFullYear();
-  const prefix = currentYear + '/Inv/';
-  
-  // Extract invoice number from template
-  const templateData = extractStartingInvoiceNumber(templateHtml);
-  
+  return formatInvoiceNumber(currentYear, sheetInvoiceSequence(sheet, currentYear, statusCol, invoiceNumCol, templateData));
+}
+
+// Next sequence number of the year going by the invoices already in the sheet
+function sheetInvoiceSequence(sheet, currentYear, statusCol, invoiceNumCol, templateData) {
   // Check all rows in sheet for generated invoices
   const lastRow = sheet.getLastRow();
-  let maxInvoiceNumber = 0;
-  let hasGeneratedInvoices = false;
-  let isFirstInvoiceOfYear = false;
+  const startCol = Math.min(statusCol, invoiceNumCol);
+  let data = [];
   
   if (lastRow >= 2) {
-    const startCol = Math.min(statusCol, invoiceNumCol);
     const endCol = Math.max(statusCol, invoiceNumCol);
     const width = endCol - startCol + 1;
     const rowCount = lastRow - 1;
     
     if (rowCount > 0) {
       const dataRange = sheet.getRange(2, startCol, rowCount, width);
-      const data = dataRange.getValues();
-      
-      for (let i = 0; i < data.length; i++) {
-        const status = String(data[i][statusCol - startCol] || '').trim();
-        const existingInvoiceNum = String(data[i][invoiceNumCol - startCol] || '').trim();
-        
-        if (status === 'Generated' && existingInvoiceNum.startsWith(prefix)) {
-          hasGeneratedInvoices = true;
-          const parts = existingInvoiceNum.split('/');
-          if (parts.length === 3) {
-            const index = parseInt(parts[2], 10);
-            if (!isNaN(index) && index > maxInvoiceNumber) {
-              maxInvoiceNumber = index;
-            }
-          }
+      data = dataRange.getValues();
+    }
+  }
+  
+  return nextInvoiceSequence(data, statusCol - startCol, invoiceNumCol - startCol, currentYear, templateData);
+}
+
+// Next sequence number of the year from the data rows' Status and Invoice Number cells
+// (row arrays with those cells at statusIndex and numberIndex)
+function nextInvoiceSequence(data, statusIndex, numberIndex, currentYear, templateData) {
+  const prefix = currentYear + '/Inv/';
+  let maxInvoiceNumber = 0;
+  let hasGeneratedInvoices = false;
+  let isFirstInvoiceOfYear = false;
+  
+  for (let i = 0; i < data.length; i++) {
+    const status = String(data[i][statusIndex] || '').trim();
+    const existingInvoiceNum = String(data[i][numberIndex] || '').trim();
+    
+    if (status === 'Generated' && existingInvoiceNum.startsWith(prefix)) {
+      hasGeneratedInvoices = true;
+      const parts = existingInvoiceNum.split('/');
+      if (parts.length === 3) {
+        const index = parseInt(parts[2], 10);
+        if (!isNaN(index) && index > maxInvoiceNumber) {
+          maxInvoiceNumber = index;
         }
       }
+    }
+  }
+  
+  // Check if this is the first invoice of a new year
+  if (!hasGeneratedInvoices) {
+    // Check if there are any invoices from previous years
+    for (let i = 0; i < data.length; i++) {
+      const status = String(data[i][statusIndex] || '').trim();
+      const existingInvoiceNum = String(data[i][numberIndex] || '').trim();
       
-      // Check if this is the first invoice of a new year
-      if (!hasGeneratedInvoices) {
-        // Check if there are any invoices from previous years
-        for (let i = 0; i < data.length; i++) {
-          const status = String(data[i][statusCol - startCol] || '').trim();
-          const existingInvoiceNum = String(data[i][invoiceNumCol - startCol] || '').trim();
-          
-          if (status === 'Generated' && existingInvoiceNum.match(/\d{4}\/Inv\/\d{3}/)) {
-            const yearMatch = existingInvoiceNum.match(/^(\d{4})\//);
-            if (yearMatch && parseInt(yearMatch[1], 10) < currentYear) {
-              isFirstInvoiceOfYear = true;
-              break;
-            }
-          }
+      if (status === 'Generated' && existingInvoiceNum.match(/\d{4}\/Inv\/\d{3}/)) {
+        const yearMatch = existingInvoiceNum.match(/^(\d{4})\//);
+        if (yearMatch && parseInt(yearMatch[1], 10) < currentYear) {
+          isFirstInvoiceOfYear = true;
+          break;
         }
       }
     }
@@ -967,9 +1452,68 @@ function generateInvoiceNumber(sheet, invoiceDate, statusCol, invoiceNumCol, tem
     }
   }
   
-  const newIndex = String(nextNumber).padStart(3, '0');
-  return prefix + newIndex;
+  return nextNumber;
+}
+
+function formatInvoiceNumber(year, sequence) {
+  return year + '/Inv/' + String(sequence).padStart(3, '0');
+}
+
+// ========== Invoice Number from the Allocation Service ==========
+// Whether numbers come from the service; builds without its code only scan the sheet
+function usesAllocator() {
+  if (CONFIG.ALLOCATOR_URL && !FEATURES.ALLOCATOR) {
+    throw new Error('This script was set up without the invoice number service; copy it again from the setup page');
+  }
+  return !!CONFIG.ALLOCATOR_URL;
+}
+
+//#if ALLOCATOR
+// Years seeded per service URL, remembered in the document properties under this prefix
+const ALLOCATOR_SEEDED_PROPERTY = 'invoice:allocator-seeded:';
+
+function allocateInvoiceNumber(invoiceDate, sheetSequence) {
+  return allocateInvoiceNumbers(invoiceDate, 1, sheetSequence)[0];
+}
+
+// count consecutive numbers, in order. sheetSequence() gives the next number going by the
+// sheet (sheetInvoiceSequence); the first request of a year sends the number before it, so
+// a sequence the service does not have yet continues after the invoices already in the sheet.
+function allocateInvoiceNumbers(invoiceDate, count, sheetSequence) {
+  const year = invoiceDate.getFullYear();
+  const payload = { year: year, count: count };
+  
+  const properties = PropertiesService.getDocumentProperties();
+  const seededKey = ALLOCATOR_SEEDED_PROPERTY + CONFIG.ALLOCATOR_URL + ':' + year;
+  const seeded = properties.getProperty(seededKey);
+  if (!seeded) {
+    payload.seed_year = year;
+    payload.seed_number = sheetSequence() - 1;
+  }
+  
+  const headers = {};
+  if (CONFIG.ALLOCATOR_TOKEN) {
+    headers['X-Allocator-Token'] = CONFIG.ALLOCATOR_TOKEN;
+  }
+  
+  const response = UrlFetchApp.fetch(CONFIG.ALLOCATOR_URL.replace(/\/+$/, '') + '/allocate', {
+    method: 'post',
+    contentType: 'application/json',
+    payload: JSON.stringify(payload),
+    headers: headers,
+    muteHttpExceptions: true
+  });
+  
+  if (response.getResponseCode() !== 200) {
+    throw new Error('Invoice number service failed (' + response.getResponseCode() + '): ' + response.getContentText());
+  }
+  
+  if (!seeded) properties.setProperty(seededKey, '1');
+  const numbers = JSON.parse(response.getContentText()).numbers;
+  console.log('Allocated invoice number(s): ' + numbers[0] + (count > 1 ? ' to ' + numbers[numbers.length - 1] : ''));
+  return numbers;
 }
+//#endif
 
 function formatINR(num) {
   if (num == null || isNaN(Number(num))) return '0.00';
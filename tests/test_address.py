@@ -0,0 +1,33 @@
+"""
+convert_address_to_three_lines and convert_addresses against address_golden.json: each
+address with the lines the function gave before its patterns were precompiled
+"""
+import json
+import os
+
+from utils.address import convert_address_to_three_lines, convert_addresses
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'address_golden.json')
+
+
+def _golden():
+    with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_single_matches_golden():
+    golden = _golden()
+    got = {address: convert_address_to_three_lines(address) for address in golden}
+    assert got == golden
+
+
+def test_bulk_matches_golden():
+    golden = _golden()
+    addresses = list(golden)
+    # Repeats go through the memoized path
+    assert convert_addresses(addresses + addresses[::-1]) == [golden[a] for a in addresses + addresses[::-1]]
+
+
+def test_empty_address():
+    assert convert_address_to_three_lines(None) == '<br><br>'
+    assert convert_addresses([]) == []
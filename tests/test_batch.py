@@ -0,0 +1,93 @@
+"""
+python -m batch end to end on a small sheet export: worker pools, per-row errors and --zip
+"""
+import csv
+import random
+import zipfile
+
+import batch.__main__ as batch_main
+import batch.pdf as batch_pdf
+from benchmarks.corpus import company_profile
+from utils.generate import generate_template_html
+
+
+def _pool_sizes(monkeypatch, module):
+    sizes = []
+    real = module.ProcessPoolExecutor
+
+    def pool(max_workers, **kwargs):
+        sizes.append(max_workers)
+        return real(max_workers=max_workers, **kwargs)
+    monkeypatch.setattr(module, 'ProcessPoolExecutor', pool)
+    return sizes
+
+
+SHEET = (
+    'Client Name,Cost to Client,HSN/SAC,Description,Client Address,Client PAN,Client GSTIN,Client State,'
+    'Place of Supply,Generate(Yes/No),Status,Invoice Number,Invoice Date\n'
+    + ''.join(f'Client {i},{1000 + i},998314,Consulting,"{i} MG Road, Pune",ABCDE1234F,,Maharashtra,,yes,,,\n'
+              for i in range(6))
+)
+
+
+def _batch_inputs(tmp_path):
+    sheet, template = tmp_path / 'sheet.csv', tmp_path / 'template.html'
+    sheet.write_text(SHEET, encoding='utf-8')
+    template.write_text(generate_template_html(company_profile(random.Random(11)), '#3b0764', True, False, False),
+                        encoding='utf-8')
+    return str(sheet), str(template)
+
+
+def test_batch_shares_workers_between_html_and_pdf(tmp_path, monkeypatch):
+    sheet, template = _batch_inputs(tmp_path)
+    html_pools = _pool_sizes(monkeypatch, batch_main)
+    pdf_pools = _pool_sizes(monkeypatch, batch_pdf)
+
+    results = batch_main.run_batch(sheet, template, str(tmp_path / 'four'), workers=4, pdf_backend='stand-in')
+    assert (html_pools, pdf_pools) == ([2], [2])
+    assert [r[1] for r in results] == ['Generated'] * 6
+    assert all(r[-1].endswith('.pdf') for r in results)
+
+    # A single worker converts PDFs; the HTML is rendered in this process
+    del html_pools[:], pdf_pools[:]
+    results = batch_main.run_batch(sheet, template, str(tmp_path / 'one'), workers=1, pdf_backend='stand-in')
+    assert (html_pools, pdf_pools) == ([], [1])
+    assert [r[1] for r in results] == ['Generated'] * 6
+
+    del html_pools[:], pdf_pools[:]
+    batch_main.run_batch(sheet, template, str(tmp_path / 'html'), workers=4)
+    assert (html_pools, pdf_pools) == ([4], [])
+
+
+def test_bad_row_gets_an_error_status(tmp_path, monkeypatch):
+    sheet, template = _batch_inputs(tmp_path)
+    render = batch_main.render_invoice
+
+    def render_invoice(prepared, row, *args):
+        if row['CLIENT'] == 'Client 2':
+            raise ValueError('bad cost')
+        return render(prepared, row, *args)
+    monkeypatch.setattr(batch_main, 'render_invoice', render_invoice)
+
+    out = tmp_path / 'out'
+    results = batch_main.run_batch(sheet, template, str(out), workers=1, pdf_backend='stand-in')
+    assert [r[1] for r in results].count('Generated') == 5
+    assert [r for r in results if r[0] == 4] == [[4, 'Error: ValueError: bad cost', '', '', '', '']]
+    with open(out / 'results.csv', encoding='utf-8') as f:
+        assert len(list(csv.reader(f))) == 7
+
+
+def test_zip_holds_only_this_run(tmp_path):
+    sheet, template = _batch_inputs(tmp_path)
+    out = tmp_path / 'out'
+    out.mkdir()
+    (out / 'old_invoice.html').write_text('left from an earlier run', encoding='utf-8')
+    archive = tmp_path / 'run.zip'
+    assert batch_main.main([sheet, '--template', template, '--out', str(out), '--workers', '2',
+                            '--pdf', 'stand-in', '--zip', str(archive)]) == 0
+    with zipfile.ZipFile(archive) as z:
+        names = z.namelist()
+    assert 'old_invoice.html' not in names
+    assert names[-1] == 'results.csv'
+    assert sorted(n for n in names if n.endswith('.html')) == sorted(p.name for p in out.glob('*.html') if p.name != 'old_invoice.html')
+    assert len([n for n in names if n.endswith('.pdf')]) == 6
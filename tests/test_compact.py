@@ -0,0 +1,151 @@
+"""
+compact_template on the templates the generator produces: every variant is rendered the
+way script.gs fills it, before and after compaction, and the two DOM trees must match
+"""
+import random
+import re
+from html.parser import HTMLParser
+from itertools import product
+
+import pytest
+
+from benchmarks.corpus import company_profile
+from utils.compact import compact_checked, compact_template, compaction_problems
+from utils.engine import SLOT_PATTERN, compile_template_source
+from utils.generate import generate_template_html
+
+BLOCK = {'html', 'head', 'body', 'title', 'style', 'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr',
+         'ul', 'ol', 'li', 'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption', 'meta', 'link'}
+VOID = {'br', 'hr', 'img', 'meta', 'link', 'input', 'col', 'wbr'}
+PRESERVE = {'pre', 'textarea', 'script'}
+
+# Whitespace-sensitive content a user might add to a generated template
+NOTES = ('<pre class="notes">  Terms:\n    1. Net 30\n    2.  Late fee  2%</pre>\n'
+         '<div style="white-space: pre-line">Bank   transfer\n   only</div>\n'
+         '<textarea readonly>\n  keep  this\n</textarea>\n')
+
+
+class _Tree(HTMLParser):
+    """Element tree as (tag, attrs, children); text nodes are strings"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = ('#root', (), [])
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = (tag, tuple(sorted((k, ' '.join((v or '').split())) for k, v in attrs)), [])
+        self.stack[-1][2].append(node)
+        if tag not in VOID:
+            self.stack.append(node)
+
+    def handle_endtag(self, tag):
+        if tag in VOID:
+            return
+        assert self.stack[-1][0] == tag, f'</{tag}> closes <{self.stack[-1][0]}>'
+        self.stack.pop()
+
+    def handle_data(self, data):
+        self.stack[-1][2].append(data)
+
+    def handle_decl(self, decl):
+        self.stack[-1][2].append(('!' + decl.lower(), (), []))
+
+
+def _preserves(node):
+    return node[0] in PRESERVE or 'white-space' in dict(node[1]).get('style', '')
+
+
+def _normalize(node, preserve=False):
+    """node with text collapsed the way it renders; whitespace next to block boundaries dropped"""
+    tag, attrs, children = node
+    if tag == 'style':
+        css = re.sub(r'/\*.*?\*/', '', ''.join(children), flags=re.DOTALL)
+        return (tag, attrs, [re.sub(r'\s+', '', css).replace(';}', '}')])
+    preserve = preserve or _preserves(node)
+    merged = []
+    for child in children:
+        if isinstance(child, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += child
+        else:
+            merged.append(child)
+    if preserve:
+        return (tag, attrs, [c if isinstance(c, str) else _normalize(c, True) for c in merged])
+
+    def boundary(i):
+        return i < 0 or i >= len(merged) or (not isinstance(merged[i], str) and (merged[i][0] in BLOCK or merged[i][0].startswith('!')))
+
+    out = []
+    for i, child in enumerate(merged):
+        if isinstance(child, str):
+            text = re.sub(r'\s+', ' ', child)
+            if boundary(i - 1) and (tag in BLOCK or tag == '#root' or i > 0):
+                text = text.lstrip(' ')
+            if boundary(i + 1) and (tag in BLOCK or tag == '#root' or i < len(merged) - 1):
+                text = text.rstrip(' ')
+            if text:
+                out.append(text)
+        else:
+            out.append(_normalize(child))
+    return (tag, attrs, out)
+
+
+def dom(html):
+    parser = _Tree()
+    parser.feed(re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL))
+    parser.close()
+    return _normalize(parser.root)
+
+
+def _filled(html, international, hsn, gst):
+    """The template as script.gs fills it for one invoice"""
+    compiled = compile_template_source(html)
+    rendered = compiled.render(
+        conditions={'INTERNATIONAL_PARTY': international, 'HAS_HSN': hsn},
+        regions={'TOTAL_GST': gst and not international}
+    )
+    return SLOT_PATTERN.sub(lambda m: f'value  of {m.group(0)[2:-2]}', rendered)
+
+
+def _variants():
+    rng = random.Random(18)
+    companies = [company_profile(rng) for _ in range(3)]
+    for (i, company), (has_gst, has_msme, has_qr) in product(enumerate(companies), product((False, True), repeat=3)):
+        yield pytest.param(company, ('#3b0764', '#0f766e', '#b91c1c')[i], has_gst, has_msme, has_qr,
+                           id=f'company{i}-gst{int(has_gst)}-msme{int(has_msme)}-qr{int(has_qr)}')
+
+
+@pytest.mark.parametrize('company, color, has_gst, has_msme, has_qr', list(_variants()))
+def test_generated_template_renders_the_same(company, color, has_gst, has_msme, has_qr):
+    template = generate_template_html(company, color, has_gst, has_msme, has_qr)
+    template = template.replace('</body>', NOTES + '</body>')
+    compacted, problems = compact_checked(template)
+    assert problems == ()
+    assert len(compacted) < len(template)
+    for flags in product((False, True), repeat=3):
+        assert dom(_filled(compacted, *flags)) == dom(_filled(template, *flags)), flags
+
+
+@pytest.mark.parametrize('html, kept', [
+    ('<pre>  x\n  y</pre>', '  x\n  y'),
+    ('<div>\n  <textarea>\n a  b\n</textarea>\n</div>', '\n a  b\n'),
+    ('<p style="white-space: pre-line">a\n   b</p>', 'a\n   b'),
+    ('<style>.n { white-space: pre-wrap }</style><div class="x n">a   b <b> c  </b></div>', 'a   b <b> c  </b>'),
+    ('<pre>a <pre> b  </pre>  c  </pre>', '  c  '),
+])
+def test_whitespace_sensitive_text_is_kept(html, kept):
+    compacted = compact_template(html)
+    assert kept in compacted
+    assert compaction_problems(html, compacted) == []
+
+
+def test_collapsed_pre_is_reported():
+    assert compaction_problems('<pre>  x\n  y</pre>', '<pre> x y</pre>')
+    assert compaction_problems('<div style="white-space:pre">a  b</div>', '<div style="white-space:pre">a b</div>')
+
+
+def test_insignificant_whitespace_is_dropped():
+    html = '<div>\n  <p>  some   text </p>\n</div>\n<span>a   b</span>'
+    compacted = compact_template(html)
+    assert compacted == '<div><p>some text</p></div><span>a b</span>'
+    assert dom(compacted) == dom(html)
@@ -0,0 +1,29 @@
+"""
+amount_in_words (integer paise kernel) is correct up to its 1000 crore limit; the
+number_to_indian_words port keeps script.gs's wording, quirks included
+"""
+import random
+
+from utils.money import amount_in_words, indian_group_words, number_to_indian_words
+
+
+def test_kernel_limit_matches_its_message():
+    assert amount_in_words(1000 * 10 ** 7 * 100) == 'One Thousand Crore Rupees Only'
+    assert amount_in_words(1000 * 10 ** 7 * 100 + 1) == 'Amount exceeds 1000 crore'
+
+
+def test_kernel_never_spells_undefined():
+    rng = random.Random(5)
+    for minor in [rng.randrange(10 ** 12) for _ in range(5000)] + [99, 100, 999 * 10 ** 9 + 99]:
+        assert 'undefined' not in amount_in_words(minor)
+
+
+def test_kernel_crore_grouping():
+    assert indian_group_words(123 * 10 ** 7 + 4500000) == 'One Hundred Twenty Three Crore Forty Five Lakh'
+    assert amount_in_words(150) == 'One Rupees and Fifty Paise Only'
+
+
+def test_port_keeps_script_wording():
+    assert number_to_indian_words(12345678912.5).startswith('undefined Hundred Thirty Four Crore')
+    assert number_to_indian_words(1.999) == 'One Rupees and undefined Paise Only'
+    assert number_to_indian_words(100000000001) == 'Amount exceeds 1000 crore'
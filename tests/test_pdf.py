@@ -0,0 +1,111 @@
+"""
+convert_many with the stand-in backend and with backends that fail, crash their worker
+or hang: retries, timeouts and the isolated retries after a BrokenProcessPool
+"""
+import os
+import time
+
+from batch.pdf import StandInBackend, convert_many
+
+
+def _once(marker):
+    """True the first time marker (a file path) is seen, across worker processes"""
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+        return True
+    except FileExistsError:
+        return False
+
+
+class FlakyBackend(StandInBackend):
+    """'fail:<path>' documents raise once, 'fail-always' ones every time"""
+
+    def render(self, html):
+        if html.startswith('fail-always') or (html.startswith('fail:') and _once(html[5:])):
+            raise RuntimeError('backend failed')
+        return super().render(html)
+
+
+class CrashingBackend(StandInBackend):
+    """'crash:<path>' documents kill their worker once, 'crash-always' ones every time"""
+
+    def render(self, html):
+        if html.startswith('crash-always') or (html.startswith('crash:') and _once(html[6:])):
+            os._exit(1)
+        return super().render(html)
+
+
+class HangingBackend(StandInBackend):
+    """'hang' documents never finish"""
+
+    def render(self, html):
+        if html.startswith('hang'):
+            time.sleep(60)
+        return super().render(html)
+
+
+def _documents(count):
+    return [(f'doc{i}', f'<html><body><p>Invoice {i}</p></body></html>') for i in range(count)]
+
+
+def _by_name(results):
+    out = {}
+    for name, pdf, error, attempts in results:
+        assert name not in out, f'{name} yielded twice'
+        out[name] = (pdf, error, attempts)
+    return out
+
+
+def test_stand_in_converts_every_document():
+    documents = _documents(25)
+    results = _by_name(convert_many(iter(documents), 'stand-in', workers=3))
+    expected = StandInBackend()
+    assert set(results) == {name for name, _ in documents}
+    for name, html in documents:
+        pdf, error, attempts = results[name]
+        assert (error, attempts) == (None, 1)
+        assert pdf == expected.render(html)
+        assert pdf.startswith(b'%PDF-1.4') and pdf.endswith(b'%%EOF\n')
+
+
+def test_failures_are_retried(tmp_path):
+    documents = _documents(6) + [('flaky', 'fail:' + str(tmp_path / 'flaky')), ('broken', 'fail-always')]
+    results = _by_name(convert_many(documents, FlakyBackend, workers=2, retries=2))
+    assert results['flaky'][1:] == (None, 2)
+    assert results['flaky'][0].startswith(b'%PDF')
+    pdf, error, attempts = results['broken']
+    assert pdf is None and attempts == 3
+    assert error == 'RuntimeError: backend failed'
+    assert all(results[name][1:] == (None, 1) for name, _ in _documents(6))
+
+
+def test_no_retries():
+    results = _by_name(convert_many([('broken', 'fail-always')], FlakyBackend, workers=1, retries=0))
+    assert results['broken'][0] is None and results['broken'][2] == 1
+
+
+def test_hanging_conversion_times_out():
+    documents = _documents(4) + [('stuck', 'hang')]
+    started = time.monotonic()
+    results = _by_name(convert_many(documents, HangingBackend, workers=2, timeout=0.5, retries=1))
+    assert time.monotonic() - started < 10
+    pdf, error, attempts = results['stuck']
+    assert pdf is None and attempts == 2
+    assert error.startswith('PdfTimeout')
+    assert all(results[name][1] is None for name, _ in _documents(4))
+
+
+def test_crashed_worker_is_isolated(tmp_path):
+    documents = _documents(12)
+    crash_once = 'crash:' + str(tmp_path / 'crash')
+    documents[3] = ('crash-once', crash_once)
+    documents[8] = ('crash-always', 'crash-always')
+    results = _by_name(convert_many(documents, CrashingBackend, workers=3, retries=2))
+    assert set(results) == {name for name, _ in documents}
+    # Documents in flight with a crash are retried alone and still convert
+    for name, html in documents:
+        if name != 'crash-always':
+            assert results[name][:2] == (StandInBackend().render(html), None), name
+    pdf, error, attempts = results['crash-always']
+    assert pdf is None and attempts == 3
+    assert error.startswith('BrokenProcessPool')
@@ -0,0 +1,26 @@
+"""configured_script when codes.json is missing: the script keeps its own STATE_CODES table"""
+import os
+import re
+
+import pytest
+
+import utils.assets as assets
+from utils.script import configured_script, read_script_file
+
+_STATE_CODES = re.compile(r'^const STATE_CODES = .*;$', re.MULTILINE)
+
+
+def test_missing_codes_json_keeps_the_script_table(tmp_path, monkeypatch):
+    real_path = assets.asset_path
+    monkeypatch.setattr(assets, 'asset_path',
+                        lambda name: str(tmp_path / name) if name == 'codes.json' else real_path(name))
+    with pytest.warns(RuntimeWarning, match='codes.json'):
+        script = configured_script('t' * 33, 'f' * 33)
+    assert "TEMPLATE_FILE_ID: '" + 't' * 33 + "'" in script
+    assert _STATE_CODES.search(script).group(0) == _STATE_CODES.search(read_script_file()).group(0)
+    assert os.path.exists(real_path('codes.json'))
+
+
+def test_codes_json_fills_the_table():
+    script = configured_script('t' * 33, 'f' * 33)
+    assert '"Maharashtra":"27"' in _STATE_CODES.search(script).group(0)
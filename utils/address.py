@@ -1,5 +1,13 @@
 import re
+from functools import lru_cache
+from utils.profiling import profiled
 
+# Patterns compiled once at import
+_WHITESPACE = re.compile(r'\s+')
+_DELIMITERS = re.compile(r'[,;|]')
+_LONG_SPACES = re.compile(r'\s{2,}')
+
+@profiled()
 def convert_address_to_three_lines(address):
     """
     Convert single line address to exactly 3 lines.
@@ -15,10 +23,10 @@ def convert_address_to_three_lines(address):
     address = address.replace('<br>', ' ').replace('<BR>', ' ')
     
     # Normalize spaces
-    address = re.sub(r'\s+', ' ', address).strip()
+    address = _WHITESPACE.sub(' ', address).strip()
     
     # Split by common delimiters: comma, semicolon, pipe
-    parts = re.split(r'[,;|]', address)
+    parts = _DELIMITERS.split(address)
     parts = [p.strip() for p in parts if p.strip()]
     
     if len(parts) == 0:
@@ -27,7 +35,7 @@ def convert_address_to_three_lines(address):
     # If only 1 part, try to split by long spaces or dashes
     if len(parts) == 1:
         # Try splitting by multiple spaces (2 or more)
-        parts = re.split(r'\s{2,}', parts[0])
+        parts = _LONG_SPACES.split(parts[0])
         parts = [p.strip() for p in parts if p.strip()]
     
     # If still only 1 part, split by reasonable word count
@@ -58,27 +66,36 @@ def convert_address_to_three_lines(address):
         return '<br>'.join(parts)
     else:
         # More than 3 parts: distribute evenly
-        parts_per_line = len(parts) / 3.0
-        
+        total = len(parts)
         lines = []
-        current_line_parts = []
-        target_parts = parts_per_line
+        start = 0
+        # Parts already placed on finished lines, tracked instead of re-counted
+        placed = 0
+        target_parts = total / 3.0
         
-        for i, part in enumerate(parts):
-            current_line_parts.append(part)
-            
+        for i in range(total):
             # Check if we should move to next line
-            if len(lines) < 2 and len(current_line_parts) >= target_parts:
-                lines.append(', '.join(current_line_parts))
-                current_line_parts = []
-                target_parts = (len(parts) - sum(len(l.split(', ')) for l in lines)) / (3 - len(lines))
+            if len(lines) < 2 and (i + 1 - start) >= target_parts:
+                lines.append(', '.join(parts[start:i + 1]))
+                placed = i + 1
+                start = placed
+                target_parts = (total - placed) / (3 - len(lines))
         
         # Add remaining parts to last line
-        if current_line_parts:
-            lines.append(', '.join(current_line_parts))
+        if start < total:
+            lines.append(', '.join(parts[start:]))
         
         # Ensure exactly 3 lines
         while len(lines) < 3:
             lines.append('')
         
-        return '<br>'.join(lines[:3])
\ No newline at end of file
+        return '<br>'.join(lines[:3])
+
+@lru_cache(maxsize=4096)
+def _convert_cached(address):
+    return convert_address_to_three_lines(address)
+
+@profiled()
+def convert_addresses(addresses):
+    """Convert many addresses, reusing results for repeated client addresses"""
+    return [_convert_cached(address) for address in addresses]
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+
+# Asset files live next to app.py, not in whatever directory streamlit was started from
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Known assets and how to load them
+ASSETS = {
+    'template.html': _read_text,
+    'script.gs': _read_text,
+    'codes.json': _read_json,
+}
+
+
+class _Entry:
+    """Loaded asset value plus forms derived from it"""
+
+    __slots__ = ('stamp', 'value', 'derived')
+
+    def __init__(self, stamp, value):
+        self.stamp = stamp
+        self.value = value
+        self.derived = {}
+
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def asset_path(name):
+    """Absolute path of an asset in the package root"""
+    return os.path.join(ROOT_DIR, name)
+
+
+def _load(name):
+    """Return the cached entry for an asset, reloading it if the file changed"""
+    path = asset_path(name)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _entries.pop(name, None)
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    entry = _entries.get(name)
+    if entry is not None and entry.stamp == stamp:
+        return entry
+
+    with _lock:
+        # Another session may have reloaded it while we waited
+        entry = _entries.get(name)
+        if entry is None or entry.stamp != stamp:
+            try:
+                entry = _Entry(stamp, ASSETS[name](path))
+            except FileNotFoundError:
+                _entries.pop(name, None)
+                return None
+            _entries[name] = entry
+    return entry
+
+
+def get_asset(name):
+    """Return the parsed contents of an asset, or None if the file is missing"""
+    entry = _load(name)
+    return entry.value if entry is not None else None
+
+
+def get_derived(name, key, build):
+    """Return build(asset) computed once per version of the asset file"""
+    entry = _load(name)
+    if entry is None:
+        return None
+    derived = entry.derived
+    if key not in derived:
+        derived[key] = build(entry.value)
+    return derived[key]
+
+
+def warm_assets():
+    """Load every asset so the first session doesn't pay for it"""
+    for name in ASSETS:
+        _load(name)
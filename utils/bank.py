@@ -1,3 +1,6 @@
+from utils.profiling import profiled
+
+@profiled()
 def format_bank_details(ac_holder, bank, ac_no, ifsc):
     """Format bank details into 4-line HTML"""
     line1 = f"A/c Holder: {ac_holder}"
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+import zipfile
+from utils.cache import LRUCache
+from utils.profiling import profiled
+
+# ZIP bundles of the template, the configured script and rendered invoices.
+# Entries are (archive name, data) where data is str, bytes or a pathlib.Path read from disk.
+
+CHUNK_SIZE = 64 * 1024
+
+# Built archives by content digest, shared across sessions
+BUNDLE_DIR = os.path.join(tempfile.gettempdir(), 'invoice-bundles')
+BUNDLE_KEEP = 32
+
+# Recently sent archives, so reruns hand Streamlit the same bytes object
+BUNDLE_BYTES = LRUCache(maxsize=4)
+
+# Fixed timestamp so the same entries always give the same archive bytes
+_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+_build_lock = threading.Lock()
+
+
+def _iter_data(data):
+    """Chunks of an entry's content"""
+    if isinstance(data, pathlib.Path):
+        with open(data, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+    else:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        for start in range(0, len(data), CHUNK_SIZE):
+            yield data[start:start + CHUNK_SIZE]
+
+
+def bundle_digest(entries):
+    """SHA-256 over the archive names and contents, in order"""
+    digest = hashlib.sha256()
+    for name, data in entries:
+        content = hashlib.sha256()
+        for chunk in _iter_data(data):
+            content.update(chunk)
+        digest.update(name.encode('utf-8') + b'\0' + content.digest())
+    return digest.hexdigest()
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def iter_zip(entries):
+    """
+    Yield a deflated ZIP archive of entries chunk by chunk.
+    Only one chunk of input and its compressed output are held at a time.
+    """
+    sink = _ChunkSink()
+    # An unseekable target makes zipfile write sizes in data descriptors after each entry
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=_ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            with archive.open(info, 'w') as member:
+                for chunk in _iter_data(data):
+                    member.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def build_bundle(entries, directory=BUNDLE_DIR):
+    """
+    Path of the ZIP for entries, written only if no archive with the same content exists.
+    entries must be a list (it is read twice: once to hash, once to write).
+    """
+    digest = bundle_digest(entries)
+    path = os.path.join(directory, digest + '.zip')
+    with _build_lock:
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter_zip(entries):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        _prune(directory)
+    return path
+
+
+def _prune(directory, keep=BUNDLE_KEEP):
+    """Drop the least recently used archives beyond keep"""
+    archives = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith('.zip')
+    ]
+    if len(archives) <= keep:
+        return
+    archives.sort(key=os.path.getmtime)
+    for path in archives[:-keep]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+@profiled()
+def bundle_bytes(entries):
+    """
+    (digest, archive bytes) for a download button, built and read once per content.
+    download_button takes the archive whole, so this is meant for the small setup bundle;
+    large ones are streamed to a file with iter_zip (python -m batch --zip)
+    """
+    path = build_bundle(entries)
+    digest = os.path.basename(path)[:-4]
+
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return digest, BUNDLE_BYTES.get_or_set(digest, read)
+
+
+def directory_entries(directory, names, prefix=''):
+    """(archive name, Path) for the named files of a directory, in the given order"""
+    return [(prefix + name, pathlib.Path(directory, name)) for name in names]
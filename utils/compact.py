@@ -0,0 +1,286 @@
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+from itertools import product
+from utils.engine import SLOT_PATTERN, MARKER_PATTERN, compile_template_source
+from utils.profiling import profiled
+
+# Opt-in compaction of a generated template: comments dropped, CSS minified and whitespace
+# collapsed. Slots, <? ?> markers and the patterns script.gs searches for are kept intact,
+# and the result is only used if it checks out as equivalent to the input.
+
+# Elements that start or end a line box, so whitespace next to their tags never renders
+BLOCK_TAGS = frozenset((
+    '!doctype', 'html', 'head', 'body', 'meta', 'title', 'link', 'style',
+    'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr', 'ul', 'ol', 'li',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption',
+))
+
+# Elements whose text keeps its whitespace; so does any element with a white-space style,
+# inline or from a <style> rule (whitespace_rules)
+VERBATIM_TAGS = frozenset(('pre', 'textarea', 'script'))
+VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'))
+
+# Patterns script.gs (and batch/invoice.py) run against the template; groups must survive
+SCRIPT_PATTERNS = (
+    ('invoice number', re.compile(r'<div class="meta-line"><strong>Invoice No:</strong>\s*(\d{4})/Inv/(\d{3})</div>')),
+    ('company state', re.compile(r'<strong>State:</strong>\s*([^&<]+)')),
+    ('company GST', re.compile(r'<strong>GST:</strong>\s*[A-Z0-9]+', re.IGNORECASE)),
+    ('INTERNATIONAL_PARTY block', re.compile(r'<\?\s*if\s*\(\s*INTERNATIONAL_PARTY\s*\)\s*\{\s*\?>(.*?)<\?\s*\}\s*\?>', re.DOTALL)),
+    ('!INTERNATIONAL_PARTY block', re.compile(r'<\?\s*if\s*\(\s*!INTERNATIONAL_PARTY\s*\)\s*\{\s*\?>(.*?)<\?\s*\}\s*\?>', re.DOTALL)),
+    ('HAS_HSN block', re.compile(r'<\?\s*if\s*\(\s*HAS_HSN\s*\)\s*\{\s*\?>(.*?)<\?\s*\}\s*else\s*\{\s*\?>(.*?)<\?\s*\}\s*\?>', re.DOTALL)),
+    ('Total GST row', re.compile(r'<tr>\s*<th>\s*Total\s*GST\s*</th>\s*<td>\s*{{GST_DISPLAY}}\s*</td>\s*</tr>\s*', re.DOTALL | re.IGNORECASE)),
+)
+
+_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_STYLE = re.compile(r'(<style\b[^>]*>)(.*?)(</style>)', re.DOTALL | re.IGNORECASE)
+# Tokens whose insides are left alone: markers, style blocks and tags
+_TOKENS = re.compile(r'(<\?.*?\?>|<style\b.*?</style>|<[^>]*>)', re.DOTALL | re.IGNORECASE)
+_TAG_NAME = re.compile(r'</?\s*(!?[a-zA-Z][a-zA-Z0-9]*)')
+_WHITESPACE = re.compile(r'\s+')
+_ATTRIBUTE = re.compile(r'([^\s"\'<>/=]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+_CSS_RULE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+_SELECTOR_PARTS = re.compile(r'([.#]?)(-?[_a-zA-Z][-\w]*|\*)')
+
+_CSS_STRINGS = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_COLON = re.compile(r':\s+')
+_CSS_LAST_SEMICOLON = re.compile(r';}')
+
+
+def minify_css(css):
+    """Drop comments and insignificant whitespace; quoted strings are kept as-is"""
+    parts = _CSS_STRINGS.split(_CSS_COMMENT.sub('', css))
+    for i in range(0, len(parts), 2):
+        code = _WHITESPACE.sub(' ', parts[i])
+        code = _CSS_PUNCTUATION.sub(r'\1', code)
+        code = _CSS_COLON.sub(':', code)
+        parts[i] = _CSS_LAST_SEMICOLON.sub('}', code)
+    return ''.join(parts).strip()
+
+
+def whitespace_rules(html):
+    """
+    (tags, classes, ids) picked by the last compound selector of any <style> rule that sets
+    white-space; '*' in tags means every element. Over-inclusive on purpose.
+    """
+    tags, classes, ids = set(), set(), set()
+    for style in _STYLE.finditer(html):
+        for selectors, body in _CSS_RULE.findall(_CSS_COMMENT.sub('', style.group(2))):
+            if 'white-space' not in body.lower():
+                continue
+            for selector in selectors.split(','):
+                compound = re.split(r'[\s>+~]+', selector.strip())[-1]
+                for kind, name in _SELECTOR_PARTS.findall(compound.split(':')[0]):
+                    {'': tags, '.': classes, '#': ids}[kind].add(name if kind else name.lower())
+    return frozenset(tags), frozenset(classes), frozenset(ids)
+
+
+def keeps_whitespace(tag, attrs, rules):
+    """Whether the text of this element renders with its whitespace as written"""
+    if tag in VOID_TAGS:
+        return False
+    if tag in VERBATIM_TAGS or 'white-space' in (attrs.get('style') or '').lower():
+        return True
+    tags, classes, ids = rules
+    return ('*' in tags or tag in tags or attrs.get('id') in ids
+            or not classes.isdisjoint((attrs.get('class') or '').split()))
+
+
+def _tag_attrs(token):
+    attrs = {}
+    for name, value in _ATTRIBUTE.findall(token[_TAG_NAME.match(token).end():].rstrip('>/')):
+        if value[:1] in ('"', "'"):
+            value = value[1:-1]
+        attrs.setdefault(name.lower(), value)
+    return attrs
+
+
+def _is_block(token):
+    if not token or not token.startswith('<') or token.startswith('<?'):
+        return False
+    match = _TAG_NAME.match(token)
+    return bool(match) and match.group(1).lower() in BLOCK_TAGS
+
+
+def compact_template(html):
+    """Compacted copy of html without any equivalence check, see compact_checked"""
+    html = _COMMENT.sub('', html)
+    html = _STYLE.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), html)
+    rules = whitespace_rules(html)
+    tokens = _TOKENS.split(html)
+    # tokens alternate text, tag, text, ..., text; verbatim is the open element (tag, depth)
+    # whose text is kept as written
+    verbatim = None
+    for i in range(0, len(tokens), 2):
+        if i > 0:
+            verbatim = _track_verbatim(verbatim, tokens[i - 1], rules)
+        if verbatim:
+            continue
+        text = _WHITESPACE.sub(' ', tokens[i])
+        if i > 0 and _is_block(tokens[i - 1]):
+            text = text.lstrip(' ')
+        if i + 1 < len(tokens) and _is_block(tokens[i + 1]):
+            text = text.rstrip(' ')
+        tokens[i] = text
+    return ''.join(tokens).strip()
+
+
+def _track_verbatim(verbatim, token, rules):
+    """verbatim after token, a tag or <? ?> marker"""
+    match = _TAG_NAME.match(token)
+    if not match or token.startswith('<!'):
+        return verbatim
+    tag = match.group(1).lower()
+    closing = token.startswith('</')
+    if verbatim:
+        if tag == verbatim[0]:
+            depth = verbatim[1] + (-1 if closing else 1)
+            return (tag, depth) if depth else None
+        return verbatim
+    if not closing and not token.endswith('/>') and keeps_whitespace(tag, _tag_attrs(token), rules):
+        return (tag, 1)
+    return None
+
+
+# ---------- Equivalence checks ----------
+
+class _DomEvents(HTMLParser):
+    """
+    Flat start/end/text events with whitespace normalized the way a browser renders it;
+    text inside elements that keep their whitespace is a 'verbatim' event, as written
+    """
+
+    def __init__(self, rules):
+        super().__init__(convert_charrefs=False)
+        self.events = []
+        self._style = False
+        self._rules = rules
+        self._verbatim = None
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(('start', tag, tuple(sorted((k, _WHITESPACE.sub(' ', v or '').strip()) for k, v in attrs))))
+        self._style = tag == 'style'
+        if self._verbatim:
+            if tag == self._verbatim[0]:
+                self._verbatim = (tag, self._verbatim[1] + 1)
+        elif keeps_whitespace(tag, {k: v for k, v in reversed(attrs)}, self._rules):
+            self._verbatim = (tag, 1)
+
+    def handle_startendtag(self, tag, attrs):
+        self.events.append(('start', tag, tuple(sorted((k, _WHITESPACE.sub(' ', v or '').strip()) for k, v in attrs))))
+        self.events.append(('end', tag))
+
+    def handle_endtag(self, tag):
+        self.events.append(('end', tag))
+        self._style = False
+        if self._verbatim and tag == self._verbatim[0]:
+            depth = self._verbatim[1] - 1
+            self._verbatim = (tag, depth) if depth else None
+
+    def _text(self, data):
+        if self._verbatim:
+            self.events.append(('verbatim', data))
+        else:
+            self.events.append(('text', _WHITESPACE.sub(' ', data)))
+
+    def handle_data(self, data):
+        if self._style:
+            self.events.append(('css', minify_css(data)))
+        else:
+            self._text(data)
+
+    def handle_entityref(self, name):
+        self._text(f'&{name};')
+
+    def handle_charref(self, name):
+        self._text(f'&#{name};')
+
+    def handle_decl(self, decl):
+        self.events.append(('decl', decl.lower()))
+
+
+def normalized_dom(html):
+    """Parsed event list with adjacent text merged and whitespace at block boundaries dropped"""
+    html = _COMMENT.sub('', html)
+    parser = _DomEvents(whitespace_rules(html))
+    parser.feed(html)
+    parser.close()
+
+    merged = []
+    for event in parser.events:
+        if event[0] in ('text', 'verbatim') and merged and merged[-1][0] == event[0]:
+            merged[-1] = (event[0], merged[-1][1] + event[1])
+        else:
+            merged.append(event)
+
+    def block(event):
+        return event[0] == 'decl' or (event[0] in ('start', 'end') and event[1] in BLOCK_TAGS)
+
+    out = []
+    for i, event in enumerate(merged):
+        if event[0] == 'text':
+            text = _WHITESPACE.sub(' ', event[1])
+            if i == 0 or block(merged[i - 1]):
+                text = text.lstrip(' ')
+            if i + 1 == len(merged) or block(merged[i + 1]):
+                text = text.rstrip(' ')
+            if not text:
+                continue
+            event = ('text', text)
+        out.append(event)
+    return out
+
+
+def _marker_key(match):
+    return tuple(group or '' for group in match.groups())
+
+
+def _script_matches(html):
+    """Per pattern: the matches, with whitespace removed since compaction may only change that"""
+    found = []
+    for name, pattern in SCRIPT_PATTERNS:
+        matches = [
+            tuple(_WHITESPACE.sub('', group) for group in match.groups())
+            for match in pattern.finditer(html)
+        ]
+        found.append((name, matches))
+    return found
+
+
+def _renders(html):
+    """The template rendered for every marker/region combination script.gs can produce"""
+    compiled = compile_template_source(html)
+    for international, hsn, gst in product((False, True), repeat=3):
+        yield (international, hsn, gst), compiled.render(
+            conditions={'INTERNATIONAL_PARTY': international, 'HAS_HSN': hsn},
+            regions={'TOTAL_GST': gst and not international}
+        )
+
+
+def compaction_problems(original, compacted):
+    """Human-readable differences that make compacted unsafe to use in place of original"""
+    problems = []
+    if [m.group(0) for m in SLOT_PATTERN.finditer(original)] != [m.group(0) for m in SLOT_PATTERN.finditer(compacted)]:
+        problems.append('{{...}} slots differ')
+    if [_marker_key(m) for m in MARKER_PATTERN.finditer(original)] != [_marker_key(m) for m in MARKER_PATTERN.finditer(compacted)]:
+        problems.append('<? ?> markers differ')
+    for (name, before), (_, after) in zip(_script_matches(original), _script_matches(compacted)):
+        if before != after:
+            problems.append(f'script.gs pattern "{name}" no longer matches the same way')
+    for (flags, before), (_, after) in zip(_renders(original), _renders(compacted)):
+        if normalized_dom(before) != normalized_dom(after):
+            international, hsn, gst = flags
+            problems.append(f'rendered DOM differs (INTERNATIONAL_PARTY={international}, HAS_HSN={hsn}, GST={gst})')
+            break
+    return problems
+
+
+@profiled()
+@lru_cache(maxsize=16)
+def compact_checked(html):
+    """(html to use, problems): the compacted template, or html itself if any check failed"""
+    compacted = compact_template(html)
+    problems = tuple(compaction_problems(html, compacted))
+    return (html if problems else compacted), problems
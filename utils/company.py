@@ -0,0 +1,142 @@
+import os
+import re
+from datetime import datetime
+
+from utils.address import convert_address_to_three_lines
+from utils.bank import format_bank_details
+from utils.engine import DEFAULT_COLOR
+from utils.image import ingest_qr_image
+from utils.validate import missing_company_fields, normalize_id, validate_company_details
+
+# Company profiles given outside the app (batch manifests, CLI profile files), checked
+# and turned into the company_data dict the generator form builds
+
+# Profile keys (manifest columns for batch.companies, JSON keys for the render CLI).
+# The company fields are the generator form's; color, qr_path, the flags and the Drive IDs are optional.
+PROFILE_FIELDS = (
+    'name', 'address', 'state', 'state_code', 'contact', 'pan', 'udyam', 'gst',
+    'bank_ac_holder', 'bank_name', 'bank_ac_no', 'bank_ifsc',
+    'lut_number', 'lut_validity_from', 'lut_validity_to', 'invoices_generated',
+    'color', 'qr_path', 'has_gst', 'has_msme', 'has_international',
+    'template_file_id', 'dest_folder_id', 'allocator_url', 'allocator_token',
+)
+
+_FLAG_DEFAULTS = {'has_gst': True, 'has_msme': True, 'has_international': False}
+_TRUE = {'1', 'y', 'yes', 'true', 'on'}
+_FALSE = {'', '0', 'n', 'no', 'false', 'off'}
+
+
+def profile_text(entry, key):
+    """Profile value as stripped text, empty if missing"""
+    value = entry.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _flag(entry, key):
+    value = entry.get(key)
+    if isinstance(value, bool):
+        return value
+    text = '' if value is None else str(value).strip().lower()
+    if text == '':
+        return _FLAG_DEFAULTS[key]
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f'{key} must be yes/no, got {value!r}')
+
+
+def _date(value):
+    """Date from YYYY-MM-DD or DD-Mon-YYYY (the template's format), None if empty"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d', '%d-%b-%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f'dates must be YYYY-MM-DD, got {value!r}')
+
+
+def profile_flags(entry):
+    """{'has_gst', 'has_msme', 'has_international'} of a profile; international needs GST. Raises ValueError."""
+    flags = {key: _flag(entry, key) for key in _FLAG_DEFAULTS}
+    flags['has_international'] = flags['has_gst'] and flags['has_international']
+    return flags
+
+
+def prepare_company(entry, base_dir, state_codes, year):
+    """
+    (company_data, color, flags, problems) for a company profile, checked with the same required-field
+    and format rules as the generator form. company_data is None if there are problems.
+    """
+    problems = []
+    try:
+        flags = profile_flags(entry)
+        lut_from = _date(profile_text(entry, 'lut_validity_from'))
+        lut_to = _date(profile_text(entry, 'lut_validity_to'))
+    except ValueError as e:
+        return None, None, None, [str(e)]
+    has_gst, has_msme, has_international = flags['has_gst'], flags['has_msme'], flags['has_international']
+
+    qr_path = profile_text(entry, 'qr_path')
+    qr_code = None
+    if qr_path:
+        try:
+            with open(os.path.join(base_dir, qr_path), 'rb') as f:
+                qr_code = ingest_qr_image(f.read())
+        except OSError as e:
+            problems.append(f'QR image: {e.strerror}: {qr_path}')
+        else:
+            if qr_code is None:
+                problems.append(f'QR image is not a PNG/JPEG/GIF/WebP file: {qr_path}')
+
+    fields = {key: profile_text(entry, key) for key in PROFILE_FIELDS}
+    fields['qr_code'] = qr_code
+    state_code = fields['state_code'] or str(state_codes.get(fields['state'], ''))
+
+    # An unreadable QR file is already reported above
+    missing = missing_company_fields(fields, has_gst, has_msme, has_international, bool(qr_path) and not problems)
+    if missing:
+        problems.append('missing ' + ', '.join(missing))
+    errors = validate_company_details(
+        pan=fields['pan'],
+        gst=fields['gst'] if has_gst else '',
+        ifsc=fields['bank_ifsc'],
+        udyam=fields['udyam'] if has_msme else '',
+        state_code=state_code,
+        lut_from=lut_from if has_international else None,
+        lut_to=lut_to if has_international else None
+    )
+    problems += [f'{label}: {message}' for label, message in errors.items()]
+
+    color = fields['color'] or DEFAULT_COLOR
+    if not re.fullmatch(r'#[0-9a-fA-F]{6}', color):
+        problems.append(f'color must look like #3b0764, got {color!r}')
+
+    try:
+        invoices_generated = int(fields['invoices_generated'] or 0)
+    except ValueError:
+        invoices_generated = -1
+    if not 0 <= invoices_generated <= 999:
+        problems.append('invoices_generated must be a number from 0 to 999')
+    if problems:
+        return None, None, flags, problems
+
+    company_data = {
+        'name': fields['name'],
+        'address_html': convert_address_to_three_lines(fields['address']),
+        'state': fields['state'],
+        'state_code': state_code,
+        'udyam': normalize_id(fields['udyam']) if has_msme else '',
+        'gst': normalize_id(fields['gst']) if has_gst else '',
+        'contact': fields['contact'],
+        'pan': normalize_id(fields['pan']),
+        'bank_html': format_bank_details(fields['bank_ac_holder'], fields['bank_name'], fields['bank_ac_no'], normalize_id(fields['bank_ifsc'])),
+        'qr_code': qr_code,
+        'lut_number': fields['lut_number'] if has_international else '',
+        'lut_validity_from': lut_from.strftime('%d-%b-%Y') if has_international else '',
+        'lut_validity_to': lut_to.strftime('%d-%b-%Y') if has_international else '',
+        'invoice_number': f'{year}/Inv/{str(invoices_generated).zfill(3)}',
+    }
+    return company_data, color, flags, []
@@ -0,0 +1,164 @@
+import math
+import re
+from functools import lru_cache
+
+# Same table as fuzzyCurrency in script.gs, shared by the batch engine and money formatting
+CURRENCIES = [
+    {'code': 'USD', 'name': 'United States Dollars', 'symbol': '$', 'aliases': ['usd', 'us dollar', 'dollar', 'american dollar', 'us', 'bucks', 'greenback']},
+    {'code': 'EUR', 'name': 'Euros', 'symbol': '€', 'aliases': ['euro', 'euros', 'eur']},
+    {'code': 'INR', 'name': 'Indian Rupees', 'symbol': '₹', 'aliases': ['inr', 'rupee', 'indian rupee', 'rs', 'rupees']},
+    {'code': 'GBP', 'name': 'British Pounds', 'symbol': '£', 'aliases': ['gbp', 'pound', 'pound sterling', 'british pound', 'quid']},
+    {'code': 'JPY', 'name': 'Japanese Yen', 'symbol': '¥', 'aliases': ['jpy', 'yen', 'japanese yen']},
+    {'code': 'AUD', 'name': 'Australian Dollars', 'symbol': '$', 'aliases': ['aud', 'australian dollar', 'aussie dollar', 'aussie', 'aud dollar']},
+    {'code': 'CAD', 'name': 'Canadian Dollars', 'symbol': '$', 'aliases': ['cad', 'canadian dollar', 'cad dollar', 'loonie']},
+    {'code': 'CHF', 'name': 'Swiss Francs', 'symbol': 'CHF', 'aliases': ['chf', 'swiss franc', 'franc', 'swissf', 'sfr']},
+    {'code': 'CNY', 'name': 'Chinese Yuan', 'symbol': '¥', 'aliases': ['cny', 'yuan', 'chinese yuan', 'renminbi', 'rmb']},
+    {'code': 'KRW', 'name': 'South Korean Won', 'symbol': '₩', 'aliases': ['krw', 'won', 'south korean won']},
+    {'code': 'MXN', 'name': 'Mexican Pesos', 'symbol': '$', 'aliases': ['mxn', 'peso', 'mexican peso', 'pesos']},
+    {'code': 'HKD', 'name': 'Hong Kong Dollars', 'symbol': '$', 'aliases': ['hkd', 'hong kong dollar', 'hk dollar']},
+    {'code': 'SGD', 'name': 'Singapore Dollars', 'symbol': '$', 'aliases': ['sgd', 'singapore dollar', 'sg dollar']},
+    {'code': 'AED', 'name': 'UAE Dirhams', 'symbol': 'د.إ', 'aliases': ['aed', 'dirham', 'uae dirham', 'dhs', 'dh']},
+    {'code': 'SAR', 'name': 'Saudi Riyals', 'symbol': '﷼', 'aliases': ['sar', 'saudi riyal', 'riyals', 'riyāl']},
+    {'code': 'QAR', 'name': 'Qatari Riyals', 'symbol': '﷼', 'aliases': ['qar', 'qatari riyal', 'riyals']},
+    {'code': 'OMR', 'name': 'Omani Rials', 'symbol': '﷼', 'aliases': ['omr', 'omani rial', 'rials']},
+]
+
+_NON_ALNUM = re.compile(r'[^a-z0-9\s]')
+
+
+def normalize(text):
+    return _NON_ALNUM.sub('', str(text).lower().strip())
+
+
+def levenshtein(a, b):
+    m, n = len(a), len(b)
+    if not m:
+        return n
+    if not n:
+        return m
+    prev = list(range(n + 1))
+    for i in range(1, m + 1):
+        cur = [i] + [0] * n
+        for j in range(1, n + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+        prev = cur
+    return prev[n]
+
+
+def bounded_levenshtein(a, b, limit):
+    """
+    Edit distance if it is at most limit, otherwise limit + 1.
+    Only the diagonal band of width 2 * limit + 1 is filled, and it stops as soon
+    as a whole row exceeds the limit.
+    """
+    m, n = len(a), len(b)
+    if abs(m - n) > limit:
+        return limit + 1
+    if not m or not n:
+        return max(m, n)
+    over = limit + 1
+    prev = [j if j <= limit else over for j in range(n + 1)]
+    for i in range(1, m + 1):
+        lo = max(1, i - limit)
+        hi = min(n, i + limit)
+        cur = [over] * (n + 1)
+        cur[0] = i if i <= limit else over
+        ai = a[i - 1]
+        row_min = cur[0]
+        for j in range(lo, hi + 1):
+            cost = 0 if ai == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            cur[j] = d if d <= limit else over
+            if d < row_min:
+                row_min = d
+        if row_min > limit:
+            return over
+        prev = cur
+    return prev[n]
+
+
+def fuzzy_currency_reference(query):
+    """
+    Straight port of fuzzyCurrency in script.gs: full edit distance against every candidate.
+    Kept as the oracle for fuzzy_currency and the regression corpus.
+    """
+    query_norm = normalize(query)
+    best_match = None
+    min_dist = math.inf
+
+    for cur in CURRENCIES:
+        for cand in [cur['code'], cur['name'], cur['symbol']] + cur['aliases']:
+            dist = levenshtein(query_norm, normalize(cand))
+            if dist < min_dist:
+                min_dist = dist
+                best_match = cur
+
+    threshold = max(3, math.floor(len(query_norm) * 0.4))
+
+    if min_dist <= threshold:
+        confidence = round(1 - min_dist / len(query_norm), 2) if query_norm else math.nan
+        return dict(best_match, ok=True, distance=min_dist, confidence=confidence, query=query)
+    return {'ok': False, 'query': query, 'tried': query_norm}
+
+
+def _build_index():
+    """Normalized candidates in table order; the first currency to claim a spelling keeps it"""
+    index = {}
+    candidates = []
+    for cur in CURRENCIES:
+        for cand in [cur['code'], cur['name'], cur['symbol']] + cur['aliases']:
+            norm = normalize(cand)
+            if norm not in index:
+                index[norm] = cur
+                candidates.append((norm, cur))
+    return index, tuple(candidates)
+
+
+# normalized code/name/symbol/alias -> currency, and the same pairs in scan order
+CURRENCY_INDEX, CURRENCY_CANDIDATES = _build_index()
+
+
+@lru_cache(maxsize=1024)
+def _resolve(query_norm):
+    """(currency, distance) for a normalized query, or None past the threshold"""
+    cur = CURRENCY_INDEX.get(query_norm)
+    if cur is not None:
+        return cur, 0
+
+    # Only a strictly closer candidate can replace the current best, as in the full scan
+    limit = max(3, math.floor(len(query_norm) * 0.4))
+    best = None
+    for norm, cur in CURRENCY_CANDIDATES:
+        dist = bounded_levenshtein(query_norm, norm, limit)
+        if dist <= limit:
+            best = (cur, dist)
+            limit = dist - 1
+            if limit < 1:
+                break
+    return best
+
+
+def fuzzy_currency(query):
+    """Resolve a currency like fuzzyCurrency in script.gs, via the alias index"""
+    query_norm = normalize(query)
+    match = _resolve(query_norm)
+    if match is None:
+        return {'ok': False, 'query': query, 'tried': query_norm}
+    cur, dist = match
+    confidence = round(1 - dist / len(query_norm), 2) if query_norm else math.nan
+    return dict(cur, ok=True, distance=dist, confidence=confidence, query=query)
+
+
+def currency_index_tables():
+    """
+    Alias map and fuzzy scan list for script.gs:
+    ({normalized: code}, [[normalized, code], ...])
+    """
+    return (
+        {norm: cur['code'] for norm, cur in CURRENCY_CANDIDATES},
+        [[norm, cur['code']] for norm, cur in CURRENCY_CANDIDATES]
+    )
+
+
+CURRENCY_BY_CODE = {cur['code']: cur for cur in CURRENCIES}
@@ -0,0 +1,289 @@
+import re
+from functools import lru_cache
+from utils.assets import get_derived
+
+# Theme color baked into template.html, swapped for the user's color on render
+DEFAULT_COLOR = '#3b0764'
+
+# {{PLACEHOLDER}} slots, same pattern fillTemplate uses in script.gs
+SLOT_PATTERN = re.compile(r'\{\{\s*([A-Z0-9_]+)\s*\}\}')
+
+# <? if (X) { ?>, <? if (!X) { ?>, <? } else { ?> and <? } ?> markers
+MARKER_PATTERN = re.compile(
+    r'<\?\s*(?:if\s*\(\s*(!?)\s*([A-Z0-9_]+)\s*\)\s*\{|\}\s*(else)\s*\{|\})\s*\?>'
+)
+
+# Optional lines that are stripped as a whole when their flag is off.
+# The patterns are the ones generate/preview used to remove with re.sub.
+REGION_PATTERNS = (
+    ('MSME', re.compile(r'<div><strong>UDYAM:</strong>\s*\{\{COMPANY_UDYAM\}\}</div>\s*')),
+    ('GST', re.compile(r'<div><strong>GST:</strong>\s*\{\{COMPANY_GST\}\}</div>\s*')),
+    ('GST', re.compile(r'<div><strong>GST:</strong>\s*\{\{PARTY_GST\}\}</div>\s*')),
+    ('GST', re.compile(r'<tr>\s*<th>GST @ 18%</th>\s*<td>₹ \{\{GST_DISPLAY\}\}</td>\s*</tr>\s*')),
+    ('TOTAL_GST', re.compile(
+        r'<tr>\s*<th>\s*Total\s*GST\s*</th>\s*<td>\s*{{GST_DISPLAY}}\s*</td>\s*</tr>\s*',
+        re.DOTALL | re.IGNORECASE
+    )),
+    ('QR', re.compile(
+        r'<div class="qr-section">\s*<img src="[^"]*"[^>]*>\s*<div class="qr-label">.*?</div>\s*</div>',
+        re.DOTALL
+    )),
+)
+
+# Node kinds of the compiled form
+TEXT, SLOT, COLOR, IF, REGION = range(5)
+
+
+class CompiledTemplate:
+    """Template parsed once into literal, slot, conditional and region nodes"""
+
+    def __init__(self, nodes, slots):
+        self.nodes = nodes
+        self.slots = slots
+
+    def render(self, values=None, conditions=None, regions=None, color=None, missing=None):
+        """
+        Render the template in a single pass.
+
+        values: slot name -> replacement text
+        conditions: marker name -> bool, unknown markers are kept verbatim
+        regions: region name -> bool, regions default to kept
+        color: replacement for the template's theme color
+        missing: text for slots without a value, None keeps the slot verbatim
+        """
+        out = []
+        _render(self.nodes, out, values or {}, conditions or {}, regions or {}, color, missing)
+        return ''.join(out)
+
+
+_UNSET = object()
+
+
+def node_inputs(node):
+    """Render inputs a node reads: ('value', slot), ('condition', name), ('region', name), ('color',)"""
+    kind = node[0]
+    if kind == TEXT:
+        return frozenset()
+    if kind == SLOT:
+        return frozenset([('value', node[1])])
+    if kind == COLOR:
+        return frozenset([('color',)])
+    if kind == REGION:
+        return frozenset([('region', node[1])]).union(*map(node_inputs, node[2]))
+    return frozenset([('condition', node[1])]).union(*map(node_inputs, node[3] + node[4]))
+
+
+class IncrementalRender:
+    """
+    Renders a CompiledTemplate repeatedly, keeping each top-level node's output and
+    re-rendering only the nodes whose inputs changed since the previous call.
+    Same arguments as CompiledTemplate.render.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        # input key -> indexes of the top-level nodes that read it
+        self.readers = {}
+        for i, node in enumerate(compiled.nodes):
+            for key in node_inputs(node):
+                self.readers.setdefault(key, []).append(i)
+        self.parts = None
+        self.html = None
+        self.inputs = {}
+        self.missing = None
+        # Top-level nodes re-rendered by the last call, for profiling and tests
+        self.last_rendered = 0
+
+    def render(self, values=None, conditions=None, regions=None, color=None, missing=None):
+        values, conditions, regions = values or {}, conditions or {}, regions or {}
+        inputs = {}
+        for key in self.readers:
+            kind = key[0]
+            if kind == 'value':
+                inputs[key] = values.get(key[1])
+            elif kind == 'condition':
+                # An undecided condition renders differently from a false one
+                inputs[key] = bool(conditions[key[1]]) if key[1] in conditions else _UNSET
+            elif kind == 'region':
+                inputs[key] = bool(regions.get(key[1], True))
+            else:
+                inputs[key] = color
+
+        nodes = self.compiled.nodes
+        if self.parts is None or missing != self.missing:
+            stale = range(len(nodes))
+            self.parts = [None] * len(nodes)
+        else:
+            previous = self.inputs
+            stale = set()
+            for key, value in inputs.items():
+                if previous[key] != value:
+                    stale.update(self.readers[key])
+            if not stale:
+                self.last_rendered = 0
+                return self.html
+
+        parts = self.parts
+        for i in stale:
+            out = []
+            _render((nodes[i],), out, values, conditions, regions, color, missing)
+            parts[i] = ''.join(out)
+        self.inputs = inputs
+        self.missing = missing
+        self.last_rendered = len(stale)
+        self.html = ''.join(parts)
+        return self.html
+
+
+def _render(nodes, out, values, conditions, regions, color, missing):
+    append = out.append
+    for node in nodes:
+        kind = node[0]
+        if kind == TEXT:
+            append(node[1])
+        elif kind == SLOT:
+            value = values.get(node[1])
+            if value is not None:
+                append(value)
+            elif missing is None:
+                append(node[2])
+            else:
+                append(missing)
+        elif kind == COLOR:
+            append(color or node[1])
+        elif kind == REGION:
+            if regions.get(node[1], True):
+                _render(node[2], out, values, conditions, regions, color, missing)
+        else:
+            _, name, negate, then_nodes, else_nodes, raw_open, raw_else, raw_close = node
+            if name in conditions:
+                branch = then_nodes if bool(conditions[name]) != negate else else_nodes
+                _render(branch, out, values, conditions, regions, color, missing)
+            else:
+                # Condition not decided here, leave the markers for script.gs
+                append(raw_open)
+                _render(then_nodes, out, values, conditions, regions, color, missing)
+                if raw_else is not None:
+                    append(raw_else)
+                    _render(else_nodes, out, values, conditions, regions, color, missing)
+                append(raw_close)
+
+
+def _text_nodes(text):
+    """Split literal text around the theme color"""
+    nodes = []
+    parts = text.split(DEFAULT_COLOR)
+    for i, part in enumerate(parts):
+        if i:
+            nodes.append((COLOR, DEFAULT_COLOR))
+        if part:
+            nodes.append((TEXT, part))
+    return nodes
+
+
+def _region_events(source):
+    """Find non-overlapping optional regions as (start, end, name) spans"""
+    spans = []
+    for name, pattern in REGION_PATTERNS:
+        for match in pattern.finditer(source):
+            if match.end() > match.start():
+                spans.append((match.start(), match.end(), name))
+    spans.sort()
+
+    events = []
+    last_end = -1
+    for start, end, name in spans:
+        if start < last_end:
+            continue
+        events.append((start, 'open', name))
+        events.append((end, 'close', name))
+        last_end = end
+    return events
+
+
+def compile_template(source):
+    """Parse template source into a CompiledTemplate"""
+    events = _region_events(source)
+    for match in MARKER_PATTERN.finditer(source):
+        events.append((match.start(), 'marker', match))
+    for match in SLOT_PATTERN.finditer(source):
+        events.append((match.start(), 'slot', match))
+    # Closing a region sorts before anything opening at the same offset
+    order = {'close': 0, 'open': 1, 'marker': 2, 'slot': 2}
+    events.sort(key=lambda e: (e[0], order[e[1]]))
+
+    root = []
+    # Stack entries: (node kind, children list, node-in-progress)
+    stack = [(None, root, None)]
+    slots = set()
+    pos = 0
+
+    for offset, kind, item in events:
+        if offset < pos:
+            # Inside a slot or marker that was already consumed
+            continue
+        children = stack[-1][1]
+        if offset > pos:
+            children.extend(_text_nodes(source[pos:offset]))
+        pos = offset
+
+        if kind == 'open':
+            node = [REGION, item, []]
+            children.append(node)
+            stack.append((REGION, node[2], node))
+        elif kind == 'close':
+            if stack[-1][0] != REGION:
+                raise ValueError('Optional region crosses a template marker at offset %d' % offset)
+            stack.pop()
+        elif kind == 'slot':
+            slots.add(item.group(1))
+            children.append((SLOT, item.group(1), item.group(0)))
+            pos = item.end()
+        else:
+            negate, name, is_else = item.group(1), item.group(2), item.group(3)
+            if name:
+                node = [IF, name, negate == '!', [], [], item.group(0), None, None]
+                children.append(node)
+                stack.append((IF, node[3], node))
+            elif stack[-1][0] != IF:
+                raise ValueError('Unbalanced template marker at offset %d' % offset)
+            elif is_else:
+                node = stack.pop()[2]
+                node[6] = item.group(0)
+                stack.append((IF, node[4], node))
+            else:
+                node = stack.pop()[2]
+                node[7] = item.group(0)
+            pos = item.end()
+
+    if len(stack) > 1:
+        raise ValueError('Unclosed template block')
+    if pos < len(source):
+        root.extend(_text_nodes(source[pos:]))
+
+    return CompiledTemplate(_freeze(root), frozenset(slots))
+
+
+def _freeze(nodes):
+    """Convert in-progress list nodes into tuples"""
+    frozen = []
+    for node in nodes:
+        if node[0] == REGION:
+            frozen.append((REGION, node[1], _freeze(node[2])))
+        elif node[0] == IF:
+            frozen.append((IF, node[1], node[2], _freeze(node[3]), _freeze(node[4]),
+                           node[5], node[6], node[7]))
+        else:
+            frozen.append(node)
+    return tuple(frozen)
+
+
+@lru_cache(maxsize=32)
+def compile_template_source(source):
+    """Compile template text, memoized by content"""
+    return compile_template(source)
+
+
+def load_compiled_template(name='template.html'):
+    """Compiled form of a template asset, rebuilt only when the file changes"""
+    return get_derived(name, 'compiled', compile_template)
@@ -1,56 +1,81 @@
-import re
+from utils.engine import IncrementalRender, load_compiled_template
+from utils.profiling import profiled
+
+# Size budget for a generated template. It is kept in session state and sent with
+# every preview, download and Drive upload, so the QR image must not bloat it.
+TEMPLATE_BYTE_BUDGET = 150 * 1024
+
+def template_byte_size(template):
+    """Size of the template in bytes as downloaded/uploaded (UTF-8)"""
+    return len(template.encode('utf-8')) if template else 0
+
+def template_inputs(company_data, has_gst, has_msme, has_qr):
+    """(slot values, regions) that generate_template_html renders the template with"""
+    # Company placeholders, invoice number and LUT details
+    values = {
+        'COMPANY_NAME': company_data['name'],
+        'COMPANY_ADDRESS_HTML': company_data['address_html'],
+        'COMPANY_STATE': company_data['state'],
+        'COMPANY_STATE_CODE': company_data['state_code'],
+        'COMPANY_CONTACT': company_data['contact'],
+        'COMPANY_PAN': company_data['pan'],
+        'COMPANY_BANK_HTML': company_data['bank_html'],
+        'INVOICE_NUMBER': company_data['invoice_number'],
+        'LUT_NUMBER': company_data.get('lut_number', ''),
+        'LUT_VALIDITY_FROM': company_data.get('lut_validity_from', ''),
+        'LUT_VALIDITY_TO': company_data.get('lut_validity_to', ''),
+    }
 
-def generate_template_html(company_data, color, has_gst, has_msme, has_qr):
-    """Generate the HTML template with company data and color"""
-    
-    # Read template from file
-    try:
-        with open('template.html', 'r', encoding='utf-8') as f:
-            template = f.read()
-    except FileNotFoundError:
-        return None
-    
-    # Replace color
-    template = template.replace('#3b0764', color)
-    
-    # Replace company placeholders
-    template = template.replace('{{COMPANY_NAME}}', company_data['name'])
-    template = template.replace('{{COMPANY_ADDRESS_HTML}}', company_data['address_html'])
-    template = template.replace('{{COMPANY_STATE}}', company_data['state'])
-    template = template.replace('{{COMPANY_STATE_CODE}}', company_data['state_code'])
-    template = template.replace('{{COMPANY_CONTACT}}', company_data['contact'])
-    template = template.replace('{{COMPANY_PAN}}', company_data['pan'])
-    template = template.replace('{{COMPANY_BANK_HTML}}', company_data['bank_html'])
-    
-    # Replace invoice number with the calculated value
-    template = template.replace('{{INVOICE_NUMBER}}', company_data['invoice_number'])
-    
-    # Replace LUT details with company data
-    template = template.replace('{{LUT_NUMBER}}', company_data.get('lut_number', ''))
-    template = template.replace('{{LUT_VALIDITY_FROM}}', company_data.get('lut_validity_from', ''))
-    template = template.replace('{{LUT_VALIDITY_TO}}', company_data.get('lut_validity_to', ''))
-    
     # Handle UDYAM/MSME
     if has_msme:
-        template = template.replace('{{COMPANY_UDYAM}}', company_data['udyam'])
-    else:
-        template = re.sub(r'<div><strong>UDYAM:</strong>\s*\{\{COMPANY_UDYAM\}\}</div>\s*', '', template)
-    
+        values['COMPANY_UDYAM'] = company_data['udyam']
+
     # Handle GST
     if has_gst:
-        template = template.replace('{{COMPANY_GST}}', company_data['gst'])
-    else:
-        # Remove company GST line from header
-        template = re.sub(r'<div><strong>GST:</strong>\s*\{\{COMPANY_GST\}\}</div>\s*', '', template)
-        # Remove party GST line from party details
-        template = re.sub(r'<div><strong>GST:</strong>\s*\{\{PARTY_GST\}\}</div>\s*', '', template)
-        # Remove GST row from totals table
-        template = re.sub(r'<tr>\s*<th>GST @ 18%</th>\s*<td>₹ \{\{GST_DISPLAY\}\}</td>\s*</tr>\s*', '', template)
-    
+        values['COMPANY_GST'] = company_data['gst']
+
     # Handle QR Code
-    if has_qr and company_data.get('qr_code'):
-        template = template.replace('{{COMPANY_QR}}', company_data['qr_code'])
-    else:
-        template = re.sub(r'<div class="qr-section">\s*<img src="[^"]*"[^>]*>\s*<div class="qr-label">.*?</div>\s*</div>', '', template, flags=re.DOTALL)
-    
-    return template
\ No newline at end of file
+    show_qr = bool(has_qr and company_data.get('qr_code'))
+    if show_qr:
+        values['COMPANY_QR'] = company_data['qr_code']
+
+    return values, {'MSME': has_msme, 'GST': has_gst, 'QR': show_qr}
+
+@profiled()
+def generate_template_html(company_data, color, has_gst, has_msme, has_qr):
+    """Generate the HTML template with company data and color"""
+
+    # Compiled template is cached until template.html changes
+    compiled = load_compiled_template('template.html')
+    if compiled is None:
+        return None
+
+    # Template markers stay in place for script.gs, other slots are left as-is
+    values, regions = template_inputs(company_data, has_gst, has_msme, has_qr)
+    return compiled.render(values=values, regions=regions, color=color)
+
+class TemplateGenerator:
+    """
+    generate_template_html for one session: repeated calls re-render only the template
+    parts whose company fields, flags or color changed, and unchanged input returns the
+    previous string as-is.
+    """
+
+    def __init__(self):
+        self._renderer = None
+
+    @profiled('generate_template_html (incremental)')
+    def generate(self, company_data, color, has_gst, has_msme, has_qr):
+        compiled = load_compiled_template('template.html')
+        if compiled is None:
+            return None
+        # A changed template.html compiles to a new object, start over
+        if self._renderer is None or self._renderer.compiled is not compiled:
+            self._renderer = IncrementalRender(compiled)
+        values, regions = template_inputs(company_data, has_gst, has_msme, has_qr)
+        return self._renderer.render(values=values, regions=regions, color=color)
+
+    @property
+    def last_rendered(self):
+        """Top-level template parts re-rendered by the last generate call"""
+        return self._renderer.last_rendered if self._renderer else 0
@@ -1,10 +1,115 @@
 import base64
+import hashlib
+import io
+from utils.cache import LRUCache
+from utils.profiling import profiled
 
+# The template shows the QR at max 120 CSS px; 2x keeps it sharp in the PDF
+QR_PRINT_SIZE = 240
+
+# Colors kept in the re-encoded palette PNG (QR codes are mostly 2 colors plus a logo)
+QR_PALETTE_COLORS = 16
+
+# Processed QR data URIs by SHA-256 of the uploaded bytes, shared across sessions
+QR_STORE = LRUCache(maxsize=128)
+
+_MAGIC = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+def detect_image_format(data):
+    """MIME type from the file's magic bytes, or None if unrecognised"""
+    for magic, mime in _MAGIC:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def _to_data_uri(data, mime):
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+def _trim_border(img, tolerance=24, margin=8):
+    """Crop the uniform border around the QR, keeping a small quiet zone"""
+    from PIL import Image, ImageChops
+
+    gray = img.convert('L')
+    background = Image.new('L', gray.size, gray.getpixel((0, 0)))
+    diff = ImageChops.difference(gray, background)
+    bbox = diff.point(lambda p: 255 if p > tolerance else 0).getbbox()
+    if not bbox:
+        return img
+    left, top, right, bottom = bbox
+    # Quiet zone scales with the QR so large photos keep a usable margin
+    margin = max(margin, max(right - left, bottom - top) // 25)
+    return img.crop((
+        max(0, left - margin),
+        max(0, top - margin),
+        min(img.width, right + margin),
+        min(img.height, bottom + margin)
+    ))
+
+def shrink_qr_image(data):
+    """
+    Crop, downscale and re-encode a QR image as a small palette PNG.
+    Returns PNG bytes, or None if Pillow is unavailable or the image can't be read.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        # Phone photos carry their rotation in EXIF
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Flatten transparency onto white like the invoice background
+            img = img.convert('RGBA')
+            flattened = Image.new('RGBA', img.size, (255, 255, 255, 255))
+            flattened.alpha_composite(img)
+            img = flattened
+        img = img.convert('RGB')
+
+        img = _trim_border(img)
+        if max(img.size) > QR_PRINT_SIZE:
+            img.thumbnail((QR_PRINT_SIZE, QR_PRINT_SIZE), Image.LANCZOS)
+
+        img = img.quantize(colors=QR_PALETTE_COLORS)
+        out = io.BytesIO()
+        img.save(out, format='PNG', optimize=True)
+        return out.getvalue()
+    except Exception:
+        return None
+
+def ingest_qr_image(data):
+    """Data URI for an uploaded QR image, processed once per distinct upload"""
+    key = hashlib.sha256(data).hexdigest()
+    cached = QR_STORE.get(key)
+    if cached is not None:
+        return cached
+
+    mime = detect_image_format(data)
+    if mime is None:
+        return None
+
+    shrunk = shrink_qr_image(data)
+    if shrunk is not None and len(shrunk) < len(data):
+        data_uri = _to_data_uri(shrunk, 'image/png')
+    else:
+        # Keep the original bytes, labelled with their real format
+        data_uri = _to_data_uri(data, mime)
+
+    QR_STORE.set(key, data_uri)
+    return data_uri
+
+@profiled()
 def image_to_base64(uploaded_file):
-    """Convert uploaded image to base64 string"""
+    """Convert uploaded image to a compact base64 data URI"""
     try:
-        bytes_data = uploaded_file.getvalue()
-        base64_encoded = base64.b64encode(bytes_data).decode()
-        return f"data:image/png;base64,{base64_encoded}"
+        return ingest_qr_image(uploaded_file.getvalue())
     except Exception as e:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,261 @@
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from utils.currency import CURRENCY_BY_CODE
+
+# Amount formatting and amount-in-words.
+# The kernel works on integer minor units (paise/cents) with precomputed word tables;
+# the format_currency/number_to_* functions are ports of script.gs and match its output.
+
+ONES = ['', 'One', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight', 'Nine']
+TEENS = ['Ten', 'Eleven', 'Twelve', 'Thirteen', 'Fourteen', 'Fifteen', 'Sixteen', 'Seventeen', 'Eighteen', 'Nineteen']
+TENS = ['', '', 'Twenty', 'Thirty', 'Forty', 'Fifty', 'Sixty', 'Seventy', 'Eighty', 'Ninety']
+
+
+def _build_below_hundred():
+    words = []
+    for n in range(100):
+        if n < 10:
+            words.append(ONES[n])
+        elif n < 20:
+            words.append(TEENS[n - 10])
+        else:
+            words.append(TENS[n // 10] + (' ' + ONES[n % 10] if n % 10 else ''))
+    return tuple(words)
+
+
+def _build_below_thousand(below_hundred):
+    words = list(below_hundred)
+    for n in range(100, 1000):
+        remainder = n % 100
+        words.append(ONES[n // 100] + ' Hundred' + (' ' + below_hundred[remainder] if remainder else ''))
+    return tuple(words)
+
+
+# Words for 0-99 and 0-999, 0 is the empty string
+BELOW_HUNDRED = _build_below_hundred()
+BELOW_THOUSAND = _build_below_thousand(BELOW_HUNDRED)
+
+# Zero-padded digit groups for the grouping kernel
+_PAD2 = tuple('%02d' % n for n in range(100))
+_PAD3 = tuple('%03d' % n for n in range(1000))
+
+
+def _script_words(n):
+    """Words for n >= 0, with the Apps Script's out-of-range result past 999"""
+    if n < 1000:
+        return BELOW_THOUSAND[n]
+    # script.gs indexes its 0-9 table with n // 100 here and reads "undefined"
+    remainder = n % 100
+    return 'undefined Hundred' + (' ' + BELOW_HUNDRED[remainder] if remainder else '')
+
+
+def _script_paise_words(paise):
+    # Math.round can produce 100 paise, which script.gs spells "undefined"
+    return BELOW_HUNDRED[paise] if paise < 100 else 'undefined'
+
+
+# ---------- Integer kernel ----------
+
+def group_indian(n):
+    """Digits of a non-negative integer in lakh/crore grouping (12,34,567)"""
+    if n < 1000:
+        return str(n)
+    head, tail = divmod(n, 1000)
+    groups = [_PAD3[tail]]
+    while head >= 100:
+        head, pair = divmod(head, 100)
+        groups.append(_PAD2[pair])
+    groups.append(str(head))
+    groups.reverse()
+    return ','.join(groups)
+
+
+def group_western(n):
+    """Digits of a non-negative integer in thousands grouping (1,234,567)"""
+    return f'{n:,}'
+
+
+def format_minor(minor, indian=True):
+    """Integer minor units as a grouped amount with 2 decimals"""
+    minor = int(minor)
+    sign = ''
+    if minor < 0:
+        sign = '-'
+        minor = -minor
+    units, cents = divmod(minor, 100)
+    grouped = group_indian(units) if indian else f'{units:,}'
+    return f'{sign}{grouped}.{_PAD2[cents]}'
+
+
+def _indian_parts(n, crore_words):
+    parts = []
+    crore, rest = divmod(n, 10000000)
+    if crore:
+        parts.append(crore_words(crore) + ' Crore')
+    lakh, rest = divmod(rest, 100000)
+    if lakh:
+        parts.append(BELOW_HUNDRED[lakh] + ' Lakh')
+    thousand, rest = divmod(rest, 1000)
+    if thousand:
+        parts.append(BELOW_HUNDRED[thousand] + ' Thousand')
+    if rest:
+        parts.append(BELOW_THOUSAND[rest])
+    return ' '.join(parts)
+
+
+def indian_group_words(n):
+    """Words for n >= 0 in lakh/crore grouping; crores past 99 are grouped the same way"""
+    return _indian_parts(n, indian_group_words)
+
+
+def indian_words(rupees, paise=0):
+    """Whole rupees and paise (0-99) in words, e.g. 'One Lakh Rupees and Five Paise Only'"""
+    result = (indian_group_words(rupees) or 'Zero') + ' Rupees'
+    if paise:
+        result += ' and ' + BELOW_HUNDRED[paise] + ' Paise'
+    return result + ' Only'
+
+
+def _script_indian_words(rupees, paise):
+    """indian_words as script.gs spells it, 'undefined' for 1000+ crore and 100 paise included"""
+    result = (_indian_parts(rupees, _script_words) or 'Zero') + ' Rupees'
+    if paise:
+        result += ' and ' + _script_paise_words(paise) + ' Paise'
+    return result + ' Only'
+
+
+def english_words(n):
+    """Whole units in words using thousand/million, like numberToEnglishWords"""
+    if n == 0:
+        return 'Zero'
+    if n < 1000:
+        return BELOW_THOUSAND[n]
+    if n < 1000000:
+        thousands, remainder = divmod(n, 1000)
+        return BELOW_THOUSAND[thousands] + ' Thousand' + (' ' + BELOW_THOUSAND[remainder] if remainder else '')
+    if n < 1000000000:
+        millions, remainder = divmod(n, 1000000)
+        return BELOW_THOUSAND[millions] + ' Million' + (' ' + english_words(remainder) if remainder else '')
+    return 'Amount too large'
+
+
+def to_minor(amount):
+    """Convert an amount (int, float, str or Decimal) to integer minor units, half away from zero"""
+    if isinstance(amount, int):
+        return amount * 100
+    if isinstance(amount, float):
+        amount = repr(amount)
+    value = Decimal(amount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return int(value * 100)
+
+
+def format_money(minor, currency='INR'):
+    """Integer minor units as '<symbol> <grouped amount>', Indian grouping for INR"""
+    symbol = CURRENCY_BY_CODE[currency]['symbol']
+    return symbol + ' ' + format_minor(minor, indian=currency == 'INR')
+
+
+def amount_in_words(minor, currency='INR'):
+    """Integer minor units in words, same wording as numberToWordsWithCurrency"""
+    minor = int(minor)
+    if minor == 0:
+        return 'Zero Only'
+    if minor < 0:
+        return 'Negative amount'
+    units, cents = divmod(minor, 100)
+    if currency == 'INR':
+        # 1000 crore rupees
+        if minor > 1000000000000:
+            return 'Amount exceeds 1000 crore'
+        return indian_words(units, cents)
+    return english_words(units) + ' ' + CURRENCY_BY_CODE[currency]['name'] + ' Only'
+
+
+# ---------- Bulk entry points ----------
+
+def format_money_many(minors, currency='INR'):
+    """format_money over an iterable or array of minor units"""
+    prefix = CURRENCY_BY_CODE[currency]['symbol'] + ' '
+    indian = currency == 'INR'
+    return [prefix + format_minor(m, indian) for m in minors]
+
+
+def group_many(minors, indian=True):
+    """format_minor over an iterable or array of minor units"""
+    return [format_minor(m, indian) for m in minors]
+
+
+def amounts_in_words(minors, currency='INR'):
+    """amount_in_words over an iterable or array of minor units"""
+    return [amount_in_words(m, currency) for m in minors]
+
+
+# ---------- script.gs compatible wrappers (float amounts) ----------
+
+def _is_number(num):
+    if num is None or isinstance(num, bool):
+        return False
+    try:
+        return not math.isnan(float(num))
+    except (TypeError, ValueError):
+        return False
+
+
+def format_grouped(num, indian=True):
+    """Number with 2 decimals like toLocaleString('en-IN'/'en-US')"""
+    num = float(num)
+    # Intl rounds the shortest round-trip decimal of the double half away from zero,
+    # and keeps the minus sign on negatives that round to zero
+    text = format_minor(abs(to_minor(num)), indian)
+    return '-' + text if num < 0 else text
+
+
+def format_currency(num, currency_symbol, is_international):
+    """Port of formatCurrency in script.gs"""
+    if not _is_number(num):
+        return f'{currency_symbol} 0.00'
+    return f'{currency_symbol} {format_grouped(num, indian=not is_international)}'
+
+
+def format_inr(num):
+    """Port of formatINR in script.gs"""
+    if not _is_number(num):
+        return '0.00'
+    return format_grouped(num, indian=True)
+
+
+def number_to_english_words(num):
+    """Port of numberToEnglishWords in script.gs (integers only)"""
+    return english_words(int(num))
+
+
+def number_to_indian_words(amount):
+    """Port of numberToIndianWords in script.gs"""
+    if not _is_number(amount):
+        return 'Zero Rupees Only'
+    num = float(amount)
+    if num == 0:
+        return 'Zero Rupees Only'
+    if num < 0:
+        return 'Negative amount'
+    if num > 100000000000:
+        return 'Amount exceeds 1000 crore'
+
+    rupees = math.floor(num)
+    # Same float arithmetic as Math.round((num - rupees) * 100)
+    paise = math.floor((num - rupees) * 100 + 0.5)
+    return _script_indian_words(rupees, paise)
+
+
+def number_to_words_with_currency(amount, currency_name, is_international):
+    """Port of numberToWordsWithCurrency in script.gs"""
+    if not _is_number(amount):
+        return 'Zero Only'
+    num = float(amount)
+    if num == 0:
+        return 'Zero Only'
+    if num < 0:
+        return 'Negative amount'
+    if is_international:
+        return english_words(math.floor(num)) + ' ' + str(currency_name) + ' Only'
+    return number_to_indian_words(num)
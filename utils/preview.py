@@ -1,111 +1,108 @@
+import hashlib
 import re
+import threading
 from datetime import datetime
+from functools import lru_cache
+from utils.cache import LRUCache
+from utils.engine import compile_template_source
+from utils.money import amount_in_words, format_money
+from utils.profiling import profiled
 
-def process_conditionals(html, conditions):
-    result = html
-    
-    # Handle INTERNATIONAL_PARTY conditional
-    if conditions.get('INTERNATIONAL_PARTY', False):
-        # Keep content inside INTERNATIONAL_PARTY blocks, remove markers, also remove GST row
-        result = re.sub(
-            r'<\?\s*if\s*\(\s*INTERNATIONAL_PARTY\s*\)\s*\{\s*\?>(.*?)<\?\s*\}\s*\?>',
-            r'\1',
-            result,
-            flags=re.DOTALL
-        )
+# Rendered previews shared by all sessions, keyed by template content and variant
+PREVIEW_CACHE = LRUCache(maxsize=64)
 
-        result = re.sub(
-            r'<tr>\s*<th>\s*Total\s*GST\s*</th>\s*<td>\s*{{GST_DISPLAY}}\s*</td>\s*</tr>\s*',
-            '',
-            result,
-            flags=re.DOTALL | re.IGNORECASE
-        )
-    else:
-        # Remove entire INTERNATIONAL_PARTY blocks
-        result = re.sub(
-            r'<\?\s*if\s*\(\s*INTERNATIONAL_PARTY\s*\)\s*\{\s*\?>.*?<\?\s*\}\s*\?>',
-            '',
-            result,
-            flags=re.DOTALL
-        )
+# Background renderer for speculative previews after "Generate Template", created on first
+# use so scripts that only render (the render CLI) don't import concurrent.futures
+_prerender_pool = None
+_prerender_pool_lock = threading.Lock()
 
-    # Handle Total GST row
-    if not conditions.get('GST', False):
-        result = re.sub(
-            r'<tr>\s*<th>\s*Total\s*GST\s*</th>\s*<td>\s*{{GST_DISPLAY}}\s*</td>\s*</tr>\s*',
-            '',
-            result,
-            flags=re.DOTALL | re.IGNORECASE
-        )
+# Stands in for inline images (the QR) in compact previews, a few hundred bytes instead of KBs
+IMAGE_PLACEHOLDER = (
+    "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 120 120'%3E"
+    "%3Crect width='120' height='120' fill='%23eee' stroke='%23999' stroke-dasharray='6'/%3E"
+    "%3Ctext x='60' y='66' font-family='sans-serif' font-size='16' text-anchor='middle' fill='%23777'%3EQR%3C/text%3E%3C/svg%3E"
+)
+
+_INLINE_IMAGE = re.compile(r'src="data:image/[^"]*"')
+_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_LINE_BREAKS = re.compile(r'\s*\n\s*')
+_SPACES = re.compile(r'[ \t]{2,}')
+
+@profiled()
+def process_conditionals(html, conditions):
+    """Resolve template markers and the Total GST row for the given conditions"""
+    compiled = compile_template_source(html)
+    is_international = conditions.get('INTERNATIONAL_PARTY', False)
     
-    # Handle HAS_HSN conditional with if-else structure
-    if conditions.get('HAS_HSN', False):
-        # Keep IF branch, remove ELSE branch
-        result = re.sub(
-            r'<\?\s*if\s*\(\s*HAS_HSN\s*\)\s*\{\s*\?>(.*?)<\?\s*\}\s*else\s*\{\s*\?>.*?<\?\s*\}\s*\?>',
-            r'\1',
-            result,
-            flags=re.DOTALL
-        )
-    else:
-        # Remove IF branch, keep ELSE branch
-        result = re.sub(
-            r'<\?\s*if\s*\(\s*HAS_HSN\s*\)\s*\{\s*\?>.*?<\?\s*\}\s*else\s*\{\s*\?>(.*?)<\?\s*\}\s*\?>',
-            r'\1',
-            result,
-            flags=re.DOTALL
-        )
+    # Total GST row is dropped for international parties and non-GST templates
+    show_gst_row = conditions.get('GST', False) and not is_international
     
-    return result
+    return compiled.render(
+        conditions={
+            'INTERNATIONAL_PARTY': is_international,
+            'HAS_HSN': conditions.get('HAS_HSN', False)
+        },
+        regions={'TOTAL_GST': show_gst_row}
+    )
 
+@profiled()
 def generate_preview_html(template, has_gst, is_international=False, has_qr=False):
     """Generate preview with dummy client data"""
-    preview = template
+    compiled = compile_template_source(template)
+    today = datetime.now().strftime('%d-%b-%Y')
     
     # Set conditional flags for template processing
     conditions = {
         'INTERNATIONAL_PARTY': is_international,
-        'HAS_HSN': has_gst and not is_international,  # HSN only for domestic GST clients
-        "GST": has_gst
+        'HAS_HSN': has_gst and not is_international  # HSN only for domestic GST clients
     }
     
-    # Process conditionals first
-    preview = process_conditionals(preview, conditions)
-    
-    # Replace basic invoice metadata
-    preview = preview.replace('{{INVOICE_NUMBER}}', '2025/11/001')
-    preview = preview.replace('{{DATE}}', datetime.now().strftime('%d-%b-%Y'))
-    preview = preview.replace('{{DUE_DATE}}', datetime.now().strftime('%d-%b-%Y'))
+    # Total GST row only for domestic GST clients, QR section only if enabled
+    regions = {
+        'TOTAL_GST': has_gst and not is_international,
+        'QR': has_qr
+    }
     
-    # Replace party information
-    preview = preview.replace('{{PARTY_NAME}}', 'Sample Company Pvt Ltd')
-    preview = preview.replace('{{PARTY_STATE}}', 'Karnataka')
+    # Basic invoice metadata and party information
+    values = {
+        'INVOICE_NUMBER': '2025/11/001',
+        'DATE': today,
+        'DUE_DATE': today,
+        'PARTY_NAME': 'Sample Company Pvt Ltd',
+        'PARTY_STATE': 'Karnataka'
+    }
     
     if is_international:
-        preview = preview.replace('{{PARTY_ADDRESS_HTML}}', 'Building No. 123, Sample Street<br>Sample Road, Sample Area, Los Angeles<br>California, United States of America - 90001')
-        preview = preview.replace('{{PARTY_STATE_CODE}}', '97')
-        preview = preview.replace('{{PARTY_GST}}', 'N/A')
-        preview = preview.replace('{{PARTY_PAN}}', 'N/A')
+        values['PARTY_ADDRESS_HTML'] = 'Building No. 123, Sample Street<br>Sample Road, Sample Area, Los Angeles<br>California, United States of America - 90001'
+        values['PARTY_STATE_CODE'] = '97'
+        values['PARTY_GST'] = 'N/A'
+        values['PARTY_PAN'] = 'N/A'
     else:
-        preview = preview.replace('{{PARTY_ADDRESS_HTML}}', 'Building No. 123, Sample Street<br>MG Road, Bangalore<br>Karnataka - 560001')
-        preview = preview.replace('{{PARTY_STATE_CODE}}', '2')
-        preview = preview.replace('{{PARTY_GST}}', '29ABCDE1234F1Z5')
-        preview = preview.replace('{{PARTY_PAN}}', 'ABCDE1234F')
+        values['PARTY_ADDRESS_HTML'] = 'Building No. 123, Sample Street<br>MG Road, Bangalore<br>Karnataka - 560001'
+        values['PARTY_STATE_CODE'] = '2'
+        values['PARTY_GST'] = '29ABCDE1234F1Z5'
+        values['PARTY_PAN'] = 'ABCDE1234F'
     
-    # Handle GST field
-    if has_gst and not is_international:
-        preview = preview.replace('{{PARTY_GST}}', '29ABCDE1234F1Z5')
+    # Sample amounts in paise/cents, formatted the way the Apps Script formats them
+    if is_international:
+        currency = 'USD'
+        base_amount = 120000
+        gst_amount = 0
     else:
-        preview = preview.replace('{{PARTY_GST}}', '')
+        currency = 'INR'
+        base_amount = 10000000
+        gst_amount = base_amount * 18 // 100 if has_gst else 0
+    total_amount = base_amount + gst_amount
     
-    # Remove QR section if not enabled
-    if not has_qr:
-        preview = re.sub(r'<div class="qr-section">.*?</div>', '', preview, flags=re.DOTALL)
+    values['TOTAL_BASE_DISPLAY'] = format_money(base_amount, currency)
+    values['GST_DISPLAY'] = format_money(gst_amount, currency)
+    values['TOTAL_DISPLAY'] = format_money(total_amount, currency)
+    values['AMOUNT_WORDS'] = amount_in_words(total_amount, currency)
     
     # Generate item rows based on scenario
     if has_gst and not is_international:
         # Domestic GST client with HSN column
-        item_rows = '''<tr>
+        item_rows = f'''<tr>
         <td>
             <strong>Consulting Services</strong><br>
             <span style="font-size: 10px; font-weight: normal; color: #555;">
@@ -114,21 +111,17 @@ def generate_preview_html(template, has_gst, is_international=False, has_qr=Fals
             </span>
         </td>
         <td class="hsn">998314</td>
-        <td class="amount">₹ 1,00,000.00</td>
+        <td class="amount">{values['TOTAL_BASE_DISPLAY']}</td>
     </tr>
     <tr>
         <td><strong>IGST @ 18%</strong></td>
         <td class="hsn"></td>
-        <td class="amount">₹ 18,000</td> 
+        <td class="amount">{values['GST_DISPLAY']}</td> 
     </tr>
     '''
-        preview = preview.replace('{{TOTAL_BASE_DISPLAY}}', '₹ 1,00,000.00')
-        preview = preview.replace('{{GST_DISPLAY}}', '₹ 18,000.00')
-        preview = preview.replace('{{TOTAL_DISPLAY}}', '₹ 1,18,000.00')
-        preview = preview.replace('{{AMOUNT_WORDS}}', 'One Lakh Eighteen Thousand Rupees Only')
     elif is_international:
         # International - 2 columns, no HSN, no GST
-        item_rows = '''<tr>
+        item_rows = f'''<tr>
         <td>
             <strong>Consulting Services</strong><br>
             <span style="font-size: 10px; font-weight: normal; color: #555;">
@@ -136,16 +129,12 @@ def generate_preview_html(template, has_gst, is_international=False, has_qr=Fals
                 Some other narration.
             </span>
         </td>
-        <td class="amount">$ 1,200.00</td>
+        <td class="amount">{values['TOTAL_BASE_DISPLAY']}</td>
     </tr>
     '''
-        preview = preview.replace('{{TOTAL_BASE_DISPLAY}}', '$ 1,200.00')
-        preview = preview.replace('{{GST_DISPLAY}}', '0.00')
-        preview = preview.replace('{{TOTAL_DISPLAY}}', '$ 1,200.00')
-        preview = preview.replace('{{AMOUNT_WORDS}}', 'One Thousand Two Hundred US Dollars Only')
     else:
         # Non-GST domestic - 2 columns
-        item_rows = '''<tr>
+        item_rows = f'''<tr>
         <td>
             <strong>Consulting Services</strong><br>
             <span style="font-size: 10px; font-weight: normal; color: #555; line-height: 1.1;">
@@ -153,17 +142,99 @@ def generate_preview_html(template, has_gst, is_international=False, has_qr=Fals
                 Some other narration.
             </span>
         </td>
-        <td class="amount">₹ 1,00,000.00</td>
+        <td class="amount">{values['TOTAL_BASE_DISPLAY']}</td>
     </tr>
     '''
-        preview = preview.replace('{{TOTAL_BASE_DISPLAY}}', '₹ 1,00,000.00')
-        preview = preview.replace('{{GST_DISPLAY}}', '₹ 0.00')
-        preview = preview.replace('{{TOTAL_DISPLAY}}', '₹   1,00,000.00')
-        preview = preview.replace('{{AMOUNT_WORDS}}', 'One Lakh Rupees Only')
     
-    preview = preview.replace('{{ITEM_ROWS}}', item_rows)
+    values['ITEM_ROWS'] = item_rows
     
-    # Clean up any remaining placeholders
-    preview = re.sub(r'\{\{[A-Z_]+\}\}', '', preview)
-    
-    return preview
\ No newline at end of file
+    # Single pass over the compiled template, remaining placeholders render empty
+    return compiled.render(values=values, conditions=conditions, regions=regions, missing='')
+
+def scale_preview(preview_html):
+    """Wrap preview HTML so the invoice fits the preview column"""
+    return f"""
+                    <style>
+                        html, body {{
+                            margin: 0;
+                            padding: 0;
+                            overflow: auto;
+                        }}
+                        .invoice-container {{
+                            transform: scale(0.65);
+                            transform-origin: top left;
+                            width: 153.85%;
+                        }}
+                    </style>
+                    {preview_html}
+                    """
+
+@lru_cache(maxsize=16)
+def template_digest(template):
+    """Content hash of a generated template"""
+    return hashlib.sha1(template.encode('utf-8')).hexdigest()
+
+def preview_variants(has_gst, has_international):
+    """(has_gst, is_international) pairs shown in the preview column"""
+    if has_gst and has_international:
+        return [(True, False), (True, True)]
+    if has_gst:
+        return [(True, False)]
+    return [(False, False)]
+
+def compact_html(html, inline_images=False):
+    """
+    Smaller HTML for the preview iframe: comments and indentation dropped, runs of
+    spaces collapsed, and inline data URI images swapped for IMAGE_PLACEHOLDER unless
+    inline_images. The preview has no <pre> or scripts, so whitespace is not significant.
+    """
+    html = _COMMENT.sub('', html)
+    html = _LINE_BREAKS.sub('\n', html)
+    html = _SPACES.sub(' ', html)
+    if not inline_images:
+        html = _INLINE_IMAGE.sub(f'src="{IMAGE_PLACEHOLDER}"', html)
+    return html.strip()
+
+@profiled()
+def get_scaled_preview(template, has_gst, is_international=False, has_qr=False, compact=False, inline_images=True):
+    """
+    Scaled preview HTML, served from the shared LRU when possible.
+    compact=True gives the reduced payload of compact_html, derived from the cached full preview.
+    """
+    # The preview shows today's date, so a new day is a new entry
+    key = (
+        template_digest(template),
+        bool(has_gst),
+        bool(is_international),
+        bool(has_qr),
+        datetime.now().strftime('%Y-%m-%d')
+    )
+    if compact:
+        return PREVIEW_CACHE.get_or_set(
+            key + ('compact', bool(inline_images)),
+            lambda: compact_html(get_scaled_preview(template, has_gst, is_international, has_qr), inline_images)
+        )
+    return PREVIEW_CACHE.get_or_set(
+        key,
+        lambda: scale_preview(generate_preview_html(template, has_gst, is_international, has_qr))
+    )
+
+def _prerender_executor():
+    global _prerender_pool
+    with _prerender_pool_lock:
+        if _prerender_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _prerender_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='preview')
+        return _prerender_pool
+
+def prerender_previews(template, has_gst, has_international, has_qr):
+    """Render every applicable preview variant in the background"""
+    pool = _prerender_executor()
+    return [
+        pool.submit(get_scaled_preview, template, gst, intl, has_qr)
+        for gst, intl in preview_variants(has_gst, has_international)
+    ]
+
+def preview_cache_stats():
+    """Hit/miss/eviction counters of the shared preview cache"""
+    return PREVIEW_CACHE.stats()
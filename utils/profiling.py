@@ -0,0 +1,218 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Timing spans and byte counters per Streamlit rerun.
+# Nothing is recorded unless a run is active, so disabled spans cost one context lookup.
+
+# INVOICE_PROFILE=1 turns profiling on for every session, ?profile=1 for one session
+ENABLED = os.environ.get('INVOICE_PROFILE') == '1'
+
+# Completed runs are appended here as JSON lines when set
+LOG_PATH = os.environ.get('INVOICE_PROFILE_LOG')
+
+# Reruns kept per session for the timing panel
+HISTORY = 20
+
+_active = contextvars.ContextVar('profile_run', default=None)
+_log_lock = threading.Lock()
+
+
+class _NullSpan:
+    """Shared do-nothing span handed out while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_bytes(self, count):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('run', 'name', 'start', 'bytes')
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+        self.bytes = 0
+
+    def __enter__(self):
+        self.run._stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.run._record('/'.join(self.run._stack), elapsed, self.bytes)
+        self.run._stack.pop()
+        return False
+
+    def add_bytes(self, count):
+        self.bytes += count
+
+
+class Run:
+    """Spans recorded during one rerun"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.spans = []
+        self._stack = []
+        self._t0 = time.perf_counter()
+        self._lap = self._t0
+        self._lap_name = None
+
+    def _record(self, path, seconds, count=0):
+        self.spans.append({'name': path, 'ms': round(seconds * 1000, 3), 'bytes': count})
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def lap(self, name):
+        """Close the previous lap section and start a new one named name"""
+        now = time.perf_counter()
+        if self._lap_name is not None:
+            self._record(self._lap_name, now - self._lap)
+        self._lap = now
+        self._lap_name = name
+
+    def add_bytes(self, name, count):
+        """Byte counter without a duration, e.g. an HTML payload size"""
+        self._record('/'.join(self._stack + [name]), 0, count)
+
+    def finish(self):
+        self.lap(None)
+        return {
+            'label': self.label,
+            'started': round(self.started, 3),
+            'total_ms': round((time.perf_counter() - self._t0) * 1000, 3),
+            'spans': self.spans,
+        }
+
+
+def start_run(label='rerun'):
+    """Begin recording for the current script thread"""
+    run = Run(label)
+    _active.set(run)
+    return run
+
+
+def finish_run(extra=None):
+    """Stop recording and return the run as a dict (None if no run was active)"""
+    run = _active.get()
+    if run is None:
+        return None
+    _active.set(None)
+    record = run.finish()
+    if extra:
+        record.update(extra)
+    if LOG_PATH:
+        with _log_lock, open(LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+    return record
+
+
+def span(name):
+    """Context manager timing a block; a no-op when no run is active"""
+    run = _active.get()
+    return run.span(name) if run is not None else NULL_SPAN
+
+
+class _FragmentRun:
+    """Own run for a fragment rerun, appended to history when the fragment finishes"""
+
+    def __init__(self, label, history):
+        self.label = label
+        self.history = history
+
+    def __enter__(self):
+        start_run(self.label)
+        return self
+
+    def __exit__(self, *exc):
+        self.history.append(finish_run())
+        return False
+
+    def add_bytes(self, count):
+        add_bytes(self.label, count)
+
+
+def scope(label, history=None):
+    """
+    Span for a st.fragment body. Inside a full rerun this is an ordinary span; a
+    fragment-only rerun has no active run, so it records its own run into history
+    (pass None to skip recording, e.g. while profiling is off).
+    """
+    run = _active.get()
+    if run is not None:
+        return run.span(label)
+    if history is not None:
+        return _FragmentRun(label, history)
+    return NULL_SPAN
+
+
+def lap(name):
+    run = _active.get()
+    if run is not None:
+        run.lap(name)
+
+
+def add_bytes(name, count):
+    run = _active.get()
+    if run is not None:
+        run.add_bytes(name, count)
+
+
+def profiled(name=None):
+    """Decorator recording each call of a function as a span"""
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = _active.get()
+            if run is None:
+                return fn(*args, **kwargs)
+            with run.span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _value_bytes(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+def session_footprint(state):
+    """{key: bytes} for session state values, largest first (strings count as UTF-8)"""
+    sizes = {}
+    for key in list(state.keys()):
+        try:
+            sizes[str(key)] = _value_bytes(state[key])
+        except Exception:
+            continue
+    return dict(sorted(sizes.items(), key=lambda item: -item[1]))
+
+
+def to_jsonl(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def new_history():
+    return deque(maxlen=HISTORY)
@@ -1,17 +1,33 @@
+import hashlib
+import json
 import re
+import warnings
+from functools import lru_cache
+from utils.assets import get_asset, get_derived
+from utils.cache import LRUCache
+from utils.currency import currency_index_tables
+from utils.profiling import profiled
 
+@profiled()
 def read_script_file():
-    """Read the script.gs file from root directory"""
-    try:
-        with open('script.gs', 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return None
+    """Read the script.gs file from the package root"""
+    return get_asset('script.gs')
+
+def _js_string(value):
+    return str(value).replace('\\', '\\\\').replace("'", "\\'")
 
-def update_script_config(script_content, template_file_id, dest_folder_id):
-    """Update the CONFIG section in the script with user-provided IDs"""
+@profiled()
+def update_script_config(script_content, template_file_id, dest_folder_id, allocator_url='', allocator_token='', cache_version='',
+                         batch=True):
+    """
+    Update the CONFIG section in the script with user-provided IDs.
+    cache_version (template_cache_version) makes the script cache the template and header row;
+    batch=False leaves out the generatePendingInvoices entry point (Invoices menu).
+    """
     if not script_content:
         return None
+    if not batch:
+        script_content = specialize_script(script_content, (('BATCH', False),))
     
     # Replace TEMPLATE_FILE_ID
     script_content = re.sub(
@@ -27,4 +43,296 @@ def update_script_config(script_content, template_file_id, dest_folder_id):
         script_content
     )
     
-    return script_content
\ No newline at end of file
+    # Invoice number service, left empty to keep numbering from the sheet
+    script_content = re.sub(
+        r"ALLOCATOR_URL:\s*'[^']*'",
+        lambda m: f"ALLOCATOR_URL: '{_js_string(allocator_url)}'",
+        script_content
+    )
+    script_content = re.sub(
+        r"ALLOCATOR_TOKEN:\s*'[^']*'",
+        lambda m: f"ALLOCATOR_TOKEN: '{_js_string(allocator_token)}'",
+        script_content
+    )
+    script_content = re.sub(
+        r"CACHE_VERSION:\s*'[^']*'",
+        lambda m: f"CACHE_VERSION: '{_js_string(cache_version)}'",
+        script_content
+    )
+    
+    return script_content
+
+@profiled()
+def embed_client_directory(script_content, lookup_table):
+    """Fill CLIENT_DIRECTORY in the script with a {client_key: [fields]} table"""
+    if not script_content:
+        return None
+    # Single line: JSON escapes newlines inside strings
+    literal = json.dumps(lookup_table, ensure_ascii=False, separators=(',', ':'))
+    return re.sub(
+        r"const CLIENT_DIRECTORY = \{[^\n]*\};",
+        lambda m: f"const CLIENT_DIRECTORY = {literal};",
+        script_content,
+        count=1
+    )
+
+@profiled()
+def embed_currency_index(script_content):
+    """Fill CURRENCY_INDEX and CURRENCY_CANDIDATES in the script from the currency table"""
+    if not script_content:
+        return None
+    index, candidates = currency_index_tables()
+    for name, value in (('CURRENCY_INDEX', index), ('CURRENCY_CANDIDATES', candidates)):
+        literal = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        script_content = re.sub(
+            r"const %s = [\[{][^\n]*[\]}];" % name,
+            lambda m: f"const {name} = {literal};",
+            script_content,
+            count=1
+        )
+    return script_content
+
+
+# ---------- Pre-tokenized script ----------
+
+# Configured builds shared by all sessions, keyed by script version and configuration
+SCRIPT_BUILDS = LRUCache(maxsize=64)
+
+# CONFIG string values and the embedded tables, the parts of script.gs that vary per user
+_CONFIG_SLOT = re.compile(r"\b(TEMPLATE_FILE_ID|DEST_FOLDER_ID|ALLOCATOR_URL|ALLOCATOR_TOKEN|CACHE_VERSION):\s*'([^']*)'")
+_TABLE_SLOT = re.compile(r"const (CLIENT_DIRECTORY|STATE_CODES|CURRENCY_INDEX|CURRENCY_CANDIDATES) = ([\[{][^\n]*[\]}]);")
+
+# Template features, the batch entry point and the invoice number service code, the parts a
+# build can leave out (specialize_script)
+SCRIPT_FEATURES = ('GST', 'INTERNATIONAL', 'BATCH', 'ALLOCATOR')
+_FEATURE_BLOCK = re.compile(r'^[ \t]*//#if ([A-Z_]+)[ \t]*\n(.*?)^[ \t]*//#endif[ \t]*\n', re.DOTALL | re.MULTILINE)
+_FEATURES_LITERAL = re.compile(r'const FEATURES = \{[^\n]*\};')
+
+class ScriptTemplate:
+    """script.gs split once at its config slots, so configuring it is a join instead of regex passes"""
+
+    def __init__(self, parts, slots, defaults):
+        # parts[0] slot[0] parts[1] slot[1] ... parts[-1]
+        self.parts = parts
+        self.slots = slots
+        self.defaults = defaults
+
+    def configure(self, values):
+        """Script with slot name -> text spliced in; missing slots keep the file's text"""
+        out = [self.parts[0]]
+        for name, default, part in zip(self.slots, self.defaults, self.parts[1:]):
+            out.append(values.get(name, default))
+            out.append(part)
+        return ''.join(out)
+
+def tokenize_script(source):
+    """Split script source at the CONFIG strings and the first definition of each embedded table"""
+    spans = [(m.start(2), m.end(2), m.group(1)) for m in _CONFIG_SLOT.finditer(source)]
+    seen = set()
+    for match in _TABLE_SLOT.finditer(source):
+        if match.group(1) not in seen:
+            seen.add(match.group(1))
+            spans.append((match.start(2), match.end(2), match.group(1)))
+    spans.sort()
+
+    parts, slots, defaults = [], [], []
+    pos = 0
+    for start, end, name in spans:
+        parts.append(source[pos:start])
+        slots.append(name)
+        defaults.append(source[start:end])
+        pos = end
+    parts.append(source[pos:])
+    return ScriptTemplate(parts, tuple(slots), tuple(defaults))
+
+# String, template and regex literals are set aside before minifying, so only code is touched
+_JS_STRING = re.compile(r"""'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|`(?:[^`\\]|\\.)*`""", re.DOTALL)
+_JS_REGEX = re.compile(r'/(?![*/])(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*')
+_JS_SPECIAL = re.compile(r"""[/'"`]""")
+# A / after one of these starts a regex literal rather than a division
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = re.compile(r'\b(?:return|typeof|case|in|of|delete|void|throw|new)$')
+_PLACEHOLDER = re.compile('\x00([0-9]+)\x00')
+_CONSOLE_LOG = re.compile(r'\bconsole\.log\(')
+
+def _split_literals(source):
+    """(code with comments dropped and literals as \\x00n\\x00 placeholders, literals)"""
+    code, literals = [], []
+    pos = 0
+    while True:
+        match = _JS_SPECIAL.search(source, pos)
+        if match is None:
+            code.append(source[pos:])
+            break
+        start = match.start()
+        code.append(source[pos:start])
+        if source.startswith('//', start):
+            end = source.find('\n', start)
+            pos = len(source) if end < 0 else end
+            continue
+        if source.startswith('/*', start):
+            end = source.find('*/', start + 2)
+            end = len(source) if end < 0 else end + 2
+            code.append('\n' if '\n' in source[start:end] else ' ')
+            pos = end
+            continue
+        if match.group(0) == '/':
+            before = ''.join(code[-3:]).rstrip()
+            literal = None
+            if not before or before[-1] in _REGEX_AFTER or _REGEX_KEYWORDS.search(before):
+                literal = _JS_REGEX.match(source, start)
+        else:
+            literal = _JS_STRING.match(source, start)
+        if literal is None:
+            # Division, or an unterminated quote left as code
+            code.append(match.group(0))
+            pos = start + 1
+            continue
+        code.append(f'\x00{len(literals)}\x00')
+        literals.append(literal.group(0))
+        pos = literal.end()
+    return ''.join(code), literals
+
+def _drop_console_log(code):
+    """Remove console.log(...) statements that start a statement"""
+    out = []
+    pos = 0
+    for match in _CONSOLE_LOG.finditer(code):
+        start = match.start()
+        if start < pos:
+            continue
+        before = code[:start].rstrip()
+        # After an if/else without braces the call is the whole body, keep it there
+        if before and before[-1] not in ';{}':
+            continue
+        depth, end = 0, match.end() - 1
+        while end < len(code):
+            depth += {'(': 1, ')': -1}.get(code[end], 0)
+            end += 1
+            if depth == 0:
+                break
+        if depth:
+            continue
+        rest = code[end:].lstrip(' \t')
+        if rest.startswith(';'):
+            end = len(code) - len(rest) + 1
+        out.append(code[pos:start])
+        pos = end
+    out.append(code[pos:])
+    return ''.join(out)
+
+def minify_script(source):
+    """
+    Smaller script.gs for copying: comments, console.log calls, indentation and blank
+    lines dropped. Line breaks are kept so automatic semicolon insertion is unchanged,
+    and strings, template literals and regexes are left as they are.
+    """
+    if '\x00' in source:
+        return source
+    code, literals = _split_literals(source)
+    code = _drop_console_log(code)
+    code = re.sub(r'[ \t]+', ' ', code)
+    code = re.sub(r' ?\n[ \n]*', '\n', code).strip()
+    return _PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], code) + '\n'
+
+def script_features(has_gst, has_international, batch=False, allocator=False):
+    """
+    Features for a company's template settings, as specialize_script takes them; batch
+    keeps generatePendingInvoices, which generates all pending rows in one execution, and
+    allocator the invoice number service client (needed when the script has an ALLOCATOR_URL)
+    """
+    return (('GST', bool(has_gst)), ('INTERNATIONAL', bool(has_gst and has_international)),
+            ('BATCH', bool(batch)), ('ALLOCATOR', bool(allocator)))
+
+
+def specialize_script(source, features):
+    """
+    script.gs for one company's template: FEATURES set to the given values and code
+    between //#if NAME and //#endif dropped for features that are off (the lines in
+    the block are kept, without the markers, for features that are on).
+    features is a (name, bool) sequence, see script_features; unknown names stay on.
+    """
+    enabled = dict(features)
+    source = _FEATURE_BLOCK.sub(lambda m: m.group(2) if enabled.get(m.group(1), True) else '', source)
+    literal = ', '.join(f"{name}: {'true' if enabled.get(name, True) else 'false'}" for name in SCRIPT_FEATURES)
+    return _FEATURES_LITERAL.sub(lambda m: f'const FEATURES = {{ {literal} }};', source, count=1)
+
+
+def load_script_template(minify=False, features=None):
+    """
+    Tokenized script.gs, specialized (specialize_script) and minified if asked,
+    rebuilt only when the file changes
+    """
+    features = tuple(features) if features else None
+
+    def build(source):
+        if features:
+            source = specialize_script(source, features)
+        return tokenize_script(minify_script(source) if minify else source)
+    return get_derived('script.gs', ('tokens', minify, features), build)
+
+def _state_codes_literal():
+    """STATE_CODES value from codes.json, the table read_state_codes serves the app"""
+    return get_derived('codes.json', 'script literal', lambda codes: json.dumps(codes, ensure_ascii=False, separators=(',', ':')))
+
+
+@lru_cache(maxsize=1)
+def _currency_literals():
+    index, candidates = currency_index_tables()
+    return tuple(json.dumps(value, ensure_ascii=False, separators=(',', ':')) for value in (index, candidates))
+
+def template_cache_version(template):
+    """
+    CACHE_VERSION stamp for a generated template: a new template gets a new stamp, so a
+    script set up for it never reads the previous template from the script cache
+    """
+    if not template:
+        return ''
+    return hashlib.sha1(template.encode('utf-8')).hexdigest()[:12]
+
+
+def client_directory_literal(lookup_table):
+    """CLIENT_DIRECTORY value for configured_script, on a single line (JSON escapes newlines)"""
+    return json.dumps(lookup_table, ensure_ascii=False, separators=(',', ':'))
+
+@profiled()
+def configured_script(template_file_id, dest_folder_id, allocator_url='', allocator_token='',
+                      client_directory=None, minify=False, features=None, cache_version=''):
+    """
+    script.gs configured like update_script_config plus the state, currency and client
+    tables, built once per distinct configuration. Without codes.json the script's own
+    STATE_CODES table is kept (with a RuntimeWarning). client_directory is a
+    client_directory_literal (None keeps the empty table), minify gives the minify_script
+    build, features (script_features) a build specialized for one company's template and
+    cache_version (template_cache_version) one that caches the template between edits.
+    """
+    tokens = load_script_template(minify, features)
+    if tokens is None:
+        return None
+    state_codes = _state_codes_literal()
+    if state_codes is None:
+        warnings.warn('codes.json not found, the script keeps the STATE_CODES table in script.gs', RuntimeWarning)
+    key = (tokens, template_file_id, dest_folder_id, allocator_url, allocator_token, cache_version,
+           client_directory, state_codes)
+
+    def build():
+        currency_index, currency_candidates = _currency_literals()
+        values = {
+            'TEMPLATE_FILE_ID': _js_string(template_file_id),
+            'DEST_FOLDER_ID': _js_string(dest_folder_id),
+            'ALLOCATOR_URL': _js_string(allocator_url),
+            'ALLOCATOR_TOKEN': _js_string(allocator_token),
+            'CACHE_VERSION': _js_string(cache_version),
+            'CURRENCY_INDEX': currency_index,
+            'CURRENCY_CANDIDATES': currency_candidates,
+        }
+        if state_codes is not None:
+            values['STATE_CODES'] = state_codes
+        if client_directory is not None:
+            values['CLIENT_DIRECTORY'] = client_directory
+        return tokens.configure(values)
+    return SCRIPT_BUILDS.get_or_set(key, build)
+
+def script_build_stats():
+    """Hit/miss/eviction counters of the configured script cache"""
+    return SCRIPT_BUILDS.stats()
@@ -1,9 +1,12 @@
-import json
+from utils.assets import get_asset, get_derived
+from utils.profiling import profiled
 
+@profiled()
 def read_state_codes():
-    """Read state codes from codes.json"""
-    try:
-        with open('codes.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
\ No newline at end of file
+    """Read state name -> state code mapping from codes.json"""
+    return get_asset('codes.json') or {}
+
+@profiled()
+def read_states_list():
+    """State names from codes.json, in file order"""
+    return get_derived('codes.json', 'states', list) or []
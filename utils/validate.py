@@ -0,0 +1,82 @@
+import re
+from utils.profiling import profiled
+
+# Format checks for the identifiers printed on the template, run once per form submit
+
+PAN = re.compile(r'[A-Z]{5}[0-9]{4}[A-Z]')
+GSTIN = re.compile(r'[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]')
+IFSC = re.compile(r'[A-Z]{4}0[A-Z0-9]{6}')
+UDYAM = re.compile(r'UDYAM-[A-Z]{2}-[0-9]{2}-[0-9]{7}')
+
+_GSTIN_CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def normalize_id(value):
+    """Upper-case with all whitespace removed, as the identifiers are printed"""
+    return ''.join((value or '').split()).upper()
+
+
+def gstin_check_digit(first14):
+    """Check character for the first 14 characters of a GSTIN (mod 36, alternating weights 1 and 2)"""
+    total = 0
+    for i, char in enumerate(first14):
+        product = _GSTIN_CHARSET.index(char) * (2 if i % 2 else 1)
+        total += product // 36 + product % 36
+    return _GSTIN_CHARSET[(36 - total % 36) % 36]
+
+
+@profiled()
+def validate_company_details(pan='', gst='', ifsc='', udyam='', state_code='', lut_from=None, lut_to=None):
+    """
+    Format errors for the given fields as {label: message}; empty fields are skipped
+    (required-field checks are the form's job).
+    """
+    errors = {}
+    pan, gst, ifsc, udyam = normalize_id(pan), normalize_id(gst), normalize_id(ifsc), normalize_id(udyam)
+
+    if pan and not PAN.fullmatch(pan):
+        errors['Company PAN'] = 'PAN must be 5 letters, 4 digits and a letter, e.g. ABCDE1234F'
+
+    if gst:
+        if not GSTIN.fullmatch(gst):
+            errors['Company GST Number'] = 'GSTIN must be 15 characters: state code, PAN, entity number, Z and a check character'
+        elif gstin_check_digit(gst[:14]) != gst[14]:
+            errors['Company GST Number'] = f'GSTIN check character should be {gstin_check_digit(gst[:14])}, please re-check the number'
+        elif state_code and str(state_code).strip().isdigit() and gst[:2] != str(state_code).strip().zfill(2):
+            errors['Company GST Number'] = f'GSTIN starts with {gst[:2]} but the company state code is {str(state_code).strip().zfill(2)}'
+        elif pan and PAN.fullmatch(pan) and gst[2:12] != pan:
+            errors['Company GST Number'] = 'GSTIN does not contain the company PAN'
+
+    if ifsc and not IFSC.fullmatch(ifsc):
+        errors['IFSC Code'] = 'IFSC must be 4 letters, a zero and 6 letters or digits, e.g. HDFC0001234'
+
+    if udyam and not UDYAM.fullmatch(udyam):
+        errors['UDYAM Registration'] = 'UDYAM number must look like UDYAM-MH-12-0012345'
+
+    if lut_from and lut_to and lut_from > lut_to:
+        errors['LUT Valid To Date'] = 'LUT validity must end after it starts'
+
+    return errors
+
+
+def missing_company_fields(fields, has_gst, has_msme, has_international, has_qr):
+    """
+    Labels of required company fields that are empty, in form order.
+    fields uses the manifest/form names: name, address, state, udyam, gst, lut_number,
+    lut_validity_from, lut_validity_to, contact, pan, bank_ac_holder, bank_name,
+    bank_ac_no, bank_ifsc, qr_code.
+    """
+    required = [('name', 'Company Name'), ('address', 'Company Address'), ('state', 'Company State')]
+    if has_msme:
+        required.append(('udyam', 'UDYAM Registration'))
+    if has_gst:
+        required.append(('gst', 'Company GST Number'))
+    if has_gst and has_international:
+        required += [('lut_number', 'LUT Number'), ('lut_validity_from', 'LUT Valid From Date'), ('lut_validity_to', 'LUT Valid To Date')]
+    required += [
+        ('contact', 'Contact Number'), ('pan', 'Company PAN'), ('bank_ac_holder', 'Account Holder'),
+        ('bank_name', 'Bank Name'), ('bank_ac_no', 'Account Number'), ('bank_ifsc', 'IFSC Code'),
+    ]
+    if has_qr:
+        required.append(('qr_code', 'QR Code Image'))
+    return [label for key, label in required if not fields.get(key)]
@@ -0,0 +1,395 @@
+import streamlit as st
+from datetime import datetime
+from utils.address import convert_addresses
+from utils.bank import format_bank_details
+from utils.compact import compact_checked
+from utils.generate import TemplateGenerator, template_byte_size, TEMPLATE_BYTE_BUDGET
+from utils.preview import get_scaled_preview, prerender_previews, preview_variants
+from utils.image import image_to_base64
+from utils.state import read_state_codes, read_states_list
+from utils.validate import missing_company_fields, normalize_id, validate_company_details
+from utils import profiling
+
+# Generator page. The form and the preview are fragments: changing a setting reruns only
+# the form, and the preview redraws only after a new template is generated.
+
+# Read state codes (cached process-wide, reloaded only when codes.json changes)
+profiling.lap("state codes")
+state_codes = read_state_codes()
+states_list = read_states_list()
+
+profiling.lap("page: form")
+
+PREVIEW_LABELS = {
+    (True, False): "Domestic GST Client",
+    (True, True): "International Client",
+    (False, False): "Domestic Non-GST Client",
+}
+
+
+def lut_details():
+    """LUT inputs for export invoices (inside the details form), returns (number, valid from, valid to)"""
+    st.markdown("**LUT (Letter of Undertaking) Details**")
+    st.caption("Required for export invoices without IGST payment")
+
+    lut_number = st.text_input(
+        "LUT Number",
+        placeholder="e.g., AD330324012345A",
+        help="Your LUT number from GST portal"
+    )
+
+    col_lut1, col_lut2 = st.columns(2)
+    with col_lut1:
+        lut_validity_from = st.date_input(
+            "LUT Valid From",
+            help="Start date of LUT validity"
+        )
+    with col_lut2:
+        lut_validity_to = st.date_input(
+            "LUT Valid To",
+            help="End date of LUT validity"
+        )
+    return lut_number, lut_validity_from, lut_validity_to
+
+
+@st.fragment
+def qr_uploader():
+    """Payment QR upload, returns the image as base64 (None until one is uploaded)"""
+    with profiling.scope("fragment: qr", st.session_state.get("profile_history")):
+        qr_upload = st.file_uploader("Upload QR Code Image", type=['png', 'jpg', 'jpeg'])
+        if not qr_upload:
+            st.warning("Please upload a QR code image")
+            return None
+        qr_code_base64 = image_to_base64(qr_upload)
+        if qr_code_base64:
+            st.success("QR Code uploaded successfully")
+        return qr_code_base64
+
+
+@st.fragment
+def company_form():
+    with profiling.scope("fragment: form", st.session_state.get("profile_history")):
+        _company_form()
+
+
+def _company_form():
+    # Settings that change which fields exist stay live; the fields themselves are in one
+    # form, so typing costs no reruns and the whole template is checked once on submit.
+    st.subheader("Invoice Numbering")
+
+    first_time = st.radio(
+        "Is this the first time generating invoices?",
+        options=["Yes", "No"],
+        horizontal=True,
+        help="Select 'No' if you have already generated invoices and want to continue the series"
+    )
+
+    st.session_state.first_time_invoice = (first_time == "Yes")
+
+    if not st.session_state.first_time_invoice:
+        invoices_count = st.number_input(
+            "How many invoices have been generated so far?",
+            min_value=1,
+            max_value=999,
+            value=1,
+            step=1,
+            help="Enter the number of invoices already generated (e.g., 34). The next invoice will be numbered accordingly."
+        )
+        st.session_state.invoices_generated = invoices_count
+        st.info(f"Template will show invoice number as: **{datetime.now().year}/Inv/{str(invoices_count).zfill(3)}**. Next invoice will start from **{str(invoices_count + 1).zfill(3)}**")
+    else:
+        st.session_state.invoices_generated = 0
+        st.info(f"Template will show invoice number as: **{datetime.now().year}/Inv/000**. First invoice will be numbered **001**")
+
+    st.markdown("---")
+    st.markdown("**Client Settings**")
+
+    has_msme = st.toggle(
+        "Company has UDYAM Registration",
+        value=True,
+        help="Toggle off if your company doesn't have UDYAM/MSME registration."
+    )
+    st.session_state.has_msme = has_msme
+
+    if not has_msme:
+        st.info("UDYAM field will be removed from the invoice template")
+
+    has_gst = st.toggle(
+        "Client is GST Registered",
+        value=True,
+        help="Toggle off if your client doesn't have GST registration. This will remove GST fields from the invoice."
+    )
+    st.session_state.has_gst = has_gst
+
+    if has_gst:
+        st.info("HSN/SAC column will be included for domestic GST clients (removed for international clients automatically)")
+
+        # International clients toggle - only for GST registered companies
+        has_international = st.toggle(
+            "Company deals with International Clients",
+            value=False,
+            help="Enable if you export services/goods internationally. This will add LUT details to your template."
+        )
+    else:
+        st.info("GST fields will be removed from the invoice template. HSN/SAC column will not be shown.")
+        has_international = False
+
+    has_qr = st.toggle(
+        "Enable Payment QR Code",
+        value=False,
+        help="Upload a QR code for payment that will be displayed on the invoice"
+    )
+    st.session_state.has_qr = has_qr
+
+    qr_code_base64 = qr_uploader() if has_qr else None
+
+    st.markdown("---")
+
+    with st.form("company_details", border=False, enter_to_submit=False):
+        st.subheader("Company Details")
+
+        company_name = st.text_input("Company Name", placeholder="e.g., ABC Corporation Pvt Ltd")
+
+        company_address = st.text_area(
+            "Company Address (Single Line)",
+            placeholder="e.g., Building-123, Street Name, Area, City, State - Pincode",
+            height=80
+        )
+
+        if states_list:
+            # The code is part of the option label, so it shows without a rerun
+            company_state = st.selectbox(
+                "Company State",
+                options=states_list,
+                index=states_list.index("Maharashtra") if "Maharashtra" in states_list else 0,
+                format_func=lambda state: f"{state} ({state_codes.get(state, '')})"
+            )
+            company_state_code = state_codes.get(company_state, "")
+        else:
+            company_state = st.text_input("Company State", placeholder="e.g., Maharashtra")
+            company_state_code = st.text_input("State Code", placeholder="e.g., 27")
+
+        company_contact = st.text_input("Contact Number", placeholder="e.g., +91-9876543210")
+        company_pan = st.text_input("Company PAN", placeholder="e.g., ABCDE1234F", max_chars=10)
+
+        if has_msme:
+            company_udyam = st.text_input("UDYAM Registration", placeholder="e.g., UDYAM-XX-XX-XXXXXXX", max_chars=19)
+        else:
+            company_udyam = ""
+
+        if has_gst:
+            company_gst = st.text_input("Company GST Number", placeholder="e.g., 27ABCDE1234F1Z5", max_chars=15)
+        else:
+            company_gst = ""
+
+        if has_international:
+            lut_number, lut_validity_from, lut_validity_to = lut_details()
+        else:
+            lut_number = ""
+            lut_validity_from = None
+            lut_validity_to = None
+
+        st.markdown("---")
+        st.markdown("**Bank Details**")
+        bank_ac_holder = st.text_input("Account Holder", placeholder="e.g., ABC Corporation Pvt Ltd")
+        bank_name = st.text_input("Bank Name", placeholder="e.g., HDFC Bank")
+        bank_ac_no = st.text_input("Account Number", placeholder="e.g., 50200012345678")
+        bank_ifsc = st.text_input("IFSC Code", placeholder="e.g., HDFC0001234", max_chars=11)
+
+        invoice_color = st.color_picker("Invoice Theme Color", value="#3b0764")
+
+        compact = st.checkbox(
+            "Compact template",
+            value=False,
+            help="Minify CSS and drop comments and indentation for a smaller file. The invoice renders the same; if that can't be verified, the regular template is kept."
+        )
+
+        st.markdown("---")
+        generate_btn = st.form_submit_button("Generate Template", type="primary", width="stretch")
+
+    if st.session_state.template_html:
+        col_btn1, col_btn2 = st.columns(2)
+
+        with col_btn1:
+            st.download_button(
+                label="1. Download Template",
+                data=st.session_state.template_html,
+                file_name=f"invoice_template_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+                mime="text/html",
+                width="stretch"
+            )
+
+        with col_btn2:
+            if st.button("2. Proceed to Setup →", width="stretch"):
+                st.switch_page("views/setup.py")
+
+        template_size = template_byte_size(st.session_state.template_html)
+        if template_size > TEMPLATE_BYTE_BUDGET:
+            st.warning(f"Template is {template_size / 1024:.0f} KB, above the {TEMPLATE_BYTE_BUDGET // 1024} KB budget. Try a smaller or tighter-cropped QR image.")
+        else:
+            st.caption(f"Template size: {template_size / 1024:.1f} KB of {TEMPLATE_BYTE_BUDGET // 1024} KB budget")
+
+    # Message from the generate run, shown once after the full rerun that redraws the preview
+    generated_message = st.session_state.pop("generated_message", None)
+    if generated_message:
+        st.success(generated_message)
+    generated_warning = st.session_state.pop("generated_warning", None)
+    if generated_warning:
+        st.warning(generated_warning)
+
+    if generate_btn:
+        profiling.lap("generate")
+        missing_fields = missing_company_fields(
+            {
+                'name': company_name, 'address': company_address, 'state': company_state,
+                'udyam': company_udyam, 'gst': company_gst, 'lut_number': lut_number,
+                'lut_validity_from': lut_validity_from, 'lut_validity_to': lut_validity_to,
+                'contact': company_contact, 'pan': company_pan, 'bank_ac_holder': bank_ac_holder,
+                'bank_name': bank_name, 'bank_ac_no': bank_ac_no, 'bank_ifsc': bank_ifsc,
+                'qr_code': qr_code_base64,
+            },
+            has_gst, has_msme, has_international, has_qr
+        )
+
+        format_errors = validate_company_details(
+            pan=company_pan,
+            gst=company_gst if has_gst else '',
+            ifsc=bank_ifsc,
+            udyam=company_udyam if has_msme else '',
+            state_code=company_state_code,
+            lut_from=lut_validity_from if has_international else None,
+            lut_to=lut_validity_to if has_international else None
+        )
+
+        if missing_fields:
+            st.error(f"Please fill in all required fields: {', '.join(missing_fields)}")
+        if format_errors:
+            st.error("Please correct these fields:\n" + "\n".join(f"- **{label}**: {message}" for label, message in format_errors.items()))
+        if not missing_fields and not format_errors:
+            # Repeated addresses come from a shared cache
+            company_address_3line = convert_addresses([company_address])[0]
+            bank_details_html = format_bank_details(bank_ac_holder, bank_name, bank_ac_no, normalize_id(bank_ifsc))
+
+            # Calculate invoice number for template
+            current_year = datetime.now().year
+            invoice_number_display = f"{current_year}/Inv/{str(st.session_state.invoices_generated).zfill(3)}"
+
+            company_data = {
+                'name': company_name.strip(),
+                'address_html': company_address_3line,
+                'state': company_state.strip(),
+                'state_code': company_state_code.strip(),
+                'udyam': normalize_id(company_udyam) if has_msme else '',
+                'gst': normalize_id(company_gst) if has_gst else '',
+                'contact': company_contact.strip(),
+                'pan': normalize_id(company_pan),
+                'bank_html': bank_details_html,
+                'qr_code': qr_code_base64 if has_qr else None,
+                'lut_number': lut_number.strip() if has_international else '',
+                'lut_validity_from': lut_validity_from.strftime('%d-%b-%Y') if has_international and lut_validity_from else '',
+                'lut_validity_to': lut_validity_to.strftime('%d-%b-%Y') if has_international and lut_validity_to else '',
+                'invoice_number': invoice_number_display
+            }
+
+            # Per-session generator: only the parts whose inputs changed are re-rendered
+            if 'template_generator' not in st.session_state:
+                st.session_state.template_generator = TemplateGenerator()
+            template = st.session_state.template_generator.generate(company_data, invoice_color, has_gst, has_msme, has_qr)
+
+            if template and compact:
+                template, problems = compact_checked(template)
+                if problems:
+                    st.session_state.generated_warning = f"Template was left uncompacted: {'; '.join(problems)}"
+
+            if template and template == st.session_state.template_html and has_international == st.session_state.get('has_international', False):
+                # Nothing changed: keep the template, previews and downloads as they are
+                st.info("No changes since the last generated template.")
+            elif template:
+                st.session_state.template_html = template
+                st.session_state.has_international = has_international
+                # Render all preview tabs ahead of time so switching tabs is a cache hit
+                prerender_previews(template, has_gst, has_international, has_qr)
+                st.session_state.generated_message = f"Template generated successfully ({template_byte_size(template) / 1024:.1f} KB)! Preview available on the right. Download and proceed to setup instructions."
+                # Full rerun so the preview fragment picks up the new template
+                st.rerun()
+
+
+@st.fragment
+def preview_panel():
+    with profiling.scope("fragment: preview", st.session_state.get("profile_history")):
+        profiling.lap("preview")
+        st.subheader("Preview")
+
+        if st.session_state.template_html:
+            variants = preview_variants(
+                st.session_state.get('has_gst', True),
+                st.session_state.get('has_international', False)
+            )
+
+            # Only the selected variant is rendered and sent; switching reruns just this fragment
+            if len(variants) > 1:
+                labels = [PREVIEW_LABELS[v] for v in variants]
+                selected = st.segmented_control(
+                    "Preview variant",
+                    options=labels,
+                    default=labels[0],
+                    label_visibility="collapsed"
+                )
+                variant = variants[labels.index(selected)] if selected else variants[0]
+            else:
+                variant = variants[0]
+                st.markdown(f"**Preview: {PREVIEW_LABELS[variant]}**")
+
+            has_qr = st.session_state.has_qr
+            inline_images = has_qr and st.toggle(
+                "Show QR image in preview",
+                value=False,
+                help="The preview shows a placeholder instead of the QR to keep it light. The template itself always has the image."
+            )
+
+            # Previews are cached across reruns and sessions, keyed by template content
+            scaled_preview = get_scaled_preview(
+                st.session_state.template_html,
+                has_gst=variant[0],
+                is_international=variant[1],
+                has_qr=has_qr,
+                compact=True,
+                inline_images=inline_images
+            )
+            sent = len(scaled_preview.encode('utf-8'))
+            profiling.add_bytes("preview html", sent)
+            st.components.v1.html(scaled_preview, height=900, scrolling=True)
+
+            full = get_scaled_preview(st.session_state.template_html, variant[0], variant[1], has_qr)
+            st.caption(f"Preview payload this rerun: {sent / 1024:.1f} KB (full preview {len(full.encode('utf-8')) / 1024:.1f} KB)")
+        else:
+            st.info("Fill in all company details and click 'Generate Template' to see preview")
+            st.markdown("""
+            ### How it works:
+            1. Fill in all your company details in the form
+            2. Select your company's state from the dropdown
+            3. Choose if this is your first time generating invoices or continue from existing count
+            4. Toggle UDYAM/MSME registration if applicable
+            5. Toggle GST setting based on your client's registration status
+            6. Optionally upload a payment QR code
+            7. Choose your brand color using the color picker
+            8. Click 'Generate Template' to create your customized template
+            9. Switch between invoice types above the preview
+            10. Download the template HTML file
+            11. Follow the setup instructions to integrate with Google Sheets
+            """)
+
+
+st.title("Invoice Template Generator")
+st.markdown("Generate a customized invoice template for your client")
+
+col1, col2 = st.columns([1, 1])
+
+with col1:
+    company_form()
+
+with col2:
+    preview_panel()
+
+st.markdown("---")
+st.caption("Invoice Template Generator")
@@ -0,0 +1,369 @@
+import html
+import io
+import re
+import streamlit as st
+from batch.clients import ClientDirectory
+from utils import profiling
+from utils.bundle import bundle_bytes
+from utils.script import client_directory_literal, configured_script, read_script_file, script_features, template_cache_version
+from utils.state import read_state_codes
+
+# Setup instructions page, loaded only when the user proceeds from the generator
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _client_directory(file_name, data):
+    """(client count, CLIENT_DIRECTORY literal) from an uploaded sheet export, built once per file"""
+    upload = io.BytesIO(data)
+    upload.name = file_name
+    table = ClientDirectory.from_sheet(upload).to_lookup_table()
+    return len(table), client_directory_literal(table)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _copy_button_html(script):
+    """Copy widget for a configured script, rebuilt only when the script changes"""
+    # Escaped, or the browser decodes the &amp;/&lt; strings in escapeHtml when filling the textarea
+    return f"""
+        <head>
+            <style>
+                body {{
+                    margin: 0; padding: 0;
+                }}
+                .copy-button {{
+                    background-color: #4CAF50;
+                    color: white;
+                    padding: 10px 20px;
+                    border: none;
+                    border-radius: 4px;
+                    cursor: pointer;
+                    font-size: 16px;
+                    transition: background-color 0.3s;
+                }}
+                .copy-button:hover {{
+                    background-color: #45a049;
+                }}
+            </style>
+        </head>
+        <body>
+            <textarea id="scriptCode" style="position: absolute; left: -9999px;">{html.escape(script, quote=False)}</textarea>
+            <button class="copy-button" onclick="
+                var copyText = document.getElementById('scriptCode');
+                copyText.select();
+                copyText.setSelectionRange(0, 99999);
+                navigator.clipboard.writeText(copyText.value);
+                this.textContent = '✓ Copied!';
+                setTimeout(() => {{ this.textContent = '📋 Copy Apps Script Code'; }}, 2000);
+            ">📋 Copy Apps Script Code</button>
+        </body>
+        """
+
+profiling.lap("page: setup")
+st.title("Setup Instructions")
+st.markdown("Follow these steps to complete your invoice automation setup.")
+
+if st.button("← Back to Generator", type="secondary"):
+    st.switch_page("views/generator.py")
+
+st.markdown("---")
+st.subheader("Setup Checklist")
+
+st.markdown("### Step 1: Upload Template to Google Drive")
+st.checkbox("Upload the downloaded HTML template file to your Google Drive", key="check1")
+st.markdown("""
+1. Go to [Google Drive](https://drive.google.com)
+2. Upload the template HTML file you just downloaded
+3. Right-click the uploaded file and select **Get link**
+4. Paste the full link below.
+""")
+
+template_link = st.text_input(
+    "Paste Template File Link here:",
+    value=st.session_state.template_file_id,
+    placeholder="https://drive.google.com/file/d/1AbCdEfGhIjKlMnOpQrStUvWxYz/view"
+)
+
+if template_link:
+    # Remove query parameters and fragments
+    clean_link = re.split(r'[?#]', template_link)[0]
+    # Match only valid Google Drive ID characters
+    match = re.search(r'/d/([a-zA-Z0-9_-]+)', clean_link)
+    if not match:
+        match = re.search(r'[?&]id=([a-zA-Z0-9_-]+)', template_link)
+
+    if match:
+        st.session_state.template_file_id = match.group(1)
+
+
+st.markdown("---")
+
+st.markdown("### Step 2: Create Invoice Folder")
+st.checkbox("Create a folder in Google Drive to store generated invoices", key="check2")
+st.markdown("""
+1. In Google Drive, create a new folder (e.g., name it "Invoices")
+2. Open the folder and copy the link from the URL bar  
+3. Paste the full link below.
+""")
+
+dest_folder_link = st.text_input(
+    "Paste Destination Folder Link here:",
+    value=st.session_state.dest_folder_id,
+    placeholder="https://drive.google.com/drive/folders/1XyZaBcDeFgHiJkLmNoPqRsTuVw"
+)
+
+if dest_folder_link:
+    # Remove query parameters and fragments
+    clean_link = re.split(r'[?#]', dest_folder_link)[0]
+    # Match only valid Google Drive ID characters
+    match = re.search(r'/folders/([a-zA-Z0-9_-]+)', clean_link)
+    if not match:
+        match = re.search(r'[?&]id=([a-zA-Z0-9_-]+)', dest_folder_link)
+
+    if match:
+        st.session_state.dest_folder_id = match.group(1)
+
+
+st.markdown("---")
+
+st.markdown("### Step 3: Create Google Sheet")
+st.checkbox("Create a new Google Sheet with the required columns", key="check3")
+
+if st.session_state.has_gst:
+    columns_list = """
+    - Client Name
+    - Cost to Client
+    - HSN/SAC (Keep empty for international clients)
+    - Description
+    - Client Address
+    - Client PAN (Keep empty for international clients)
+    - Client GSTIN (Keep empty for international clients)
+    - Client State
+    - Place of Supply
+    - Generate(Yes/No)
+    - Status
+    - Invoice Number
+    - Invoice Date
+    """
+else:
+    columns_list = """
+    - Client Name
+    - Cost to Client
+    - Description
+    - Client Address
+    - Client PAN
+    - Client State
+    - Place of Supply
+    - Generate(Yes/No)
+    - Status
+    - Invoice Number
+    - Invoice Date
+    """
+
+st.markdown(f"""
+1. Create a new Google Sheet
+2. In the first row (header row), create the following columns **in this exact order**:
+{columns_list}
+
+**Important:** Column names must match exactly, including capitalization and spacing.
+
+**Note about "Client State" column:**
+- For domestic clients: Enter the state name (e.g., "Maharashtra", "Delhi")
+- For international clients: Enter "Outside India(USD)" or "Outside India(Euro)" etc.
+- The script will automatically handle GST calculation based on state matching
+""")
+
+st.markdown("---")
+
+st.markdown("### Step 4: Install Apps Script")
+st.checkbox("Copy and paste the Apps Script code", key="check4")
+
+st.markdown("""
+1. In your Google Sheet, go to **Extensions → Apps Script**
+2. Delete any existing code in the editor
+3. Click the button below to copy the configured script
+4. Paste it into the Apps Script editor
+5. Click the **Save** icon (or press Ctrl+S / Cmd+S)
+""")
+
+with st.expander("Optional: invoice number service"):
+    st.markdown("""
+    By default the script finds the next invoice number by scanning the sheet.
+    If you run the allocation service (`python -m allocator serve`) somewhere Apps Script can reach,
+    numbers are handed out by the service instead, which stays fast on large sheets.
+    Serving beyond localhost needs a token (`--token` or `$ALLOCATOR_TOKEN`); enter the same one below.
+    """)
+    st.session_state.allocator_url = st.text_input(
+        "Service URL",
+        value=st.session_state.allocator_url,
+        placeholder="https://invoices.example.com"
+    ).strip()
+    st.session_state.allocator_token = st.text_input(
+        "Service token",
+        value=st.session_state.allocator_token,
+        type="password"
+    ).strip()
+
+with st.expander("Optional: known clients"):
+    st.markdown("""
+    Upload an export of your existing invoice sheet (File → Download → CSV or Excel) to build
+    the client list into the script. Typing a known client name then fills in the address,
+    PAN, GSTIN and state even when the sheet has no earlier row for that client; the sheet's
+    most recent row for a client still comes first.
+    """)
+    clients_upload = st.file_uploader("Sheet export", type=['csv', 'xlsx'], key="clients_upload")
+
+smaller_script = st.checkbox(
+    "Smaller script (without comments and console.log calls)",
+    key="minify_script",
+    help="Same behaviour, less to paste; keep it off if you want to read or edit the script"
+)
+cache_template = st.checkbox(
+    "Cache the template between edits",
+    value=True,
+    key="cache_template",
+    help="The script keeps the template and your header row for a few hours instead of reading them on "
+         "every edit. A template replaced on Drive (same file) is picked up on the next edit; for a new "
+         "template file, copy the script again with its ID."
+)
+batch_entry = st.checkbox(
+    "Generate many rows at once",
+    value=False,
+    key="batch_entry",
+    help="Adds an Invoices menu to the sheet: Generate pending rows creates every row marked yes in one run, "
+         "with one block of invoice numbers, and picks up where it stopped if the run hits Google's time limit. "
+         "Makes the script about a third larger."
+)
+
+script_content = read_script_file()
+
+if script_content and st.session_state.template_file_id and st.session_state.dest_folder_id:
+    client_directory = None
+    if clients_upload is not None:
+        try:
+            client_count, client_directory = _client_directory(clients_upload.name, clients_upload.getvalue())
+            st.caption(f"{client_count} known client(s) included in the script")
+        except Exception as e:
+            st.warning(f"Could not read the sheet export: {e}")
+
+    # Built once per configuration and shared across sessions, with only the code this
+    # template can use; state codes and currency aliases come from codes.json and utils/currency.py
+    has_international = st.session_state.has_gst and st.session_state.get('has_international', False)
+    updated_script = configured_script(
+        st.session_state.template_file_id,
+        st.session_state.dest_folder_id,
+        st.session_state.allocator_url,
+        st.session_state.allocator_token,
+        client_directory,
+        minify=smaller_script,
+        features=script_features(st.session_state.has_gst, has_international, batch_entry,
+                                 st.session_state.allocator_url),
+        # Stamped with the generated template, so a new template means a new cache
+        cache_version=template_cache_version(st.session_state.template_html) if cache_template else ''
+    )
+
+    if updated_script:
+        if not read_state_codes():
+            st.warning("codes.json was not found: the script uses the state codes built into script.gs.")
+        button_html = _copy_button_html(updated_script)
+        profiling.add_bytes("copy button html", len(button_html))
+        st.components.v1.html(button_html, height=50)
+        st.caption(f"{len(updated_script.encode('utf-8')) / 1024:.1f} KB to paste")
+        if not has_international:
+            st.caption("Built for domestic clients only: rows with an \"Outside India(...)\" client state "
+                       "get an error status. Enable international clients on the generator page to include them.")
+
+        st.success("Script is ready to copy! Your Template File ID and Folder ID have been automatically configured.")
+
+        # Template and script in one archive, rebuilt only when the contents change. The app
+        # renders no invoices, and download_button needs the whole archive as bytes, so invoice
+        # batches are zipped by python -m batch --zip, which streams them from disk.
+        bundle_entries = [('Code.gs', updated_script)]
+        if st.session_state.template_html:
+            bundle_entries.insert(0, ('invoice_template.html', st.session_state.template_html))
+        bundle_digest, bundle_data = bundle_bytes(bundle_entries)
+        st.download_button(
+            label="Download setup bundle (.zip)",
+            data=bundle_data,
+            file_name=f"invoice_setup_{bundle_digest[:8]}.zip",
+            mime="application/zip",
+            help="The template and the configured Apps Script in one archive. To zip a month of invoices "
+                 "rendered on your computer, use python -m batch with --zip."
+        )
+elif script_content:
+    st.warning("Please complete Steps 1 and 2 first to copy the configured script.")
+else:
+    st.error("script.gs file not found in root directory")
+
+st.markdown("---")
+
+st.markdown("### Step 5: Grant Permissions")
+st.checkbox("Run the script once to authorize permissions", key="check5")
+st.markdown("""
+1. In the Apps Script editor, select the function `onSheetEdit` from the dropdown menu
+2. Click the **Run** button (▶)
+3. A popup will appear asking for permissions
+4. Click **Review Permissions**
+5. Select your Google account
+6. Click **Advanced** → **Go to [Project Name] (unsafe)**
+7. Click **Allow**
+
+This grants the script permission to read your sheet and write to Google Drive.
+""")
+
+st.markdown("---")
+
+st.markdown("### Step 6: Create Trigger")
+st.checkbox("Set up automatic trigger for invoice generation", key="check6")
+st.markdown("""
+1. In the Apps Script editor, click on the **Triggers** icon (⏰) in the left sidebar
+2. Click **+ Add Trigger** (bottom right)
+3. Configure the trigger as follows:
+   - Choose which function to run: **handleEdit**
+   - Choose which deployment should run: **Head**
+   - Select event source: **From spreadsheet**
+   - Select event type: **On edit**
+4. Click **Save**
+
+Now your automation is complete!
+""")
+
+st.markdown("---")
+
+st.markdown("### Step 7: Test the System")
+st.checkbox("Generate a test invoice", key="check7")
+st.markdown("""
+1. Go back to your Google Sheet
+2. Fill in the first data row (row 2) with sample client information
+3. For **Client State**: 
+   - Domestic: Enter state name like "Maharashtra"
+   - International: Enter "Outside India(USD)" or "Outside India(Euro)"
+4. In the **Generate(Yes/No)** column, type `yes`
+5. Press Enter
+6. Wait a few seconds
+7. The **Status** column should show "Generated"
+8. Check your Invoices folder in Google Drive for the PDF
+
+If everything works correctly, you're all set!
+""")
+
+if batch_entry:
+    st.markdown("""
+    **Many invoices at once:** paste `yes` into the Generate column of several rows in one go (or fill it
+    down) and all of them are generated in one run, numbered one after another. **Invoices → Generate pending
+    rows** (in the sheet's menu bar after a reload) does the same for every row still marked `yes`. A run that
+    reaches Google's six-minute limit saves its progress and continues by itself a minute later.
+    """)
+
+st.markdown("---")
+
+st.success("Setup complete! You can now generate invoices automatically by typing 'yes' in the Generate column.")
+
+st.markdown("""
+### Troubleshooting Tips
+
+- **Script not running:** Make sure the trigger is created correctly and the function name is `onEdit`
+- **Permission errors:** Re-run Step 5 to grant permissions again
+- **Invoice not generated:** Check that all required columns are filled and column names match exactly
+- **PDF not appearing:** Verify the Folder ID is correct and you have write access to that folder
+- **Configuration issues:** Make sure you copied the script AFTER entering both File IDs in Steps 1 and 2
+- **Old template still used:** With template caching on, copy the script again after uploading a new template
+- **"Another run is still generating invoices":** A batch run was busy; the row keeps `yes`, use Invoices → Generate pending rows once it is done
+""")